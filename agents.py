@@ -1,8 +1,14 @@
+import logging
 import os
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional, Union
 from crewai import LLM, Crew, Agent, Process, Task
 import time
 
+from fake_llm import FAKE_PROVIDER, FakeLLM, ResponseRecorder
+from rate_limiter import RateLimiter, get_rate_limiter
+from tracing import get_tracer, payload_size
+from utils import estimate_tokens, read_yaml_file
+
 # Turn off CrewAI Telemetry
 os.environ["OTEL_SDK_DISABLED"] = "true"
 
@@ -10,32 +16,183 @@ os.environ["OTEL_SDK_DISABLED"] = "true"
 # os.environ["LITELLM_LOG"] = "DEBUG"
 
 VERBOSE = False
-MAX_RPM = 30
+LLMS_FILE = 'conf/llms.yaml'
+AGENTS_FILE = 'conf/agents.yaml'
+MAX_RATE_LIMIT_RETRIES = 5
+# Token counters of an agent, as summed by crewai into the usage metrics of a crew
+USAGE_FIELDS = ("total_tokens", "prompt_tokens", "completion_tokens", "successful_requests")
+
+logger = logging.getLogger(__name__)
+
+def is_rate_limit_error(error: Exception) -> bool:
+    return type(error).__name__ == "RateLimitError" or getattr(error, "status_code", None) == 429
+
+def retry_after(error: Exception) -> Optional[float]:
+    """
+    The Retry-After delay of a rate-limit error, when the provider sent one.
+    """
+    headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+class RateLimitedLLM(LLM):
+    """
+    LLM whose calls go through the shared rate limiter, retried after rate-limit errors.
+    Also times its calls: the first one includes setting up the connection to the provider,
+    and can record its responses for FakeLLM to replay.
+    """
+    def __init__(self, *args, rate_limiter: RateLimiter, record_file: Optional[str] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.rate_limiter = rate_limiter
+        self.recorder = ResponseRecorder(record_file) if record_file else None
+        self.calls = 0
+        self.first_call_seconds = 0.0
+        self.call_seconds = 0.0
+
+    def call(self, messages, *args, **kwargs):
+        prompt_tokens = estimate_tokens(messages)
+        estimated_tokens = prompt_tokens + (self.max_tokens or 0)
+        with get_tracer().span(self.model, "llm", prompt_chars=payload_size(messages)) as span:
+            throttled_seconds = 0.0
+            for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+                throttled_seconds += self.rate_limiter.acquire(estimated_tokens)
+                start_time = time.monotonic()
+                try:
+                    response = super().call(messages, *args, **kwargs)
+                except Exception as e:
+                    if attempt == MAX_RATE_LIMIT_RETRIES or not is_rate_limit_error(e):
+                        raise
+                    pause = self.rate_limiter.rate_limited(retry_after(e))
+                    logger.warning(f"Rate limited by {self.model}, retrying in {pause:.1f}s")
+                    continue
+                seconds = time.monotonic() - start_time
+                if self.calls == 0:
+                    self.first_call_seconds = seconds
+                self.calls += 1
+                self.call_seconds += seconds
+                completion_tokens = estimate_tokens(response)
+                self.rate_limiter.record(estimated_tokens, prompt_tokens + completion_tokens, seconds)
+                if self.recorder:
+                    self.recorder.record(messages, response)
+                # Token counts are estimated from the sizes; the crew totals are exact
+                span.args.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                                 completion_chars=payload_size(response), attempts=attempt + 1,
+                                 throttled_seconds=round(throttled_seconds, 3))
+                return response
+
+class AgentRuntime:
+    """
+    Loads the LLM and agent definitions once and keeps their LLM clients and agents for all
+    the crews of a run, so that only tasks are created per crew and provider connections are reused.
+    """
+    def __init__(self,
+                 llms_file: str = LLMS_FILE,
+                 agents_file: str = AGENTS_FILE,
+                 rate_limiter: Optional[RateLimiter] = None):
+        """
+        :param llms_file: YAML file of the LLM definitions.
+        :param agents_file: YAML file of the agent definitions.
+        :param rate_limiter: The limiter of LLM calls, the process-wide one by default.
+        """
+        start_time = time.monotonic()
+        self.llms_data = read_yaml_file(llms_file)
+        self.agents_data = read_yaml_file(agents_file)
+        self.rate_limiter = rate_limiter or get_rate_limiter()
+        self._llms: Dict[str, Union[RateLimitedLLM, FakeLLM]] = {}
+        self._agents: Optional[Dict[str, Agent]] = None
+        self._tasks_data: Dict[str, Dict[str, Any]] = {}
+        self.crews = 0
+        self.setup_seconds = time.monotonic() - start_time
+
+    def llm(self, llm_name: str) -> Union[RateLimitedLLM, FakeLLM]:
+        if llm_name not in self._llms:
+            start_time = time.monotonic()
+            llm_info = self.llms_data[llm_name]
+            provider = llm_info.get('provider')
+            model = llm_info.get('model')
+            if provider == FAKE_PROVIDER:
+                self._llms[llm_name] = FakeLLM.from_config(llm_info, rate_limiter=self.rate_limiter)
+            else:
+                self._llms[llm_name] = RateLimitedLLM(
+                    model=f'{provider}/{model}',
+                    temperature=llm_info.get('temperature'),
+                    max_tokens=llm_info.get('max_tokens'),
+                    context_window_size=llm_info.get('context_window_size'),
+                    rate_limiter=self.rate_limiter,
+                    record_file=llm_info.get('record'),
+                )
+            self.setup_seconds += time.monotonic() - start_time
+        return self._llms[llm_name]
+
+    @property
+    def agents(self) -> Dict[str, Agent]:
+        """
+        The agents by role, created on first use.
+        """
+        if self._agents is None:
+            agents = {}
+            for _, agent_info in self.agents_data.items():
+                llm = self.llm(agent_info.get('llm'))
+                start_time = time.monotonic()
+                agent = Agent(
+                    role=agent_info.get('role'),
+                    goal=agent_info.get('goal'),
+                    max_iter=agent_info.get('max_iterations', 3),
+                    backstory=agent_info.get('backstory'),
+                    llm=llm,
+                    cache=False,
+                    respect_context_window=False,
+                    use_system_prompt=True,
+                    memory=False,
+                    verbose=False,
+                    allow_delegation=False
+                )
+                agents[agent_info.get('role')] = agent  # Store agents by their role
+                self.setup_seconds += time.monotonic() - start_time
+            self._agents = agents
+        return self._agents
+
+    def tasks_data(self, tasks_file: str) -> Dict[str, Any]:
+        if tasks_file not in self._tasks_data:
+            start_time = time.monotonic()
+            self._tasks_data[tasks_file] = read_yaml_file(tasks_file)
+            self.setup_seconds += time.monotonic() - start_time
+        return self._tasks_data[tasks_file]
+
+    def __repr__(self):
+        llm_stats = ", ".join(
+            f"{name}: calls={llm.calls}, first_call_seconds={llm.first_call_seconds:.2f}, "
+            f"warm_call_seconds={(llm.call_seconds - llm.first_call_seconds) / (llm.calls - 1) if llm.calls > 1 else 0.0:.2f}"
+            for name, llm in self._llms.items()
+        )
+        return (f"AgentRuntime(crews={self.crews}, llms={len(self._llms)}, agents={len(self._agents or {})}, "
+                f"setup_seconds={self.setup_seconds:.3f}, [{llm_stats}])")
 
 class AgentSystem:
     def __init__(self, 
                  name: str,
-                 llms: Dict[str, Any],
-                 agents_data: Dict[str, Any],
+                 runtime: AgentRuntime,
                  tasks_data: Dict[str, Any],
                  tools: Dict[str, Any] = {},
-                 max_rpm: int = MAX_RPM,
                  verbose: bool = VERBOSE):
         """
-        Initializes the AgentSystem with agents and tasks data.
+        Initializes the AgentSystem with the shared agents and its tasks.
 
         :param name: The name of the AgentSystem.
-        :param llms: A dictionary containing LLMs to be used by the agents.
-        :param agents_data: A dictionary containing information about agents.
+        :param runtime: The runtime providing the LLMs and agents.
         :param tasks_data: A dictionary containing information about tasks.
         :param tools: A dictionary containing tools to be used by the agents.
         """
 
         self.name = name
         self.tools = tools
+        self._task_index = 0
+        self._task_span = None
 
-        self.llms = self._create_llms(llms)
-        self.agents = self._create_agents(agents_data)
+        self.agents = runtime.agents
+        start_time = time.monotonic()
         self.tasks = self._create_tasks(tasks_data, self.agents, verbose)
 
         self.crew = Crew(
@@ -43,46 +200,13 @@ class AgentSystem:
             agents=list(self.agents.values()),
             tasks=self.tasks,
             process=Process.sequential,
-            max_rpm=max_rpm,
+            max_rpm=None, # calls are limited by the shared rate limiter instead
             verbose=False,
             cache=False, # results of tools
             share_crew=False,
         )
-        
-    def _create_llms(self, llms_data) -> Dict[str, LLM]:
-        llms = {}
-        for llm_name, llm_info in llms_data.items():
-            provider = llm_info.get('provider')
-            model = llm_info.get('model')
-            llm = LLM(
-                model=f'{provider}/{model}',
-                temperature=llm_info.get('temperature'),
-                max_tokens=llm_info.get('max_tokens'),
-                context_window_size=llm_info.get('context_window_size'),
-            )
-            llms[llm_name] = llm
-        
-        return llms
-
-    def _create_agents(self, agents_data) -> Dict[str, Agent]:
-        agents = {}
-        for _, agent_info in agents_data.items():
-            agent = Agent(
-                role=agent_info.get('role'),
-                goal=agent_info.get('goal'),
-                max_iter=agent_info.get('max_iterations', 3),
-                backstory=agent_info.get('backstory'),
-                llm=self.llms[agent_info.get('llm')],
-                cache=False,
-                respect_context_window=False,
-                use_system_prompt=True,
-                memory=False,
-                verbose=False,
-                allow_delegation=False
-            )
-            agents[agent_info.get('role')] = agent  # Store agents by their role
-        
-        return agents
+        runtime.crews += 1
+        runtime.setup_seconds += time.monotonic() - start_time
 
     def _create_tasks(self, tasks_data, agents: Dict[str, Agent], verbose: bool) -> List[Task]:
         tasks = []
@@ -111,11 +235,32 @@ class AgentSystem:
                 context=context_tasks,
                 tools=tools,
                 output_file=f"debug-{task_name}.md" if verbose else None,
+                callback=self._task_completed,
             )
             tasks.append(task)
         
         return tasks
 
+    def _start_task_span(self):
+        if self._task_index >= len(self.tasks):
+            return None
+        task = self.tasks[self._task_index]
+        return get_tracer().start_span(task.name, "task", agent=task.agent.role)
+
+    def _task_completed(self, output):
+        if self._task_span:
+            self._task_span.end(output_chars=payload_size(output.raw))
+        self._task_index += 1
+        self._task_span = self._start_task_span()
+
+    def _agents_usage(self) -> Dict[str, int]:
+        usage = dict.fromkeys(USAGE_FIELDS, 0)
+        for agent in self.crew.agents:
+            summary = agent._token_process.get_summary()
+            for field in USAGE_FIELDS:
+                usage[field] += getattr(summary, field)
+        return usage
+
     def execute(self, inputs: Dict[str, Any]) -> Dict[str, Any]:
         """
         Executes the crew process with the provided inputs.
@@ -125,7 +270,21 @@ class AgentSystem:
         """
         start_time = time.time()
         
-        output = self.crew.kickoff(inputs)
+        tracer = get_tracer()
+        with tracer.span(self.name, "crew") as crew_span:
+            # Tasks run one after the other: each one's span ends in its callback, where the next one starts
+            self._task_index = 0
+            self._task_span = self._start_task_span()
+            # The agents are shared by the crews and crewai never resets their token counters, so
+            # output.token_usage counts every crew so far: the usage of this one is the difference
+            usage_before = self._agents_usage()
+            try:
+                output = self.crew.kickoff(inputs)
+            finally:
+                if self._task_span:
+                    self._task_span.end(error="not completed")
+            usage = {field: count - usage_before[field] for field, count in self._agents_usage().items()}
+            crew_span.args.update(usage)
         
         end_time = time.time()
         execution_time = end_time - start_time
@@ -133,10 +292,7 @@ class AgentSystem:
         return {
             "raw_output": output.raw,
             "usage_metrics": {
-                "total_tokens": output.token_usage.total_tokens,
-                "prompt_tokens": output.token_usage.prompt_tokens,
-                "completion_tokens": output.token_usage.completion_tokens,
-                "successful_requests": output.token_usage.successful_requests,
+                **usage,
                 "execution_time": execution_time
             }
         }
\ No newline at end of file
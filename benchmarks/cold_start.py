@@ -0,0 +1,46 @@
+"""
+Measures cold-start time of the command-line entry points in fresh interpreters.
+
+Usage: python -m benchmarks.cold_start [<language> <folder_path>] [runs]
+"""
+import statistics
+import subprocess
+import sys
+import time
+
+def measure(command, runs: int):
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = subprocess.run(command, capture_output=True)
+        timings.append(time.perf_counter() - start)
+        if result.returncode != 0:
+            return None, result.stderr.decode("utf8", errors="replace").strip().splitlines()[-1]
+    return statistics.median(timings), None
+
+def main():
+    runs = 5
+    commands = {
+        "python (baseline)": [sys.executable, "-c", "pass"],
+        "import code_analyzer": [sys.executable, "-c", "import code_analyzer"],
+        "gen_doc.py --help": [sys.executable, "gen_doc.py", "--help"],
+        "qa.py --help": [sys.executable, "qa.py", "--help"],
+    }
+    if len(sys.argv) >= 3:
+        language, folder_path = sys.argv[1], sys.argv[2]
+        runs = int(sys.argv[3]) if len(sys.argv) > 3 else runs
+        commands[f"parse {language} folder"] = [
+            sys.executable, "-c",
+            f"from code_analyzer import parse_folder; parse_folder({language!r}, {folder_path!r}, workers=0)"
+        ]
+
+    print(f"Median of {runs} runs")
+    for name, command in commands.items():
+        median, error = measure(command, runs)
+        if median is None:
+            print(f"{name:>24}: failed ({error})")
+        else:
+            print(f"{name:>24}: {median * 1000:8.1f} ms")
+
+if __name__ == "__main__":
+    main()
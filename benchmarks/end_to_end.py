@@ -0,0 +1,128 @@
+"""
+Measures the parse, index, tool and orchestration overhead of the pipelines on synthetic Java
+repositories, with the offline fake LLM (see fake_llm.py) instead of a provider.
+
+Orchestration overhead is the time of the crews minus the time spent in LLM calls and tools:
+what crewai and the agents code add around them.
+
+Usage: python -m benchmarks.end_to_end [--sizes 1000,10000,100000] [--pipelines qa,gen_doc] [--latency 0]
+"""
+import argparse
+import os
+import tempfile
+import time
+
+import yaml
+
+from benchmarks.synthetic_repo import ROOT_NAMESPACES, RepoShape, write_repo
+from code_analyzer import generate_metadata, resolve_references
+from tracing import configure_tracer
+
+ROOT_NAMESPACE = ROOT_NAMESPACES["java"]
+QUESTION = "Which services depend on Service0 and how are they called?"
+
+def timed(timings, name, function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    timings[name] = time.perf_counter() - start
+    return result
+
+def write_fake_llms(file_path: str, tool_arguments, latency: float):
+    llm_info = {"provider": "fake", "latency": latency, "answer_tokens": 400, "tool_arguments": tool_arguments}
+    with open(file_path, 'w') as file:
+        yaml.safe_dump({"chat": {**llm_info, "model": "chat"}, "tool": {**llm_info, "model": "tool"}}, file)
+
+def run_qa(metadata, folder_path: str, output_dir: str, llms_file: str):
+    from qa import GenerationOptions, question_answering
+
+    options = GenerationOptions(
+        language="java",
+        root_namespace=ROOT_NAMESPACE,
+        output_file=os.path.join(output_dir, "answer"),
+        folder_path=folder_path,
+        question=QUESTION,
+        llms_file=llms_file,
+    )
+    question_answering(metadata, options)
+
+def run_gen_doc(metadata, folder_path: str, output_dir: str, llms_file: str):
+    from gen_doc import DocumentationWorkflow, GenerationOptions
+
+    options = GenerationOptions(
+        language="java",
+        root_namespace=ROOT_NAMESPACE,
+        output_dir=output_dir,
+        folder_path=folder_path,
+        llms_file=llms_file,
+    )
+    workflow = DocumentationWorkflow(metadata, options)
+    # Diagram rendering is measured by benchmarks.plantuml_render
+    workflow._render_diagram = lambda plantuml_text, output_file: None
+    workflow.generate()
+
+PIPELINES = {"qa": run_qa, "gen_doc": run_gen_doc}
+
+def benchmark(size: int, pipelines, latency: float):
+    from code_meta import CodeMeta
+    from code_meta_tool import (DetectModulesTool, FindDependencyCyclesTool, FindDependencyPathTool,
+                                GetClassesMetaTool, GetCodeMetricsTool, GetDependenciesTool, GetFileSourcesTool,
+                                GetNamespacesMetaTool, GetTransitiveDependenciesTool, ListNamespacesTool,
+                                SearchSymbolsTool)
+    from prompt_profiler import sample_tool_arguments
+
+    timings = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        folder_path = os.path.join(work_dir, "src")
+        timed(timings, "generate repo", write_repo, folder_path, "java", RepoShape(classes=size))
+
+        metadata = timed(timings, "parse", generate_metadata, "java", folder_path)
+        timed(timings, "resolve references", resolve_references, metadata, ROOT_NAMESPACE)
+
+        code_meta = CodeMeta(metadata, "java")
+        timed(timings, "index: list_namespaces", code_meta.list_namespaces)
+        timed(timings, "index: dependency graphs", lambda: code_meta.dependency_graphs)
+        timed(timings, "index: metrics", lambda: code_meta.metrics)
+        timed(timings, "index: symbols", lambda: code_meta.symbol_index)
+
+        tool_arguments = sample_tool_arguments(code_meta)
+        tools = [ListNamespacesTool(code_meta), GetNamespacesMetaTool(code_meta), GetClassesMetaTool(code_meta),
+                 GetFileSourcesTool(code_meta, folder_path), DetectModulesTool(code_meta),
+                 GetDependenciesTool(code_meta), FindDependencyPathTool(code_meta),
+                 GetTransitiveDependenciesTool(code_meta), FindDependencyCyclesTool(code_meta),
+                 GetCodeMetricsTool(code_meta), SearchSymbolsTool(code_meta)]
+        for tool in tools:
+            if tool.name in tool_arguments:
+                timed(timings, f"tool: {tool.name}", tool._run, **tool_arguments[tool.name])
+
+        llms_file = os.path.join(work_dir, "llms.yaml")
+        write_fake_llms(llms_file, tool_arguments, latency)
+        for name in pipelines:
+            output_dir = os.path.join(work_dir, name)
+            os.makedirs(output_dir, exist_ok=True)
+            tracer = configure_tracer(enabled=True)
+            timed(timings, f"pipeline: {name}", PIPELINES[name], metadata, folder_path, output_dir, llms_file)
+            summary = tracer.summary()
+            crews = summary.get("crew", {}).get("seconds", 0.0)
+            llm = summary.get("llm", {}).get("seconds", 0.0)
+            tool_seconds = summary.get("tool", {}).get("seconds", 0.0)
+            timings[f"pipeline: {name}: llm calls ({summary.get('llm', {}).get('count', 0)})"] = llm
+            timings[f"pipeline: {name}: tool calls ({summary.get('tool', {}).get('count', 0)})"] = tool_seconds
+            timings[f"pipeline: {name}: orchestration"] = crews - llm - tool_seconds
+        configure_tracer(enabled=False)
+    return timings
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end benchmark on synthetic repositories.")
+    parser.add_argument("--sizes", default="1000,10000,100000", help="Comma separated numbers of classes")
+    parser.add_argument("--pipelines", default="qa,gen_doc", help=f"Comma separated pipelines among {', '.join(PIPELINES)}")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds per fake LLM answer")
+    args = parser.parse_args()
+
+    pipelines = [name for name in args.pipelines.split(",") if name]
+    for size in (int(size) for size in args.sizes.split(",")):
+        print(f"{size} classes")
+        for name, seconds in benchmark(size, pipelines, args.latency).items():
+            print(f"{name:>48}: {seconds * 1000:10.1f} ms")
+
+if __name__ == "__main__":
+    main()
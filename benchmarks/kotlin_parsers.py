@@ -0,0 +1,68 @@
+"""
+Compares the Kotlin parser backends on a folder of Kotlin sources.
+
+Usage: python -m benchmarks.kotlin_parsers <folder_path> [repeat]
+"""
+import sys
+import time
+
+from code_analyzer import create_parser, process_files_in_folder
+from parser_registry import KOTLIN_PARSERS
+
+def benchmark(backend: str, sources, repeat: int):
+    code_parser, _ = create_parser("kotlin", backend)
+    timings = []
+    results = {}
+    errors = 0
+    for file_path, source_code in sources:
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            try:
+                results[file_path] = code_parser.parse_source(source_code, file_path)
+            except Exception:
+                errors += 1
+                break
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        if best is not None:
+            timings.append(best)
+    return timings, results, errors
+
+def count_members(namespace):
+    classes = namespace.classes.values()
+    return len(namespace.classes), sum(len(c.methods) for c in classes)
+
+def main():
+    if len(sys.argv) < 2:
+        print("Usage: python -m benchmarks.kotlin_parsers <folder_path> [repeat]")
+        sys.exit(1)
+    folder_path = sys.argv[1]
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    sources = []
+    for file_path in process_files_in_folder(folder_path, (".kt",)):
+        with open(file_path, 'rb') as file:
+            sources.append((file_path, file.read()))
+    total_bytes = sum(len(source) for _, source in sources)
+    print(f"{len(sources)} files, {total_bytes / 1024:.1f} KiB, best of {repeat}")
+
+    results = {}
+    for backend in KOTLIN_PARSERS:
+        timings, results[backend], errors = benchmark(backend, sources, repeat)
+        total = sum(timings)
+        print(f"{backend:>12}: {total * 1000:9.1f} ms total, "
+              f"{len(timings) / total if total else 0:9.1f} files/s, "
+              f"max {max(timings, default=0) * 1000:7.2f} ms/file, {errors} errors")
+
+    # Structural agreement between backends on files both could parse
+    kopyt, tree_sitter = results["kopyt"], results["tree-sitter"]
+    common = kopyt.keys() & tree_sitter.keys()
+    mismatched = [path for path in common
+                  if count_members(kopyt[path]) != count_members(tree_sitter[path])]
+    print(f"Class/method counts agree on {len(common) - len(mismatched)} of {len(common)} files")
+    for path in mismatched:
+        print(f"  {path}: kopyt={count_members(kopyt[path])} tree-sitter={count_members(tree_sitter[path])}")
+
+if __name__ == "__main__":
+    main()
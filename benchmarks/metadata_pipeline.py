@@ -0,0 +1,170 @@
+"""
+Measures the metadata pipeline (parsing, reference resolution, list_namespaces and module
+detection) on synthetic source trees, and compares the results with a stored baseline.
+
+Each language runs in a fresh process, so that its peak RSS is its own. Times are the best of
+the repeats. With --baseline, stages that got slower (or bigger) than the tolerance allows are
+reported and the exit code is 1.
+
+The sizes of the import and class dependency graphs are reported with the results. Python trees
+have an import graph but no class edges: the Python parser records no attribute or parameter
+types, so for Python resolve_references measures little work and only parsing, list_namespaces and
+detect_modules are comparable with the other languages.
+
+Usage: python -m benchmarks.metadata_pipeline [--languages java,kotlin,php,python] [--classes 10000]
+       [--depth 3] [--imports 3] [--fan-out 2] [--repeat 3] [--workers N]
+       [--save-baseline baseline.json] [--baseline baseline.json] [--tolerance 0.25]
+"""
+import argparse
+import json
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from typing import Dict, List, Optional
+
+from benchmarks.synthetic_repo import LANGUAGES, ROOT_NAMESPACES, RepoShape, add_shape_arguments, shape_from_args, write_repo
+
+STAGES = ("parse", "resolve_references", "list_namespaces", "detect_modules")
+DEFAULT_TOLERANCE = 0.25
+# Differences below these are noise, whatever the ratio
+MIN_REGRESSION_SECONDS = 0.05
+MIN_REGRESSION_MIB = 10
+
+def peak_rss_mib(who: int) -> float:
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    peak = resource.getrusage(who).ru_maxrss
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+def measure(language: str, shape: RepoShape, repeat: int, workers: Optional[int]) -> Dict:
+    """
+    Generates a tree and times the stages on it; runs in its own process.
+    """
+    from code_analyzer import namespace_dependencies, parse_folder, resolve_references
+    from code_meta import CodeMeta
+    from dependency_graph import build_dependency_graphs
+    # Imported by detect_modules on first use: not part of what is measured
+    import community
+    import networkx
+
+    best = {stage: float("inf") for stage in STAGES}
+    with tempfile.TemporaryDirectory() as folder_path:
+        start = time.perf_counter()
+        write_repo(folder_path, language, shape)
+        generate_seconds = time.perf_counter() - start
+        for _ in range(repeat):
+            timings = {}
+            start = time.perf_counter()
+            metadata, report = parse_folder(language, folder_path, workers=workers)
+            timings["parse"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            resolve_references(metadata, ROOT_NAMESPACES[language])
+            timings["resolve_references"] = time.perf_counter() - start
+
+            code_meta = CodeMeta(metadata, language)
+            start = time.perf_counter()
+            code_meta.list_namespaces()
+            timings["list_namespaces"] = time.perf_counter() - start
+
+            start = time.perf_counter()
+            modules = code_meta.detect_modules()
+            timings["detect_modules"] = time.perf_counter() - start
+
+            best = {stage: min(best[stage], timings[stage]) for stage in STAGES}
+        class_graph, _ = build_dependency_graphs(metadata)
+
+    return {
+        "files": report.total_files,
+        "parse_errors": len(report.errors),
+        "namespaces": len(metadata),
+        "modules": len(modules),
+        "import_edges": len(namespace_dependencies(metadata)),
+        "class_edges": class_graph.edge_count,
+        "generate_seconds": round(generate_seconds, 3),
+        "files_per_second": round(report.total_files / best["parse"], 1) if best["parse"] else 0.0,
+        "stages": {stage: round(seconds, 4) for stage, seconds in best.items()},
+        "peak_rss_mib": round(peak_rss_mib(resource.RUSAGE_SELF), 1),
+        "worker_peak_rss_mib": round(peak_rss_mib(resource.RUSAGE_CHILDREN), 1),
+    }
+
+def compare(results: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    """
+    Returns the regressions of results against a baseline, as readable lines.
+    """
+    regressions = []
+    for language, result in results.items():
+        base = baseline.get("results", {}).get(language)
+        if not base:
+            continue
+        for stage, seconds in result["stages"].items():
+            base_seconds = base["stages"].get(stage)
+            if (base_seconds is not None and seconds > base_seconds * (1 + tolerance)
+                    and seconds - base_seconds > MIN_REGRESSION_SECONDS):
+                regressions.append(f"{language} {stage}: {base_seconds * 1000:.1f} ms -> {seconds * 1000:.1f} ms "
+                                   f"({seconds / base_seconds - 1:+.0%})")
+        base_rss, rss = base.get("peak_rss_mib"), result["peak_rss_mib"]
+        if base_rss and rss > base_rss * (1 + tolerance) and rss - base_rss > MIN_REGRESSION_MIB:
+            regressions.append(f"{language} peak RSS: {base_rss:.1f} MiB -> {rss:.1f} MiB ({rss / base_rss - 1:+.0%})")
+    return regressions
+
+def print_results(results: Dict, baseline: Optional[Dict]):
+    for language, result in results.items():
+        base = (baseline or {}).get("results", {}).get(language, {})
+        print(f"{language}: {result['files']} files, {result['namespaces']} namespaces, {result['modules']} modules, "
+              f"{result['parse_errors']} parse errors")
+        print(f"{'graph edges':>24}: {result['import_edges']} between namespaces, {result['class_edges']} between classes")
+        print(f"{'files/s':>24}: {result['files_per_second']:10.1f}")
+        for stage, seconds in result["stages"].items():
+            base_seconds = base.get("stages", {}).get(stage)
+            change = f"  ({seconds / base_seconds - 1:+.0%})" if base_seconds else ""
+            print(f"{stage:>24}: {seconds * 1000:10.1f} ms{change}")
+        print(f"{'peak RSS':>24}: {result['peak_rss_mib']:10.1f} MiB (parse workers {result['worker_peak_rss_mib']:.1f} MiB)")
+
+def main():
+    parser = argparse.ArgumentParser(description="Metadata pipeline benchmark on synthetic source trees.")
+    parser.add_argument("--languages", default=",".join(LANGUAGES), help="Comma separated languages")
+    add_shape_arguments(parser)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, help="Parse worker processes (0 parses in-process)")
+    parser.add_argument("--baseline", help="Baseline JSON file to compare with")
+    parser.add_argument("--save-baseline", help="Write the results to this baseline JSON file")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="Allowed slowdown before a stage is a regression (0.25 is 25%%)")
+    args = parser.parse_args()
+
+    shape = shape_from_args(args)
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, 'r') as file:
+            baseline = json.load(file)
+        if baseline.get("shape") != asdict(shape):
+            print(f"Warning: the baseline was measured with another shape: {baseline.get('shape')}")
+
+    results = {}
+    context = multiprocessing.get_context("spawn")
+    for language in args.languages.split(","):
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results[language] = executor.submit(measure, language, shape, args.repeat, args.workers).result()
+
+    print(f"{shape.classes} classes, depth {shape.depth}, {shape.imports_per_class} imports per class, "
+          f"fan-out {shape.calls_per_method}, best of {args.repeat}")
+    print_results(results, baseline)
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as file:
+            json.dump({"shape": asdict(shape), "results": results}, file, indent=2)
+        print(f"Baseline written to {args.save_baseline}")
+    if baseline:
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regression against {args.baseline} (tolerance {args.tolerance:.0%})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""
+Measures single-process parser throughput for a language on a folder of sources.
+
+Usage: python -m benchmarks.parser_throughput <language> <folder_path> [repeat]
+"""
+import sys
+import time
+
+from code_analyzer import create_parser, process_files_in_folder
+
+def main():
+    if len(sys.argv) < 3:
+        print("Usage: python -m benchmarks.parser_throughput <language> <folder_path> [repeat]")
+        sys.exit(1)
+    language = sys.argv[1].lower()
+    folder_path = sys.argv[2]
+    repeat = int(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    code_parser, extensions = create_parser(language)
+    sources = []
+    for file_path in process_files_in_folder(folder_path, extensions):
+        with open(file_path, 'rb') as file:
+            sources.append((file_path, file.read()))
+    total_bytes = sum(len(source) for _, source in sources)
+
+    best = None
+    classes = methods = 0
+    for _ in range(repeat):
+        classes = methods = 0
+        start = time.perf_counter()
+        for file_path, source_code in sources:
+            namespace = code_parser.parse_source(source_code, file_path)
+            classes += len(namespace.classes)
+            methods += sum(len(c.methods) for c in namespace.classes.values())
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    print(f"{language}: {len(sources)} files, {total_bytes / 1024:.1f} KiB, "
+          f"{classes} classes, {methods} methods")
+    print(f"{best * 1000:.1f} ms (best of {repeat}), "
+          f"{len(sources) / best if best else 0:.1f} files/s, "
+          f"{total_bytes / 1024 / 1024 / best if best else 0:.2f} MiB/s")
+
+if __name__ == "__main__":
+    main()
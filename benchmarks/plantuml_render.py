@@ -0,0 +1,59 @@
+"""
+Compares rendering diagrams through a PlantUML server with a pool of local PlantUML processes.
+
+Usage: python -m benchmarks.plantuml_render [--server URL] [--jar plantuml.jar] [--workers N] [--count N]
+"""
+import argparse
+import time
+
+from plantuml import PlantUML
+from plantuml_renderer import LocalPlantUML
+
+DIAGRAM = """@startuml
+!include <C4/C4_Container>
+title Benchmark diagram {index}
+Person(user, "User {index}")
+System_Boundary(app, "Application") {{
+  Container(web, "Web", "Python", "Serves pages")
+  ContainerDb(db, "Database", "PostgreSQL", "Stores data")
+}}
+Rel(user, web, "Uses")
+Rel(web, db, "Reads and writes")
+@enduml
+"""
+
+def measure(name, render):
+    start = time.perf_counter()
+    try:
+        images = render()
+    except Exception as e:
+        print(f"{name:>24}: failed ({getattr(e, 'message', e)})")
+        return
+    elapsed = time.perf_counter() - start
+    print(f"{name:>24}: {elapsed * 1000:8.1f} ms total, {elapsed * 1000 / len(images):7.1f} ms/diagram")
+
+def main():
+    parser = argparse.ArgumentParser(description="PlantUML rendering benchmark.")
+    parser.add_argument("--server", help="PlantUML server URL, e.g. http://localhost:8000/plantuml/png/")
+    parser.add_argument("--jar", help="Path to plantuml.jar")
+    parser.add_argument("--java", default="java", help="Java executable")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--count", type=int, default=12)
+    args = parser.parse_args()
+
+    # Distinct texts so that no server-side cache is hit
+    diagrams = [DIAGRAM.format(index=i) for i in range(args.count)]
+
+    if args.server:
+        server = PlantUML(url=args.server)
+        measure("server (sequential)", lambda: [server.processes(d) for d in diagrams])
+    if args.jar:
+        local = LocalPlantUML(args.jar, workers=args.workers, java=args.java)
+        # The first diagram per process pays the JVM start, so warm the pool separately
+        measure("local (warm-up)", lambda: local.processes_many(diagrams[:args.workers]))
+        measure("local (sequential)", lambda: [local.processes(d) for d in diagrams])
+        measure(f"local ({args.workers} processes)", lambda: local.processes_many(diagrams))
+        local.close()
+
+if __name__ == "__main__":
+    main()
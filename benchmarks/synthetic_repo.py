@@ -0,0 +1,185 @@
+"""
+Generates synthetic Java, Kotlin, PHP and Python source trees of a configurable size, package
+depth, import density and call fan-out, for benchmarks.
+
+Packages are grouped in modules: classes mostly import classes of their own module, so that
+module detection has communities to find. The output only depends on the shape.
+
+Usage: python -m benchmarks.synthetic_repo <folder_path> [--language java] [--classes 1000] ...
+"""
+import argparse
+import os
+import random
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List
+
+LANGUAGES = ("java", "kotlin", "php", "python")
+ROOT_NAMESPACES = {"java": "com.synthetic", "kotlin": "com.synthetic", "php": "Synthetic", "python": "synthetic"}
+EXTENSIONS = {"java": ".java", "kotlin": ".kt", "php": ".php", "python": ".py"}
+# Base of the intermediate package levels: area0 .. area2
+AREAS_PER_LEVEL = 3
+
+@dataclass
+class RepoShape:
+    classes: int = 1000
+    depth: int = 3                      # Package levels below the root namespace, at least 2 (module and package)
+    classes_per_package: int = 20
+    packages_per_module: int = 10
+    methods_per_class: int = 5
+    imports_per_class: int = 3          # Import density
+    calls_per_method: int = 2           # Call fan-out
+    cross_module_imports: float = 0.1   # Share of the imports that cross module boundaries
+    seed: int = 42
+
+@dataclass
+class SyntheticClass:
+    package: List[str]                  # Package path below the root namespace
+    name: str
+    imports: List['SyntheticClass'] = field(default_factory=list)
+
+    @property
+    def field_name(self) -> str:
+        return self.name[0].lower() + self.name[1:]
+
+def package_path(package_index: int, shape: RepoShape) -> List[str]:
+    module_index = package_index // shape.packages_per_module
+    path = [f"module{module_index}"]
+    index_in_module = package_index % shape.packages_per_module
+    for level in range(max(0, shape.depth - 2)):
+        path.append(f"area{index_in_module // AREAS_PER_LEVEL ** level % AREAS_PER_LEVEL}")
+    path.append(f"package{package_index}")
+    return path
+
+def generate_classes(shape: RepoShape) -> List[SyntheticClass]:
+    rng = random.Random(shape.seed)
+    classes = [SyntheticClass(package_path(i // shape.classes_per_package, shape), f"Service{i}")
+               for i in range(shape.classes)]
+    module_size = shape.classes_per_package * shape.packages_per_module
+    for i, synthetic_class in enumerate(classes):
+        module_start = i // module_size * module_size
+        module_end = min(module_start + module_size, shape.classes)
+        for _ in range(shape.imports_per_class):
+            if rng.random() < shape.cross_module_imports:
+                target = rng.randrange(shape.classes)
+            else:
+                target = rng.randrange(module_start, module_end)
+            if target != i and classes[target] not in synthetic_class.imports:
+                synthetic_class.imports.append(classes[target])
+    return classes
+
+def calls(synthetic_class: SyntheticClass, method: int, shape: RepoShape):
+    """
+    The (field, method index) pairs a method calls: fan-out calls spread over the imported classes.
+    """
+    if not synthetic_class.imports:
+        return []
+    return [(synthetic_class.imports[(method + c) % len(synthetic_class.imports)].field_name,
+             (method + c) % shape.methods_per_class)
+            for c in range(shape.calls_per_method)]
+
+def java_source(synthetic_class: SyntheticClass, shape: RepoShape) -> str:
+    root = ROOT_NAMESPACES["java"]
+    lines = [f"package {'.'.join([root] + synthetic_class.package)};", ""]
+    lines.extend(f"import {'.'.join([root] + imported.package)}.{imported.name};" for imported in synthetic_class.imports)
+    lines.extend(["import java.util.List;", "", f"public class {synthetic_class.name} {{"])
+    lines.extend(f"    private {imported.name} {imported.field_name};" for imported in synthetic_class.imports)
+    for m in range(shape.methods_per_class):
+        lines.extend(["", f"    public List<String> handle{m}(String request, int limit) {{"])
+        lines.extend(f"        {field_name}.handle{target}(request, limit);" for field_name, target in calls(synthetic_class, m, shape))
+        lines.extend(["        return List.of(request);", "    }"])
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def kotlin_source(synthetic_class: SyntheticClass, shape: RepoShape) -> str:
+    root = ROOT_NAMESPACES["kotlin"]
+    lines = [f"package {'.'.join([root] + synthetic_class.package)}", ""]
+    lines.extend(f"import {'.'.join([root] + imported.package)}.{imported.name}" for imported in synthetic_class.imports)
+    parameters = ", ".join(f"private val {imported.field_name}: {imported.name}" for imported in synthetic_class.imports)
+    lines.extend(["", f"class {synthetic_class.name}({parameters}) {{"])
+    for m in range(shape.methods_per_class):
+        lines.extend(["", f"    fun handle{m}(request: String, limit: Int): List<String> {{"])
+        lines.extend(f"        {field_name}.handle{target}(request, limit)" for field_name, target in calls(synthetic_class, m, shape))
+        lines.extend(["        return listOf(request)", "    }"])
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def php_source(synthetic_class: SyntheticClass, shape: RepoShape) -> str:
+    def namespace(path: List[str]) -> str:
+        return "\\".join([ROOT_NAMESPACES["php"]] + [part.capitalize() for part in path])
+
+    lines = ["<?php", "", f"namespace {namespace(synthetic_class.package)};", ""]
+    lines.extend(f"use {namespace(imported.package)}\\{imported.name};" for imported in synthetic_class.imports)
+    lines.extend(["", f"class {synthetic_class.name}", "{"])
+    lines.extend(f"    private {imported.name} ${imported.field_name};" for imported in synthetic_class.imports)
+    for m in range(shape.methods_per_class):
+        lines.extend(["", f"    public function handle{m}(string $request, int $limit): array", "    {"])
+        lines.extend(f"        $this->{field_name}->handle{target}($request, $limit);" for field_name, target in calls(synthetic_class, m, shape))
+        lines.extend(["        return [$request];", "    }"])
+    lines.append("}")
+    return "\n".join(lines) + "\n"
+
+def python_source(synthetic_class: SyntheticClass, shape: RepoShape) -> str:
+    # The Python parser names namespaces after the module file, so imports name the module only, and
+    # they give the import graph of module detection. It records no attribute or parameter types and
+    # drops call receivers, so the class graph of a Python tree has no edges (see metadata_pipeline).
+    lines = [f"from {imported.name.lower()} import {imported.name}" for imported in synthetic_class.imports]
+    parameters = "".join(f", {imported.field_name}: {imported.name}" for imported in synthetic_class.imports)
+    lines.extend(["", "", f"class {synthetic_class.name}:", f"    def __init__(self{parameters}):"])
+    lines.extend(f"        self.{imported.field_name} = {imported.field_name}" for imported in synthetic_class.imports)
+    if not synthetic_class.imports:
+        lines.append("        pass")
+    for m in range(shape.methods_per_class):
+        lines.extend(["", f"    def handle{m}(self, request: str, limit: int) -> list:"])
+        lines.extend(f"        self.{field_name}.handle{target}(request, limit)" for field_name, target in calls(synthetic_class, m, shape))
+        lines.append("        return [request]")
+    return "\n".join(lines) + "\n"
+
+RENDERERS: Dict[str, Callable[[SyntheticClass, RepoShape], str]] = {
+    "java": java_source,
+    "kotlin": kotlin_source,
+    "php": php_source,
+    "python": python_source,
+}
+
+def file_name(synthetic_class: SyntheticClass, language: str) -> str:
+    name = synthetic_class.name.lower() if language == "python" else synthetic_class.name
+    return name + EXTENSIONS[language]
+
+def write_repo(folder_path: str, language: str = "java", shape: RepoShape = RepoShape()) -> List[SyntheticClass]:
+    """
+    Writes one file per class under folder_path and returns the classes.
+    """
+    render = RENDERERS[language]
+    classes = generate_classes(shape)
+    for synthetic_class in classes:
+        directory = os.path.join(folder_path, *synthetic_class.package)
+        os.makedirs(directory, exist_ok=True)
+        with open(os.path.join(directory, file_name(synthetic_class, language)), 'w') as file:
+            file.write(render(synthetic_class, shape))
+    return classes
+
+def add_shape_arguments(parser: argparse.ArgumentParser):
+    defaults = RepoShape()
+    parser.add_argument("--classes", type=int, default=defaults.classes, help="Number of classes")
+    parser.add_argument("--depth", type=int, default=defaults.depth, help="Package levels below the root namespace")
+    parser.add_argument("--imports", type=int, default=defaults.imports_per_class, help="Imports per class")
+    parser.add_argument("--fan-out", type=int, default=defaults.calls_per_method, help="Calls per method")
+    parser.add_argument("--seed", type=int, default=defaults.seed)
+
+def shape_from_args(args: argparse.Namespace) -> RepoShape:
+    return RepoShape(classes=args.classes, depth=args.depth, imports_per_class=args.imports,
+                     calls_per_method=args.fan_out, seed=args.seed)
+
+def main():
+    parser = argparse.ArgumentParser(description="Synthetic source tree generator.")
+    parser.add_argument("folder_path")
+    parser.add_argument("--language", choices=LANGUAGES, default="java")
+    add_shape_arguments(parser)
+    args = parser.parse_args()
+    shape = shape_from_args(args)
+    write_repo(args.folder_path, args.language, shape)
+    print(f"{shape.classes} {args.language} classes written to {args.folder_path} "
+          f"(root namespace {ROOT_NAMESPACES[args.language]})")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+import os
+import re
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+from code_analyzer import namespace_dependencies
+from metadata import Namespace
+
+def plantuml_alias(name: str) -> str:
+    return re.sub(r"\W", "_", name)
+
+def plural(count: int, word: str) -> str:
+    return f"{count} {word}" if count == 1 else f"{count} {word}es" if word.endswith("s") else f"{count} {word}s"
+
+def common_namespace(namespaces: List[str]) -> str:
+    """
+    Returns the longest namespace prefix shared by all namespaces, e.g. "com.app" for "com.app.a" and "com.app.b".
+    """
+    return ".".join(os.path.commonprefix([namespace.split(".") for namespace in namespaces]))
+
+class C4DiagramGenerator:
+    """
+    Builds C4 component diagrams from the detected modules and the import dependencies between
+    their namespaces, without an LLM. Elements and relations are sorted, so the same code always
+    gives the same diagram text (and hits in the diagram cache).
+    """
+    def __init__(self, metadata: Dict[str, Namespace], modules: Dict[int, List[str]], system_name: str):
+        """
+        :param metadata: A dictionary mapping namespace names to Namespace objects.
+        :param modules: Module id -> namespaces, as returned by CodeMeta.detect_modules.
+        :param system_name: Name of the system, used in diagram titles.
+        """
+        self.metadata = metadata
+        self.modules = {module_id: sorted(namespaces) for module_id, namespaces in modules.items()}
+        self.system_name = system_name
+        self.module_of = {namespace: module_id for module_id, namespaces in self.modules.items() for namespace in namespaces}
+        self.dependencies = namespace_dependencies(metadata)
+
+    def module_name(self, module_id: int) -> str:
+        return common_namespace(self.modules[module_id]) or f"Module {module_id}"
+
+    def _module_alias(self, module_id: int) -> str:
+        return f"module_{module_id}"
+
+    def module_relations(self, module_id: int) -> Dict[Tuple[str, str], int]:
+        """
+        Returns the relations of a module's diagram as (source alias, target alias) -> number of imports.
+        Namespaces of other modules are collapsed into their module.
+        """
+        relations = defaultdict(int)
+        for (source, target), weight in self.dependencies.items():
+            source_module, target_module = self.module_of.get(source), self.module_of.get(target)
+            if None in (source_module, target_module) or module_id not in (source_module, target_module):
+                continue
+            source_alias = plantuml_alias(source) if source_module == module_id else self._module_alias(source_module)
+            target_alias = plantuml_alias(target) if target_module == module_id else self._module_alias(target_module)
+            relations[(source_alias, target_alias)] += weight
+        return dict(sorted(relations.items()))
+
+    def component_diagram(self, module_id: int) -> str:
+        """
+        Returns the PlantUML C4 component diagram of a module: its namespaces as components,
+        the modules it depends on (or that depend on it) as containers, and the imports between them.
+        """
+        namespaces = self.modules[module_id]
+        relations = self.module_relations(module_id)
+        external_modules = sorted({
+            self.module_of[name] for pair in self.dependencies for name in pair
+            if name in self.module_of and module_id in (self.module_of.get(pair[0]), self.module_of.get(pair[1]))
+        } - {module_id})
+        module_name = self.module_name(module_id)
+
+        lines = [
+            "@startuml",
+            "set separator none",
+            f"title {self.system_name} - {module_name}",
+            "",
+            "left to right direction",
+            "",
+            "!include <C4/C4_Component>",
+            "",
+        ]
+        for other_id in external_modules:
+            lines.append(f'Container({self._module_alias(other_id)}, "{self.module_name(other_id)}", '
+                         f'$descr="{plural(len(self.modules[other_id]), "namespace")}")')
+        lines.append(f'Container_Boundary({self._module_alias(module_id)}_boundary, "{module_name}") {{')
+        for namespace in namespaces:
+            label = namespace[len(module_name):].lstrip(".") if namespace.startswith(module_name) else namespace
+            label = label or namespace.rsplit(".", 1)[-1]
+            classes = plural(len(self.metadata[namespace].classes), "class")
+            lines.append(f'  Component({plantuml_alias(namespace)}, "{label}", $techn="{namespace}", $descr="{classes}")')
+        lines.append("}")
+        lines.append("")
+        for (source, target), weight in relations.items():
+            lines.append(f'Rel({source}, {target}, "Uses", $techn="{plural(weight, "import")}")')
+        lines.append("")
+        lines.append("SHOW_LEGEND(true)")
+        lines.append("@enduml")
+        return "\n".join(lines) + "\n"
@@ -1,16 +1,29 @@
 import json
+import logging
 import os
 import sys
 import traceback
-from typing import Dict
+from collections import defaultdict
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Mapping, Optional, Tuple
 
-from parsers.java_parser import JavaCodeParser
 from metadata import Namespace
 
 from code_parser import CodeParser
-from parsers.kotlin_parser import KotlinCodeParser
-from parsers.php_parser import PhpCodeParser
-from parsers.python_parser import PythonCodeParser
+from dependency_graph import ReferenceResolver
+from parser_registry import DEFAULT_KOTLIN_PARSER, KOTLIN_PARSERS, ParserSet, get_parser_spec
+from parse_pool import ParsePool, STATUS_ERROR, STATUS_OK
+from metadata_store import STORE_EXTENSION, MetadataStore, MetadataStoreError, write_store
+from snapshot import SNAPSHOT_EXTENSION, Snapshot, SnapshotError, write_snapshot
+from tracing import traced
+from utils import open_source
+
+# Maximum time in seconds to parse a single file
+PARSE_TIMEOUT = 60
+# Number of parser worker processes
+PARSE_WORKERS = os.cpu_count() or 1
+
+logger = logging.getLogger(__name__)
 
 # Utility functions
 def save_metadata(metadata_dict, output_path):
@@ -27,83 +40,243 @@ def process_files_in_folder(folder_path, extensions):
             if file.endswith(extensions):
                 yield os.path.join(root, file)
 
-def generate_metadata(language: str, folder_path: str) -> Dict[str, Namespace]:
+def create_parser(language: str, backend: Optional[str] = None) -> Tuple[CodeParser, Tuple[str, ...]]:
     """
-    Generates metadata for a given folder path and extensions.
+    Returns the parser and the file extensions for a given language.
+    """
+    spec = get_parser_spec(language, backend)
+    return spec.create(), spec.extensions
+
+def create_parser_set(language: str, kotlin_parser: str = DEFAULT_KOTLIN_PARSER) -> ParserSet:
+    """
+    Returns the parsers for a language, a comma separated list of languages or "auto".
+    """
+    return ParserSet(language, {"kotlin": kotlin_parser})
+
+def parse_file(parsers: ParserSet, file_path: str, folder_path: str) -> Namespace:
+    """
+    Reads and parses a single source file with the parser registered for its extension.
+    """
+    code_parser = parsers.parser_for(file_path)
+    relative_path = os.path.relpath(file_path, folder_path)
+    with open_source(file_path) as source_code:
+        return code_parser.parse_source(source_code, relative_path)
+
+@dataclass
+class FileParseError:
+    file_path: str
+    reason: str  # "error", "timeout" or "crash"
+    message: str
+    traceback: str = ""
+
+@dataclass
+class ParseReport:
+    """
+    Outcome of a metadata generation run: how many files were parsed and which ones failed.
+    """
+    total_files: int = 0
+    parsed_files: int = 0
+    errors: List[FileParseError] = field(default_factory=list)
+
+    def to_dict(self):
+        return {
+            "total_files": self.total_files,
+            "parsed_files": self.parsed_files,
+            "failed_files": len(self.errors),
+            "errors": [asdict(error) for error in self.errors]
+        }
+
+    def summary(self) -> str:
+        lines = [f"Parsed {self.parsed_files} of {self.total_files} files, {len(self.errors)} failed."]
+        for error in self.errors:
+            lines.append(f"  [{error.reason}] {error.file_path}: {error.message}")
+        return "\n".join(lines)
+
+def parse_folder(language: str, folder_path: str,
+                 workers: Optional[int] = None,
+                 timeout: Optional[float] = PARSE_TIMEOUT,
+                 kotlin_parser: str = DEFAULT_KOTLIN_PARSER) -> Tuple[Dict[str, Namespace], ParseReport]:
     """
-    code_parser: CodeParser
-    if language == "kotlin":
-        code_parser = KotlinCodeParser()
-        extensions = (".kt",)
-    elif language == "php":
-        code_parser = PhpCodeParser()
-        extensions = (".php",)
-    elif language == "java":
-        code_parser = JavaCodeParser()
-        extensions = (".java",)
-    elif language == "python":
-        code_parser = PythonCodeParser()
-        extensions = (".py",)
+    Parses every source file in a folder and returns the merged namespaces along with a report
+    of the files that failed. A failing file never aborts the run.
+
+    :param language: A language, a comma separated list of languages, or "auto" for all of them.
+    :param workers: Number of worker processes; 0 parses in-process (no timeout enforcement).
+    :param timeout: Maximum time in seconds to parse a single file.
+    :param kotlin_parser: Kotlin parser backend, one of KOTLIN_PARSERS.
+    """
+    parsers = create_parser_set(language, kotlin_parser)
+    file_paths = list(process_files_in_folder(folder_path, parsers.extensions))
+    workers = PARSE_WORKERS if workers is None else workers
+
+    report = ParseReport(total_files=len(file_paths))
+    results: Dict[int, Namespace] = {}
+
+    def record_error(index, reason, message, trace):
+        report.errors.append(FileParseError(file_paths[index], reason, message, trace))
+        logger.debug(f"Error processing file {file_paths[index]}: {message}")
+
+    if workers == 0:
+        for index, file_path in enumerate(file_paths):
+            try:
+                results[index] = parse_file(parsers, file_path, folder_path)
+            except Exception as e:
+                record_error(index, STATUS_ERROR, f"{type(e).__name__}: {e}", traceback.format_exc())
     else:
-        raise ValueError(f"Unsupported language: {language}")
-    
+        pool = ParsePool(language, folder_path, workers, timeout, kotlin_parser)
+        for index, status, payload in pool.imap(file_paths):
+            if status == STATUS_OK:
+                results[index] = payload
+            else:
+                record_error(index, status, *payload)
+
+    # Merge in file order so the output does not depend on worker scheduling
     namespaces = {}
-    for file_path in process_files_in_folder(folder_path, extensions):
-        #print(f"Processing file: {file_path}")
-        try:
-            with open(file_path, 'r') as file:
-                source_code = file.read()
+    for index in sorted(results):
+        metadata = results[index]
+        namespace_name = metadata.name
+        if namespace_name in namespaces:
+            namespaces[namespace_name].merge_namespace(metadata)
+        else:
+            namespaces[namespace_name] = metadata
 
-            # Parse the source code to get metadata
-            relative_path = os.path.relpath(file_path, folder_path)
-            metadata = code_parser.parse_source(source_code, relative_path)
+    report.parsed_files = len(results)
+    report.errors.sort(key=lambda error: error.file_path)
+    return namespaces, report
 
-            # Merge namespaces
-            namespace_name = metadata.name
-            if namespace_name in namespaces:
-                namespaces[namespace_name].merge_namespace(metadata)
-            else:
-                namespaces[namespace_name] = metadata
+@traced("analysis")
+def generate_metadata(language: str, folder_path: str,
+                      kotlin_parser: str = DEFAULT_KOTLIN_PARSER) -> Dict[str, Namespace]:
+    """
+    Generates metadata for a given folder path and extensions.
+    Files that fail to parse are reported and skipped.
+    """
+    namespaces, report = parse_folder(language, folder_path, kotlin_parser=kotlin_parser)
+    if report.errors:
+        print(report.summary())
+    return namespaces
 
-        except Exception as file_error:
-            print(f"Error processing file {file_path}: {file_error}")
-            traceback.print_exc()
-            sys.exit(1)
+def load_metadata(language: str, folder_path: str, root_namespace: str,
+                  kotlin_parser: str = DEFAULT_KOTLIN_PARSER,
+                  snapshot_path: Optional[str] = None) -> Mapping[str, Namespace]:
+    """
+    Returns the resolved metadata of a folder. With a snapshot path, starts from the snapshot when
+    it was written for the same folder and options, and otherwise parses the folder and writes it.
+    Paths ending with STORE_EXTENSION are SQLite stores (see metadata_store), others snapshots.
+    """
+    info = {
+        "language": language,
+        "folder_path": os.path.abspath(folder_path),
+        "root_namespace": root_namespace,
+        "kotlin_parser": kotlin_parser,
+    }
+    is_store = bool(snapshot_path) and snapshot_path.endswith(STORE_EXTENSION)
+    if snapshot_path and os.path.exists(snapshot_path):
+        try:
+            snapshot = MetadataStore(snapshot_path) if is_store else Snapshot(snapshot_path)
+        except (OSError, SnapshotError, MetadataStoreError) as e:
+            logger.warning(f"Cannot read snapshot {snapshot_path}, parsing the folder again: {e}")
+        else:
+            if all(snapshot.info.get(key) == value for key, value in info.items()):
+                logger.info(f"Metadata loaded from {snapshot}")
+                return snapshot
+            logger.warning(f"Snapshot {snapshot_path} was written for another folder or options, parsing the folder again")
+            snapshot.close()
 
+    namespaces = generate_metadata(language, folder_path, kotlin_parser)
+    resolve_references(namespaces, root_namespace)
+    if snapshot_path:
+        (write_store if is_store else write_snapshot)(snapshot_path, namespaces, info)
+        logger.info(f"Metadata snapshot written to {snapshot_path}")
     return namespaces
 
+def find_namespace(name: str, namespace_names) -> Optional[str]:
+    """
+    Returns the longest known namespace that a qualified name (e.g. an import) belongs to.
+    """
+    tokens = name.split('.')
+    for i in range(len(tokens), 0, -1):
+        candidate = '.'.join(tokens[:i])
+        if candidate in namespace_names:
+            return candidate
+    return None
+
+def namespace_dependencies(namespaces: Dict[str, Namespace]) -> Dict[Tuple[str, str], int]:
+    """
+    Returns the dependencies between namespaces as (source, target) -> number of imports
+    of target in source, sorted for a stable output.
+    """
+    dependencies = defaultdict(int)
+    for name in sorted(namespaces):
+        for import_name in namespaces[name].imports:
+            target = find_namespace(import_name, namespaces)
+            if target and target != name:
+                dependencies[(name, target)] += 1
+    return dict(sorted(dependencies.items()))
+
+@traced("analysis")
 def resolve_references(namespaces: Dict[str, Namespace], root_namespace: str):
     """
     Resolves references and adds dependencies between classes.
+
+    Invocations whose target class is known are rewritten as `namespace.Class.method`; the others
+    are qualified with the namespace that imports them, or the current namespace. Each class
+    records the classes it depends on through attribute and parameter types and invocations.
     """
+    resolver = ReferenceResolver(namespaces)
     for namespace in namespaces.values():
-        for class_metadata in namespace.classes.values():
+        for class_name, class_metadata in namespace.classes.items():
+            qualified_name = f"{namespace.name}.{class_name}"
+
+            def add_dependencies(targets):
+                for target in targets:
+                    if target != qualified_name:
+                        class_metadata.add_dependency(target)
+
+            for attribute in class_metadata.attributes:
+                add_dependencies(resolver.resolve_type(attribute["type"], namespace))
             for method in class_metadata.methods:
+                for parameter in method["parameters"]:
+                    add_dependencies(resolver.resolve_type(parameter.get("type"), namespace))
+
                 resolved_invocations = []
-                for invocation in method['invoked_methods']:
+                for invocation in method["invoked_methods"]:
+                    target = resolver.resolve_invocation(invocation, namespace, class_name, method)
+                    if target:
+                        target_class, member = target
+                        resolved_invocations.append(f"{target_class}.{member}")
+                        add_dependencies([target_class])
+                        continue
                     # Attempt to resolve the fully qualified name
-                    resolved = False
                     for import_statement in namespace.imports:
-                        if invocation.startswith(import_statement.split('.')[-1]):
-                            resolved_invocations.append(import_statement + '.' + invocation)
-                            resolved = True
+                        imported_name = import_statement.split('.')[-1]
+                        if invocation.startswith(imported_name + '.'):
+                            resolved_invocations.append(import_statement + invocation[len(imported_name):])
                             break
-                    if not resolved:
+                    else:
                         # If not resolved, assume it's within the same namespace
                         resolved_invocations.append(namespace.name + '.' + invocation)
-                    # Add dependency between classes
-                    class_metadata.add_dependency(invocation)
-                    method['invoked_methods'] = resolved_invocations
+                method["invoked_methods"] = resolved_invocations
 
 def main():
-    if len(sys.argv) != 5:
-        print("Usage: python code_analyzer.py <language> <folder_path> <root_namespace> <output_file>")
+    args = sys.argv[1:]
+    kotlin_parser = DEFAULT_KOTLIN_PARSER
+    if "--kotlin-parser" in args:
+        index = args.index("--kotlin-parser")
+        kotlin_parser = args[index + 1] if index + 1 < len(args) else None
+        del args[index:index + 2]
+    if len(args) != 4 or kotlin_parser not in KOTLIN_PARSERS:
+        print("Usage: python code_analyzer.py [--kotlin-parser <backend>] <language[,language...]|auto> <folder_path> "
+              "<root_namespace> <output_file>")
+        print(f"Output files ending with {SNAPSHOT_EXTENSION} are written as binary snapshots, with {STORE_EXTENSION} "
+              f"as SQLite stores, otherwise as JSON.")
+        print(f"Kotlin parser backends: {', '.join(KOTLIN_PARSERS)} (defaults to {DEFAULT_KOTLIN_PARSER}).")
         sys.exit(1)
 
-    language = sys.argv[1].lower()
-    folder_path = sys.argv[2]
-    root_namespace = sys.argv[3]
-    output_file = sys.argv[4]
+    language = args[0].lower()
+    folder_path = args[1]
+    root_namespace = args[2]
+    output_file = args[3]
 
     try:
         if not os.path.exists(folder_path):
@@ -111,9 +284,24 @@ def main():
         if not os.path.isdir(folder_path):
             raise NotADirectoryError(f"The path {folder_path} is not a directory.")
 
-        namespaces = generate_metadata(language, folder_path)
+        namespaces, report = parse_folder(language, folder_path, kotlin_parser=kotlin_parser)
+        if report.errors:
+            print(report.summary())
+            save_metadata(report.to_dict(), f"{output_file}.errors.json")
+            print(f"Parse errors saved to {output_file}.errors.json")
         resolve_references(namespaces, root_namespace)
         
+        info = {"language": language, "folder_path": os.path.abspath(folder_path),
+                "root_namespace": root_namespace, "kotlin_parser": kotlin_parser}
+        if output_file.endswith(SNAPSHOT_EXTENSION):
+            write_snapshot(output_file, namespaces, info)
+            print(f"Metadata snapshot saved to {output_file}")
+            return
+        if output_file.endswith(STORE_EXTENSION):
+            write_store(output_file, namespaces, info)
+            print(f"Metadata store saved to {output_file}")
+            return
+
         # Step 3: Convert namespaces to a dictionary format and save
         merged_metadata = {ns_name: ns_obj.to_dict() for ns_name, ns_obj in namespaces.items()}
         save_metadata(merged_metadata, output_file)
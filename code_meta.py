@@ -0,0 +1,318 @@
+import logging
+from collections import defaultdict
+from typing import Dict, List, Mapping, Optional, Tuple
+
+from code_analyzer import namespace_dependencies
+from dependency_graph import DependencyGraph, build_dependency_graphs
+from metrics_index import MetricsIndex
+from metadata import Namespace, Span
+from symbol_index import SymbolIndex
+from tracing import get_tracer, traced
+
+logger = logging.getLogger(__name__)
+
+# Seed of the community detection, so that modules are the same between runs
+MODULES_RANDOM_STATE = 42
+
+class CodeMeta:
+    """
+    Refactored CodeMeta to accept a dictionary of Namespace objects instead of JSON.
+
+    The metadata may also be a lazy store (a mapping such as snapshot.Snapshot) that decodes
+    namespaces on access: queries then only load the namespaces they touch. The overview, direct
+    dependencies, dependency graphs and namespace dependencies come from the store's summaries(),
+    direct_dependencies(), dependency_graphs() and namespace_dependencies() when it has them
+    (see metadata_store.MetadataStore).
+    """
+    def __init__(self, metadata: Mapping[str, Namespace], language: str = "auto"):
+        """
+        :param metadata: A mapping of namespace names to Namespace objects.
+        :param language: Language of the code, as given to the analysis; selects the entry point rules.
+        """
+        self.metadata = metadata
+        self.language = language
+        self._summaries = None
+        self._dependency_graphs = None
+        self._metrics = None
+        self._symbol_index = None
+
+    @property
+    def namespace_summaries(self) -> Dict[str, dict]:
+        """
+        Namespace.summary() of every namespace, kept in memory once computed.
+        """
+        if self._summaries is None:
+            summaries = getattr(self.metadata, "summaries", None)
+            if summaries is not None:
+                self._summaries = summaries()
+            else:
+                self._summaries = {name: namespace.summary() for name, namespace in self.metadata.items()}
+        return self._summaries
+
+    @traced("code_meta")
+    def list_namespaces(self) -> Dict:
+        """
+        Return a JSON-like dict with overview for each namespace.
+        """
+        namespaces = self.namespace_summaries
+        return {
+            "total_namespaces": len(namespaces),
+            "namespaces": namespaces
+        }
+
+    def get_namespace_meta(self, namespace: str) -> Optional[dict]:
+        """
+        Return imports and classes for a given namespace in the metadata.
+        """
+        if namespace not in self.metadata:
+            return None
+
+        namespace_obj = self.metadata[namespace]
+        ns_dict = namespace_obj.to_dict()
+        response = {
+            "namespace": namespace,
+            "imports": ns_dict.get("imports", []),
+            "classes": ns_dict.get("classes", {})
+        }
+        return response
+    
+    def get_children_namespaces(self, namespace: str) -> List:
+        """
+        Return a list of child namespaces for a given namespace.
+        """
+        children = []
+        for ns in self.metadata.keys():
+            if ns.startswith(namespace) and ns != namespace:
+                children.append(ns)
+        return children
+    
+    @traced("code_meta")
+    def get_namespaces_meta(self, namespaces: List[str]) -> Dict:
+        """
+        Return metadata for a list of namespaces.
+        """
+        response = {}
+        for namespace_name in namespaces:
+            namespace = self.get_namespace_meta(namespace_name)
+            if namespace:
+                response[namespace_name] = namespace
+            else:
+                children = self.get_children_namespaces(namespace_name)
+                for child in children:
+                    child_namespace = self.get_namespace_meta(child)
+                    if child_namespace:
+                        response[child] = child_namespace
+            
+        return response
+
+    @traced("code_meta")
+    def get_classes_meta(self, fully_qualified_names: List[str]) -> Dict:
+        """
+        Return metadata for a given classes, each specified as a fully qualified name (including namespace).
+        """
+        namespaces = {}
+        for fq_name in fully_qualified_names:
+            if '.' not in fq_name:
+                continue
+            namespace, class_name = fq_name.rsplit('.', 1)
+            if namespace not in self.metadata:
+                continue
+            namespace_obj = self.metadata[namespace]
+            class_data = namespace_obj.get_class(class_name)
+            if class_data:
+                if namespace not in namespaces:
+                    namespaces[namespace] = {
+                        "imports": sorted(namespace_obj.imports),
+                        "classes": {}
+                    }
+                namespaces[namespace]["classes"][class_name] = class_data
+        
+        return namespaces
+
+    @property
+    def dependency_graphs(self) -> Tuple[DependencyGraph, DependencyGraph]:
+        """
+        The class and method dependency graphs, built on first use.
+        """
+        if self._dependency_graphs is None:
+            stored_graphs = getattr(self.metadata, "dependency_graphs", None)
+            with get_tracer().span("build_dependency_graphs", "code_meta"):
+                self._dependency_graphs = stored_graphs() if stored_graphs else build_dependency_graphs(self.metadata)
+        return self._dependency_graphs
+
+    @property
+    def metrics(self) -> MetricsIndex:
+        """
+        The structural metrics index, computed on first use.
+        """
+        if self._metrics is None:
+            class_graph = self.dependency_graphs[0]
+            with get_tracer().span("build_metrics_index", "code_meta"):
+                self._metrics = MetricsIndex(self.metadata, class_graph, language=self.language)
+        return self._metrics
+
+    @traced("code_meta")
+    def get_code_metrics(self, scope: str = "summary", names: Optional[List[str]] = None,
+                         order_by: str = "name", limit: Optional[int] = None) -> Dict:
+        """
+        Return precomputed metrics: a summary, namespace or class metrics tables, cycles or entry-point candidates.
+        """
+        metrics = self.metrics
+        if scope == "summary":
+            return metrics.summary()
+        if scope == "namespaces":
+            return metrics.namespace_rows(limit, order_by, names)
+        if scope == "classes":
+            return metrics.class_rows(limit, order_by, names)
+        if scope == "cycles":
+            return {"namespace_cycles": metrics.namespace_cycles, "class_cycles": metrics.class_cycles[:limit]}
+        if scope == "entry_points":
+            return metrics.entry_point_rows(limit)
+        return {"error": f"Unknown scope: {scope}"}
+
+    @traced("code_meta")
+    def find_source_spans(self, names: List[str]) -> Tuple[List[Tuple[str, Optional[Span], str]], List[str]]:
+        """
+        Return (file path, span, name) of classes and methods given by fully qualified name
+        (all overloads of a method), and the names that are unknown or have no file.
+        """
+        found, unknown = [], []
+        for name in names:
+            # `namespace.Class`, or else `namespace.Class.method`
+            prefix, _, last_name = name.rpartition('.')
+            class_metadata = self.metadata[prefix].classes.get(last_name) if prefix in self.metadata else None
+            if class_metadata and class_metadata.file_path:
+                found.append((class_metadata.file_path, class_metadata.span, name))
+                continue
+            namespace, _, class_name = prefix.rpartition('.')
+            method_name = last_name
+            class_metadata = self.metadata[namespace].classes.get(class_name) if namespace in self.metadata else None
+            methods = [method for method in class_metadata.methods if method["name"] == method_name] if class_metadata else []
+            if methods and class_metadata.file_path:
+                found.extend((class_metadata.file_path, method.get("span"), name) for method in methods)
+            else:
+                unknown.append(name)
+        return found, unknown
+
+    @property
+    def symbol_index(self) -> SymbolIndex:
+        """
+        The symbol search index, built on first use.
+        """
+        if self._symbol_index is None:
+            with get_tracer().span("build_symbol_index", "code_meta"):
+                self._symbol_index = SymbolIndex(self.metadata)
+        return self._symbol_index
+
+    @traced("code_meta")
+    def search_symbols(self, query: str, kinds: Optional[List[str]] = None, limit: int = 10) -> Dict:
+        """
+        Return the classes, methods, attributes and files best matching a partial, camelCase or misspelled name.
+        """
+        return {"query": query, "results": self.symbol_index.search(query, limit, kinds)}
+
+    def _graph_of(self, name: str) -> Optional[DependencyGraph]:
+        # Class names are looked up first, then `namespace.Class.method` names
+        for graph in self.dependency_graphs:
+            if name in graph:
+                return graph
+        return None
+
+    @traced("code_meta")
+    def get_dependencies(self, names: List[str]) -> Dict:
+        """
+        Return the direct dependencies and dependents of classes or methods, with their fan-out and fan-in.
+        """
+        # Indexed lookups in the store until the graphs are built for another query
+        direct_dependencies = getattr(self.metadata, "direct_dependencies", None)
+        response = {}
+        for name in names:
+            if direct_dependencies and self._dependency_graphs is None:
+                response[name] = direct_dependencies(name) or {"error": "Unknown class or method"}
+                continue
+            graph = self._graph_of(name)
+            if graph is None:
+                response[name] = {"error": "Unknown class or method"}
+                continue
+            response[name] = {
+                "fan_out": graph.fan_out(name),
+                "fan_in": graph.fan_in(name),
+                "depends_on": graph.successors(name),
+                "used_by": graph.predecessors(name),
+            }
+        return response
+
+    @traced("code_meta")
+    def find_dependency_path(self, source: str, target: str) -> Dict:
+        """
+        Return the shortest dependency chain from a class (or method) to another one.
+        """
+        graph = self._graph_of(source)
+        if graph is None or target not in graph:
+            unknown = source if graph is None else target
+            return {"error": f"Unknown class or method: {unknown}"}
+        return {"source": source, "target": target, "path": graph.shortest_path(source, target)}
+
+    @traced("code_meta")
+    def get_transitive_dependencies(self, name: str, reverse: bool = False) -> Dict:
+        """
+        Return everything a class (or method) depends on, directly or not; or everything that depends on it.
+        """
+        graph = self._graph_of(name)
+        if graph is None:
+            return {"error": f"Unknown class or method: {name}"}
+        reachable = graph.reachable(name, reverse=reverse)
+        return {
+            "name": name,
+            "direction": "dependents" if reverse else "dependencies",
+            "count": len(reachable),
+            "names": reachable,
+        }
+
+    @traced("code_meta")
+    def find_dependency_cycles(self) -> Dict:
+        """
+        Return the groups of classes that depend on each other.
+        """
+        cycles = self.dependency_graphs[0].cycles()
+        return {"total_cycles": len(cycles), "cycles": cycles}
+
+    @traced("code_meta")
+    def detect_modules(self) -> Dict[int, List[str]]:
+        """
+        Groups namespaces into modules by community detection on the import graph.
+        The result is deterministic: module ids are numbered in the order of their namespaces.
+        """
+        # Imported on first use to keep startup light
+        import networkx as nx
+        import community as community_louvain
+
+        # Weighted, undirected graph where nodes are namespaces and an edge between namespace A and B
+        # exists if A imports something from B (or vice-versa); the weight is the number of imports.
+        G = nx.Graph()
+        G.add_nodes_from(sorted(self.metadata))
+        stored_dependencies = getattr(self.metadata, "namespace_dependencies", None)
+        dependencies = stored_dependencies() if stored_dependencies else namespace_dependencies(self.metadata)
+        for (source, target), weight in dependencies.items():
+            if G.has_edge(source, target):
+                G[source][target]["weight"] += weight
+            else:
+                G.add_edge(source, target, weight=weight)
+
+        # Compute the best partition (a dict: namespace -> community id)
+        partition = community_louvain.best_partition(G, weight='weight', random_state=MODULES_RANDOM_STATE)
+        
+        # Compute the modularity of the partitioning.
+        try:
+            modularity = community_louvain.modularity(partition, G, weight='weight')
+            logger.info(f"Overall modularity: {modularity:.4f}")
+        except Exception as e:
+            logger.error(f"Error computing modularity: {e}")
+            modularity = 0.0
+        
+        # Group namespaces by community id.
+        communities = defaultdict(list)
+        for ns in sorted(partition):
+            communities[partition[ns]].append(ns)
+
+        return {module_id: namespaces for module_id, namespaces in enumerate(sorted(communities.values()))}
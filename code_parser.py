@@ -1,15 +1,109 @@
+import codecs
+import re
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Optional, Tuple, Union
 
-from metadata import Namespace
+from metadata import Namespace, Span
+
+# Source handed to a parser: decoded text, raw bytes or a buffer such as an mmap
+Source = Union[str, bytes, bytearray, memoryview]
+
+# Byte order marks, longest first so UTF-32 LE is not mistaken for UTF-16 LE
+BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+# PEP 263 style declaration, also used by editors for other languages
+CODING_RE = re.compile(rb"^[ \t\f]*(?:#|//|/\*).*?coding[:=][ \t]*([-\w.]+)", re.MULTILINE)
+# Assumed for sources that declare no encoding and are not valid UTF-8
+FALLBACK_ENCODING = "cp1252"
+
+def is_valid_utf8(source, chunk_size: int = 1 << 16) -> bool:
+    """
+    Validates UTF-8 in chunks so that large sources are never decoded as a whole.
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    view = memoryview(source)
+    try:
+        for offset in range(0, len(view), chunk_size):
+            decoder.decode(view[offset:offset + chunk_size])
+        decoder.decode(b"", final=True)
+        return True
+    except UnicodeDecodeError:
+        return False
+    finally:
+        view.release()
+
+def detect_encoding(source) -> Tuple[str, int]:
+    """
+    Detects the encoding of raw source bytes from a BOM, a coding declaration in the
+    first two lines, or UTF-8 validation; falls back to FALLBACK_ENCODING.
+    Returns the encoding and the BOM length.
+    """
+    head = bytes(source[:4])
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    first_lines = b"\n".join(bytes(source[:1024]).split(b"\n", 2)[:2])
+    match = CODING_RE.search(first_lines)
+    if match:
+        try:
+            return codecs.lookup(match.group(1).decode("ascii")).name, 0
+        except LookupError:
+            pass
+    return ("utf-8" if is_valid_utf8(source) else FALLBACK_ENCODING), 0
+
+def decode_text(data: bytes) -> str:
+    """
+    Decodes a slice of UTF-8 source, replacing invalid bytes instead of failing.
+    """
+    return data.decode("utf-8", errors="replace")
+
+def prepare_source(source_code: Source) -> Source:
+    """
+    Returns a UTF-8 buffer for tree-sitter, which lexes identifiers as UTF-8.
+    UTF-8 bytes and mmaps are handed over without copying (minus a BOM); text is encoded
+    and sources in any other detected encoding are transcoded.
+    """
+    if isinstance(source_code, str):
+        return source_code.encode("utf8")
+    encoding, bom_length = detect_encoding(source_code)
+    if encoding != "utf-8":
+        text = bytes(source_code[bom_length:]).decode(encoding, errors="replace")
+        return text.encode("utf8")
+    if bom_length:
+        return memoryview(source_code)[bom_length:]
+    return source_code
+
+def decode_source(source_code: Source) -> str:
+    """
+    Decodes a whole source, for parsers that do not work on bytes.
+    """
+    if isinstance(source_code, str):
+        return source_code
+    return decode_text(bytes(prepare_source(source_code)))
 
 class CodeParser(ABC):
     @abstractmethod
-    def parse_source(self, source_code: str, relative_file_path: Optional[str]) -> 'Namespace':
+    def parse_source(self, source_code: Source, relative_file_path: Optional[str]) -> 'Namespace':
         """Parse the source code and return metadata."""
         pass
 
     @abstractmethod
     def resolve_references(self, metadata, root_namespace):
         """Resolve references within the parsed metadata."""
-        pass
\ No newline at end of file
+        pass
+
+    def _prepare_source(self, source_code: Source) -> Source:
+        return prepare_source(source_code)
+
+    def _text(self, node) -> str:
+        """Decodes the text of a syntax node."""
+        return decode_text(node.text)
+
+    def _span(self, node) -> Span:
+        """Location of a syntax node in the prepared source."""
+        return Span(node.start_point[0] + 1, node.end_point[0] + 1, node.start_byte, node.end_byte)
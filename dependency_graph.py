@@ -0,0 +1,298 @@
+import re
+from array import array
+from collections import defaultdict, deque
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from metadata import ClassMetadata, Namespace
+
+# Receivers that refer to the class itself
+SELF_RECEIVERS = {"this", "self", "static", "super", "parent"}
+# Members that create an instance of the receiver class
+CONSTRUCTORS = {"constructor", "__construct"}
+
+TYPE_NAME_RE = re.compile(r"[A-Za-z_][\w.]*")
+
+def split_invocation(invocation: str) -> Tuple[Optional[str], str]:
+    """
+    Splits an invocation as recorded by the parsers into (receiver, member):
+    `recv::name` (PHP), `recv.name` (Kotlin) or a bare `name` (Java, Python).
+    """
+    if "::" in invocation:
+        receiver, member = invocation.rsplit("::", 1)
+        return receiver, member
+    if "." in invocation:
+        receiver, member = invocation.rsplit(".", 1)
+        return receiver, member
+    return None, invocation
+
+class ReferenceResolver:
+    """
+    Resolves type names and method invocations of parsed metadata to fully qualified class names,
+    using the imports and classes of the namespace and the declared types of attributes and parameters.
+    """
+    def __init__(self, namespaces: Dict[str, Namespace]):
+        self.classes: Dict[str, ClassMetadata] = {
+            f"{namespace.name}.{class_name}": class_metadata
+            for namespace in namespaces.values()
+            for class_name, class_metadata in namespace.classes.items()
+        }
+        self._by_simple_name = defaultdict(list)
+        for qualified_name in self.classes:
+            self._by_simple_name[qualified_name.rsplit(".", 1)[-1]].append(qualified_name)
+        self._methods: Dict[str, Set[str]] = {}
+        self._imports: Dict[str, Dict[str, str]] = {}
+
+    def _imported_names(self, namespace: Namespace) -> Dict[str, str]:
+        if namespace.name not in self._imports:
+            self._imports[namespace.name] = {
+                import_name.rsplit(".", 1)[-1]: import_name for import_name in sorted(namespace.imports)
+            }
+        return self._imports[namespace.name]
+
+    def method_names(self, qualified_class: str) -> Set[str]:
+        if qualified_class not in self._methods:
+            self._methods[qualified_class] = {method["name"] for method in self.classes[qualified_class].methods}
+        return self._methods[qualified_class]
+
+    def resolve_class(self, name: str, namespace: Namespace) -> Optional[str]:
+        """
+        Resolves a class name as written in the code: fully qualified, imported, in the same
+        namespace, or otherwise unique in the code base.
+        """
+        name = name.replace("\\", ".").strip(".")
+        if name in self.classes:
+            return name
+        head, _, rest = name.partition(".")
+        imported = self._imported_names(namespace).get(head)
+        if imported:
+            candidate = f"{imported}.{rest}" if rest else imported
+            if candidate in self.classes:
+                return candidate
+        candidate = f"{namespace.name}.{name}"
+        if candidate in self.classes:
+            return candidate
+        candidates = self._by_simple_name.get(name)
+        if candidates and len(candidates) == 1:
+            return candidates[0]
+        return None
+
+    def resolve_type(self, type_name: Optional[str], namespace: Namespace) -> List[str]:
+        """
+        Returns the known classes referenced by a type expression, e.g. `Map<String, Order>` or `?Order`.
+        """
+        if not type_name:
+            return []
+        resolved = []
+        for name in TYPE_NAME_RE.findall(type_name.replace("\\", ".")):
+            qualified_name = self.resolve_class(name, namespace)
+            if qualified_name and qualified_name not in resolved:
+                resolved.append(qualified_name)
+        return resolved
+
+    def resolve_invocation(self, invocation: str, namespace: Namespace, class_name: str,
+                           method: dict) -> Optional[Tuple[str, str]]:
+        """
+        Returns (qualified class, member) for an invocation made in a method, or None when
+        the target class cannot be determined.
+        """
+        own_class = f"{namespace.name}.{class_name}"
+        receiver, member = split_invocation(invocation)
+        class_metadata = self.classes.get(own_class)
+
+        if receiver is None:
+            # A bare call: a method of the class itself, or of the only held type that has it
+            if own_class in self.classes and member in self.method_names(own_class):
+                return own_class, member
+            held_types = []
+            for type_name in [attribute["type"] for attribute in class_metadata.attributes] + \
+                             [parameter.get("type") for parameter in method["parameters"]]:
+                for qualified_name in self.resolve_type(type_name, namespace):
+                    if qualified_name not in held_types and member in self.method_names(qualified_name):
+                        held_types.append(qualified_name)
+            return (held_types[0], member) if len(held_types) == 1 else None
+
+        if receiver in SELF_RECEIVERS:
+            return own_class, member
+
+        if member not in CONSTRUCTORS:
+            # A variable or attribute: resolve through its declared type
+            declared_types = {parameter["name"].lstrip("$"): parameter.get("type") for parameter in method["parameters"]}
+            if class_metadata:
+                for attribute in class_metadata.attributes:
+                    declared_types.setdefault(attribute["name"].lstrip("$"), attribute["type"])
+            resolved = self.resolve_type(declared_types.get(receiver), namespace)
+            if resolved:
+                return resolved[0], member
+
+        qualified_name = self.resolve_class(receiver, namespace)
+        return (qualified_name, member) if qualified_name else None
+
+def _compress(size: int, pairs: List[Tuple[int, int]]) -> Tuple[array, array]:
+    # Sorted (source, target) pairs -> offsets and targets arrays
+    offsets = array("i", [0]) * (size + 1)
+    targets = array("i", (target for _, target in pairs))
+    for source, _ in pairs:
+        offsets[source + 1] += 1
+    for i in range(size):
+        offsets[i + 1] += offsets[i]
+    return offsets, targets
+
+class DependencyGraph:
+    """
+    Directed graph of named nodes, stored as compressed adjacency arrays: the successors of node i
+    are targets[offsets[i]:offsets[i + 1]], and the predecessors are indexed the same way.
+    """
+    def __init__(self, nodes: Iterable[str], edges: Iterable[Tuple[str, str]]):
+        edges = list(edges)
+        self.nodes: List[str] = sorted(set(nodes).union(*edges))
+        self.index: Dict[str, int] = {name: i for i, name in enumerate(self.nodes)}
+        pairs = sorted({(self.index[source], self.index[target]) for source, target in edges})
+        self._offsets, self._targets = _compress(len(self.nodes), pairs)
+        self._reverse_offsets, self._reverse_targets = _compress(
+            len(self.nodes), sorted((target, source) for source, target in pairs))
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def edge_count(self) -> int:
+        return len(self._targets)
+
+    def _successors(self, i: int, reverse: bool = False):
+        offsets, targets = (self._reverse_offsets, self._reverse_targets) if reverse else (self._offsets, self._targets)
+        return targets[offsets[i]:offsets[i + 1]]
+
+    def successors(self, name: str) -> List[str]:
+        return [self.nodes[j] for j in self._successors(self.index[name])]
+
+    def predecessors(self, name: str) -> List[str]:
+        return [self.nodes[j] for j in self._successors(self.index[name], reverse=True)]
+
+    def fan_out(self, name: str) -> int:
+        i = self.index[name]
+        return self._offsets[i + 1] - self._offsets[i]
+
+    def fan_in(self, name: str) -> int:
+        i = self.index[name]
+        return self._reverse_offsets[i + 1] - self._reverse_offsets[i]
+
+    def shortest_path(self, source: str, target: str) -> Optional[List[str]]:
+        """
+        Returns the shortest chain of dependencies from source to target, or None.
+        """
+        start, goal = self.index[source], self.index[target]
+        parents = array("i", [-1]) * len(self.nodes)
+        parents[start] = start
+        queue = deque([start])
+        while queue:
+            i = queue.popleft()
+            if i == goal:
+                path = [i]
+                while path[-1] != start:
+                    path.append(parents[path[-1]])
+                return [self.nodes[j] for j in reversed(path)]
+            for j in self._successors(i):
+                if parents[j] == -1:
+                    parents[j] = i
+                    queue.append(j)
+        return None
+
+    def reachable(self, name: str, reverse: bool = False) -> List[str]:
+        """
+        Returns the transitive dependencies of a node (or its transitive dependents when reverse),
+        nearest first.
+        """
+        start = self.index[name]
+        seen = {start}
+        order = []
+        queue = deque([start])
+        while queue:
+            for j in self._successors(queue.popleft(), reverse):
+                if j not in seen:
+                    seen.add(j)
+                    order.append(j)
+                    queue.append(j)
+        return [self.nodes[j] for j in order]
+
+    def strongly_connected_components(self) -> List[List[str]]:
+        """
+        Tarjan's algorithm, iterative so that deep graphs do not hit the recursion limit.
+        """
+        size = len(self.nodes)
+        index = array("i", [-1]) * size
+        lowlink = array("i", [0]) * size
+        on_stack = bytearray(size)
+        stack, components = [], []
+        counter = 0
+        for root in range(size):
+            if index[root] != -1:
+                continue
+            work = [(root, 0)]
+            while work:
+                i, position = work.pop()
+                if position == 0:
+                    index[i] = lowlink[i] = counter
+                    counter += 1
+                    stack.append(i)
+                    on_stack[i] = 1
+                successors = self._successors(i)
+                for k in range(position, len(successors)):
+                    j = successors[k]
+                    if index[j] == -1:
+                        work.append((i, k + 1))
+                        work.append((j, 0))
+                        break
+                    if on_stack[j]:
+                        lowlink[i] = min(lowlink[i], index[j])
+                else:
+                    if lowlink[i] == index[i]:
+                        component = []
+                        while True:
+                            j = stack.pop()
+                            on_stack[j] = 0
+                            component.append(self.nodes[j])
+                            if j == i:
+                                break
+                        components.append(sorted(component))
+                    if work:
+                        parent = work[-1][0]
+                        lowlink[parent] = min(lowlink[parent], lowlink[i])
+        return components
+
+    def cycles(self) -> List[List[str]]:
+        """
+        Returns the groups of nodes that depend on each other (strongly connected components with
+        more than one node, or a node depending on itself), largest first.
+        """
+        cycles = [
+            component for component in self.strongly_connected_components()
+            if len(component) > 1 or self.index[component[0]] in self._successors(self.index[component[0]])
+        ]
+        return sorted(cycles, key=lambda component: (-len(component), component))
+
+def build_dependency_graphs(namespaces: Dict[str, Namespace]) -> Tuple[DependencyGraph, DependencyGraph]:
+    """
+    Builds the class and method dependency graphs from metadata processed by resolve_references.
+    Method nodes are named `namespace.Class.method`.
+    """
+    # One pass over the namespaces, keeping only names: lazily loaded metadata is not held in memory
+    classes = set()
+    class_edges = []
+    method_nodes = []
+    method_edges = []
+    for namespace in namespaces.values():
+        for class_name, class_metadata in namespace.classes.items():
+            qualified_name = f"{namespace.name}.{class_name}"
+            classes.add(qualified_name)
+            class_edges.extend((qualified_name, dependency) for dependency in class_metadata.dependencies)
+            for method in class_metadata.methods:
+                method_name = f"{qualified_name}.{method['name']}"
+                method_nodes.append(method_name)
+                method_edges.extend((method_name, invocation) for invocation in method["invoked_methods"]
+                                    if isinstance(invocation, str))
+    class_edges = [(source, target) for source, target in class_edges if target in classes]
+    method_edges = [(source, target) for source, target in method_edges if target.rsplit(".", 1)[0] in classes]
+    return DependencyGraph(classes, class_edges), DependencyGraph(method_nodes, method_edges)
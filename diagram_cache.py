@@ -0,0 +1,117 @@
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from typing import Optional
+
+logger = logging.getLogger(__name__)
+
+# Default size limit of the cache directory
+DIAGRAM_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+def normalize_plantuml(plantuml_text: str) -> str:
+    """
+    Normalizes line endings and trailing whitespace, which do not change the image. Blank lines
+    are kept: they are part of notes, legends and multi-line labels.
+    """
+    lines = plantuml_text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    return "\n".join(line.rstrip() for line in lines).rstrip("\n")
+
+class DiagramCache:
+    """
+    Content-addressed store of rendered diagrams, keyed by the hash of the normalized PlantUML
+    text and the output format. Cached images are hard-linked (or copied) to their output file,
+    and the least recently used ones are evicted once the cache exceeds max_bytes.
+    """
+    def __init__(self, cache_dir: str, max_bytes: int = DIAGRAM_CACHE_MAX_BYTES):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(os.path.getsize(path) for path in self._entries())
+
+    def key(self, plantuml_text: str, image_format: str) -> str:
+        content = f"{image_format.lower().lstrip('.')}\0{normalize_plantuml(plantuml_text)}"
+        return hashlib.sha256(content.encode("utf8")).hexdigest()
+
+    def _path(self, key: str, image_format: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.{image_format.lower().lstrip('.')}")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for file in files:
+                if not file.startswith("."):
+                    yield os.path.join(root, file)
+
+    def get(self, plantuml_text: str, image_format: str) -> Optional[str]:
+        """
+        Returns the path of the cached image, or None.
+        """
+        path = self._path(self.key(plantuml_text, image_format), image_format)
+        with self._lock:
+            if os.path.exists(path):
+                self.hits += 1
+                os.utime(path)  # Mark as recently used
+                return path
+            self.misses += 1
+            return None
+
+    def put(self, plantuml_text: str, image_format: str, image: bytes) -> str:
+        """
+        Stores a rendered image and returns its path in the cache.
+        """
+        path = self._path(self.key(plantuml_text, image_format), image_format)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        # Write then rename, so concurrent runs never see a partial image
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        with os.fdopen(fd, "wb") as file:
+            file.write(image)
+        with self._lock:
+            existed = os.path.exists(path)
+            os.replace(tmp_path, path)
+            if not existed:
+                self._size += len(image)
+            if self._size > self.max_bytes:
+                self._evict(keep=path)
+        return path
+
+    def _evict(self, keep: str):
+        entries = sorted(self._entries(), key=lambda p: os.path.getmtime(p))
+        for path in entries:
+            if self._size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= size
+            self.evictions += 1
+
+    def link(self, cached_path: str, output_file: str):
+        """
+        Places a cached image at output_file, hard-linked when possible.
+        """
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        try:
+            os.link(cached_path, output_file)
+        except OSError:
+            shutil.copyfile(cached_path, output_file)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def __repr__(self):
+        return (f"DiagramCache(hits={self.hits}, misses={self.misses}, "
+                f"hit_rate={self.hit_rate:.0%}, evictions={self.evictions}, "
+                f"size_bytes={self._size})")
@@ -0,0 +1,120 @@
+import re
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional
+
+from metadata import ClassMetadata, Namespace
+from parser_registry import resolve_languages
+from utils import read_yaml_file
+
+ENTRY_POINT_RULES_FILE = 'conf/entry_points.yaml'
+# Type of the web endpoint rules in conf/entry_points.yaml
+WEB_API_ENDPOINT = 'Web API Endpoint'
+
+def _compile(patterns: Optional[List[str]]) -> List[re.Pattern]:
+    return [re.compile(pattern) for pattern in patterns or []]
+
+def _matches(patterns: List[re.Pattern], name: str) -> bool:
+    # Annotations may be written fully qualified, e.g. org.springframework.web.bind.annotation.GetMapping
+    last = name.rsplit(".", 1)[-1]
+    return any(pattern.fullmatch(name) or pattern.fullmatch(last) for pattern in patterns)
+
+@dataclass
+class EntryPoint:
+    namespace: str
+    class_name: str
+    type: str
+    indicators: List[str] = field(default_factory=list)
+
+    @property
+    def name(self) -> str:
+        return f"{self.namespace}.{self.class_name}"
+
+class EntryPointRule:
+    """
+    Marks a class as an entry point of a given type when its stereotypes, its methods'
+    stereotypes, its method names or its name match the rule's patterns.
+    """
+    def __init__(self, type: str, class_stereotypes: Optional[List[str]] = None,
+                 method_stereotypes: Optional[List[str]] = None, methods: Optional[List[str]] = None,
+                 class_names: Optional[List[str]] = None):
+        self.type = type
+        self.class_stereotypes = _compile(class_stereotypes)
+        self.method_stereotypes = _compile(method_stereotypes)
+        self.methods = _compile(methods)
+        self.class_names = _compile(class_names)
+
+    def match(self, class_name: str, class_metadata: ClassMetadata) -> List[str]:
+        """
+        Returns the indicators that matched, empty when the class is not an entry point of this type.
+        """
+        indicators = [f"@{stereotype}" for stereotype in class_metadata.stereotypes
+                      if _matches(self.class_stereotypes, stereotype)]
+        for method in class_metadata.methods:
+            for stereotype in method.get("stereotypes", []):
+                if _matches(self.method_stereotypes, stereotype):
+                    indicators.append(f"@{stereotype} on {method['name']}()")
+            if _matches(self.methods, method["name"]):
+                indicators.append(f"{method['name']}() method")
+        if _matches(self.class_names, class_name):
+            indicators.append("class name")
+        return indicators
+
+class EntryPointDetector:
+    """
+    Finds entry points (web endpoints, message consumers, scheduled jobs, CLI apps) in the
+    metadata with per-language rules, without an LLM.
+    """
+    def __init__(self, rules: Dict[str, List[Dict]]):
+        """
+        :param rules: Language -> list of rule definitions (see conf/entry_points.yaml).
+        """
+        self.rules = {
+            language: [EntryPointRule(**definition) for definition in definitions or []]
+            for language, definitions in rules.items()
+        }
+
+    @classmethod
+    def from_yaml(cls, file_path: str = ENTRY_POINT_RULES_FILE) -> 'EntryPointDetector':
+        return cls(read_yaml_file(file_path))
+
+    def _rules_for(self, language: str) -> List[EntryPointRule]:
+        # Mixed-language code is matched with the rules of every language it may contain
+        rules = []
+        for name in resolve_languages(language):
+            rules.extend(self.rules.get(name, []))
+        return rules
+
+    def detect(self, namespaces: Dict[str, Namespace], language: str = "auto") -> List[EntryPoint]:
+        """
+        Returns the entry points sorted by namespace and class; a class matching several
+        rules is reported once per type.
+        """
+        rules = self._rules_for(language)
+        entry_points = []
+        for namespace_name in sorted(namespaces):
+            for class_name, class_metadata in sorted(namespaces[namespace_name].classes.items()):
+                # Rules of several languages may give the same type and indicators
+                by_type: Dict[str, Dict[str, None]] = {}
+                for rule in rules:
+                    for indicator in rule.match(class_name, class_metadata):
+                        by_type.setdefault(rule.type, {})[indicator] = None
+                for type, indicators in by_type.items():
+                    entry_points.append(EntryPoint(namespace_name, class_name, type, list(indicators)))
+        return entry_points
+
+def format_entry_points(entry_points: List[EntryPoint]) -> str:
+    """
+    Formats entry points as the markdown of the entry points document.
+    """
+    lines = ["## Entry Points"]
+    namespace = None
+    for entry_point in entry_points:
+        if entry_point.namespace != namespace:
+            namespace = entry_point.namespace
+            lines.append("")
+            lines.append(f"###  Namespace: `{namespace}`")
+        lines.append("")
+        lines.append(f"- **Class Name:** `{entry_point.class_name}`")
+        lines.append(f"- **Entry Point Type:** `{entry_point.type}`")
+        lines.append(f"- **Description:** Detected from {', '.join(entry_point.indicators)}.")
+    return "\n".join(lines) + "\n"
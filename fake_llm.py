@@ -0,0 +1,159 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from crewai.llms.base_llm import BaseLLM
+
+from rate_limiter import RateLimiter
+from tracing import get_tracer, payload_size
+from utils import CHARS_PER_TOKEN, estimate_tokens
+
+FAKE_PROVIDER = "fake"
+DEFAULT_ANSWER_TOKENS = 400
+DEFAULT_CONTEXT_WINDOW = 128000
+
+# Tools listed in the crewai prompt of a task
+TOOL_NAME_RE = re.compile(r"^Tool Name: (\S+)", re.MULTILINE)
+# crewai asks for a final answer when an agent runs out of iterations
+FINAL_ANSWER_REQUEST = "final answer"
+
+def as_messages(messages) -> List[Dict[str, str]]:
+    if isinstance(messages, str):
+        return [{"role": "user", "content": messages}]
+    return list(messages)
+
+def prompt_key(messages) -> str:
+    """
+    Key of a prompt in recorded responses: the hash of its messages.
+    """
+    content = json.dumps([(message.get("role"), message.get("content")) for message in as_messages(messages)])
+    return hashlib.sha256(content.encode("utf8")).hexdigest()
+
+class ResponseRecorder:
+    """
+    Appends prompt keys and responses of an LLM to a JSON lines file, for FakeLLM to replay.
+    """
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self._lock = threading.Lock()
+
+    def record(self, messages, response: str):
+        line = json.dumps({"key": prompt_key(messages), "response": response})
+        with self._lock, open(self.file_path, 'a') as file:
+            file.write(line + "\n")
+
+def load_responses(file_path: str) -> Dict[str, str]:
+    responses = {}
+    with open(file_path, 'r') as file:
+        for line in file:
+            if line.strip():
+                entry = json.loads(line)
+                responses[entry["key"]] = entry["response"]
+    return responses
+
+class FakeLLM(BaseLLM):
+    """
+    Local stand-in for an LLM provider, for benchmarks and offline runs: replays recorded
+    responses, and otherwise calls each tool of a task that has scripted arguments, once,
+    then gives a final answer of a fixed size. Answers take a configurable latency.
+    """
+    def __init__(self,
+                 model: str = "scripted",
+                 rate_limiter: Optional[RateLimiter] = None,
+                 responses_file: Optional[str] = None,
+                 tool_arguments: Optional[Dict[str, Dict[str, Any]]] = None,
+                 answer_tokens: int = DEFAULT_ANSWER_TOKENS,
+                 latency: float = 0.0,
+                 tokens_per_second: Optional[float] = None,
+                 context_window_size: int = DEFAULT_CONTEXT_WINDOW,
+                 temperature: Optional[float] = None):
+        """
+        :param responses_file: Recorded responses (see ResponseRecorder) to replay by prompt.
+        :param tool_arguments: Tool name -> arguments of its scripted call; other tools are not called.
+        :param answer_tokens: Size of the scripted final answers.
+        :param latency: Seconds before each answer.
+        :param tokens_per_second: Output speed, added to the latency when set.
+        """
+        super().__init__(model=f"{FAKE_PROVIDER}/{model}", temperature=temperature)
+        self.rate_limiter = rate_limiter
+        self.responses = load_responses(responses_file) if responses_file else {}
+        self.tool_arguments = tool_arguments or {}
+        self.answer_tokens = answer_tokens
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.context_window_size = context_window_size
+        self.max_tokens = None
+        self.calls = 0
+        self.replayed = 0
+        self.first_call_seconds = 0.0
+        self.call_seconds = 0.0
+
+    @classmethod
+    def from_config(cls, llm_info: Dict[str, Any], rate_limiter: Optional[RateLimiter] = None) -> 'FakeLLM':
+        """
+        Creates a fake LLM from its entry in conf/llms.yaml.
+        """
+        return cls(
+            model=llm_info.get('model', 'scripted'),
+            rate_limiter=rate_limiter,
+            responses_file=llm_info.get('responses'),
+            tool_arguments=llm_info.get('tool_arguments'),
+            answer_tokens=llm_info.get('answer_tokens', DEFAULT_ANSWER_TOKENS),
+            latency=llm_info.get('latency', 0.0),
+            tokens_per_second=llm_info.get('tokens_per_second'),
+            context_window_size=llm_info.get('context_window_size') or DEFAULT_CONTEXT_WINDOW,
+            temperature=llm_info.get('temperature'),
+        )
+
+    def _scripted_response(self, messages: List[Dict[str, str]]) -> str:
+        prompt = "\n".join(message.get("content") or "" for message in messages if message.get("role") != "assistant")
+        tools = [name for name in dict.fromkeys(TOOL_NAME_RE.findall(prompt)) if name in self.tool_arguments]
+        # Each tool call adds an assistant message with its observation
+        steps = sum(1 for message in messages if message.get("role") == "assistant")
+        last = (messages[-1].get("content") or "") if messages else ""
+        if steps < len(tools) and FINAL_ANSWER_REQUEST not in last.lower():
+            tool_name = tools[steps]
+            return (f"Thought: I need the output of {tool_name}\n"
+                    f"Action: {tool_name}\n"
+                    f"Action Input: {json.dumps(self.tool_arguments[tool_name])}")
+        words = "Scripted answer " + " ".join(f"word{i % 100}" for i in range(self.answer_tokens))
+        return f"Thought: I now know the final answer\nFinal Answer: {words[:self.answer_tokens * CHARS_PER_TOKEN].rstrip()}"
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        messages = as_messages(messages)
+        prompt_tokens = estimate_tokens(messages)
+        with get_tracer().span(self.model, "llm", prompt_chars=payload_size(messages)) as span:
+            throttled_seconds = self.rate_limiter.acquire(prompt_tokens) if self.rate_limiter else 0.0
+            start_time = time.monotonic()
+            response = self.responses.get(prompt_key(messages))
+            if response is None:
+                response = self._scripted_response(messages)
+            else:
+                self.replayed += 1
+            completion_tokens = estimate_tokens(response)
+            delay = self.latency + (completion_tokens / self.tokens_per_second if self.tokens_per_second else 0.0)
+            if delay > 0:
+                time.sleep(delay)
+            seconds = time.monotonic() - start_time
+            if self.calls == 0:
+                self.first_call_seconds = seconds
+            self.calls += 1
+            self.call_seconds += seconds
+            if self.rate_limiter:
+                self.rate_limiter.record(prompt_tokens, prompt_tokens + completion_tokens, seconds)
+            span.args.update(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                             completion_chars=len(response), throttled_seconds=round(throttled_seconds, 3))
+            return response
+
+    def supports_function_calling(self) -> bool:
+        # Tools are called through the text (ReAct) format, as with the other providers here
+        return False
+
+    def supports_stop_words(self) -> bool:
+        return False
+
+    def get_context_window_size(self) -> int:
+        return self.context_window_size
@@ -7,13 +7,16 @@ import logging
 from typing import Any, Dict, Optional
 from dataclasses import dataclass
 
-from code_analyzer import generate_metadata, resolve_references
-
-from code_meta_tool import CodeMeta, ListNamespacesTool
-from agents import AgentSystem
+from code_analyzer import load_metadata
 from metadata import Namespace
-from plantuml_tool import PlantUMLExportTool, createPlantUMLProcessor
-from utils import TokenStats, read_yaml_file, write_file
+from parser_registry import DEFAULT_KOTLIN_PARSER, KOTLIN_PARSERS
+from diagram_cache import DiagramCache
+from rate_limiter import configure_rate_limiter
+from tracing import TRACE_FORMATS, configure_tracer, get_tracer
+from utils import TokenStats, write_file
+
+# crewai, networkx and the PlantUML client are imported where they are used, so that argument
+# parsing and source scanning do not pay for them.
 
 MAX_RPM = 30
 
@@ -25,17 +28,41 @@ class GenerationOptions:
     root_namespace: str
     output_dir: str
     folder_path: str
-    plantuml_server: Optional[str] = None,
-    max_rpm: Optional[int] = None,
+    plantuml_server: Optional[str] = None
+    plantuml_jar: Optional[str] = None
+    diagram_cache_dir: Optional[str] = None
+    defer_rendering: bool = False
+    max_rpm: Optional[int] = None
+    max_tpm: Optional[int] = None
+    kotlin_parser: str = DEFAULT_KOTLIN_PARSER
+    llms_file: Optional[str] = None
+    dry_run: bool = False
     verbose: Optional[bool] = False
 
 class DocumentationWorkflow:
     def __init__(self, metadata: Dict[str, Namespace], options: GenerationOptions):
+        from agents import LLMS_FILE, AgentRuntime
+        from code_meta_tool import CodeMeta
+        from plantuml_renderer import RenderQueue
+        from plantuml_tool import createPlantUMLProcessor
+
         self.metadata = metadata
+        # Shared by the stages, so that graphs and metrics are computed once
+        self.code_meta = CodeMeta(metadata, options.language)
         self.options = options
-        self.plantuml_processor = createPlantUMLProcessor(options.plantuml_server)
+        self.plantuml_processor = createPlantUMLProcessor(options.plantuml_server, options.plantuml_jar)
+        self.diagram_cache = DiagramCache(options.diagram_cache_dir) if options.diagram_cache_dir else None
+        self.render_queue = RenderQueue(self.plantuml_processor, self.diagram_cache) if options.defer_rendering else None
+        self.render_failures = []
         self.verbose = self.options.verbose if self.options.verbose else False
         self.token_stats = TokenStats()
+        # One limiter, and one set of LLM clients and agents, for all the stages' crews
+        self.rate_limiter = configure_rate_limiter(options.max_rpm, options.max_tpm)
+        self.runtime = AgentRuntime(options.llms_file or LLMS_FILE, rate_limiter=self.rate_limiter)
+        self.profiler = None
+        if options.dry_run:
+            from prompt_profiler import PromptProfiler, sample_tool_arguments
+            self.profiler = PromptProfiler(self.runtime.agents_data, sample_tool_arguments(self.code_meta))
         logger.info(f"PlantUML server: {self.plantuml_processor.url}")
         
     def generate(self):
@@ -45,85 +72,124 @@ class DocumentationWorkflow:
         }
         
         print(f"Generating system overview documentation...")
-        results = self._generate_system_overview(inputs)
-        write_file(f'{self.options.output_dir}/system_overview.md', results.get('raw_output', ''))
+        with get_tracer().span("generate_system_overview", "stage"):
+            results = self._generate_system_overview(inputs)
+        self._write_doc('system_overview.md', results)
         
         print(f"Generating system architecture documentation...")
-        results = self._generate_system_architecture(inputs)
-        write_file(f'{self.options.output_dir}/system_architecture.md', results.get('raw_output', ''))
+        with get_tracer().span("generate_system_architecture", "stage"):
+            results = self._generate_system_architecture(inputs)
+        self._write_doc('system_architecture.md', results)
         
         print(f"Generating system components documentation...")
-        results = self._generate_system_components(inputs)
-        write_file(f'{self.options.output_dir}/system_components.md', results.get('raw_output', ''))
+        with get_tracer().span("generate_system_components", "stage"):
+            results = self._generate_system_components(inputs)
+        self._write_doc('system_components.md', results)
         
         print(f"Generating entry points documentation...")
-        results = self._identify_entry_points(inputs)
-        write_file(f'{self.options.output_dir}/entry_points.md', results.get('raw_output', ''))
+        with get_tracer().span("identify_entry_points", "stage"):
+            results = self._identify_entry_points(inputs)
+        self._write_doc('entry_points.md', results)
+
+        if self.profiler:
+            self.profiler.write(f'{self.options.output_dir}/prompt_profile.json')
+
+        if self.render_queue:
+            print("Waiting for diagram rendering...")
+            with get_tracer().span("wait_for_rendering", "stage"):
+                self.render_failures = self.render_queue.close()
+
+    def _write_doc(self, file_name: str, results: Dict[str, Any]):
+        # A dry run has no output to write
+        if not self.profiler:
+            write_file(f'{self.options.output_dir}/{file_name}', results.get('raw_output', ''))
+
+    def _run_agents(self, name: str, tasks_data: Dict[str, Any], inputs: Dict[str, Any],
+                    tools: Dict[str, Any] = {}, verbose: bool = False):
+        """
+        Runs a crew, or profiles its prompts in a dry run.
+        """
+        from agents import AgentSystem
+
+        if self.profiler:
+            self.profiler.profile(name, tasks_data, dict(inputs), tools, write_prompts=self.verbose)
+            return {"raw_output": ""}
+        agents = AgentSystem(name, self.runtime, tasks_data, tools=tools, verbose=verbose)
+        result = agents.execute(inputs)
+        self.token_stats.update(result.get('usage_metrics'))
+        return result
 
     def _generate_system_overview(self, inputs: Dict[str, Any]):
-        llms_data = read_yaml_file('conf/llms.yaml')
-        agents_data = read_yaml_file('conf/agents.yaml')
-        tasks_data = read_yaml_file('conf/task_system_overview.yaml')
+        from code_meta_tool import ListNamespacesTool
+        from plantuml_tool import PlantUMLExportTool
+
+        tasks_data = self.runtime.tasks_data('conf/task_system_overview.yaml')
 
-        code_meta = CodeMeta(self.metadata)
+        code_meta = self.code_meta
 
         tools = {
             "list_namespaces": ListNamespacesTool(code_meta),
-            "plantuml_export": PlantUMLExportTool(self.plantuml_processor, f'{self.options.output_dir}/c4_system_context.png')
+            "plantuml_export": PlantUMLExportTool(self.plantuml_processor, f'{self.options.output_dir}/c4_system_context.png', cache=self.diagram_cache, render_queue=self.render_queue)
         }
 
-        agents = AgentSystem("System Overview", 
-                             llms_data, agents_data, tasks_data, tools=tools,
-                             max_rpm=self.options.max_rpm, verbose=self.verbose)
-        result = agents.execute(inputs)
-        self.token_stats.update(result.get('usage_metrics'))
-        return result
+        return self._run_agents("System Overview", tasks_data, inputs, tools=tools, verbose=self.verbose)
 
     def _generate_system_architecture(self, inputs: Dict[str, Any]):
-        llms_data = read_yaml_file('conf/llms.yaml')
-        agents_data = read_yaml_file('conf/agents.yaml')
-        tasks_data = read_yaml_file('conf/task_system_architecture.yaml')
+        from code_meta_tool import GetCodeMetricsTool, ListNamespacesTool
+        from plantuml_tool import PlantUMLExportTool
+
+        tasks_data = self.runtime.tasks_data('conf/task_system_architecture.yaml')
 
-        code_meta = CodeMeta(self.metadata)
+        code_meta = self.code_meta
         
         tools = {
             "list_namespaces": ListNamespacesTool(code_meta),
-            "plantuml_export": PlantUMLExportTool(self.plantuml_processor, f'{self.options.output_dir}/c4_container_diagram.png')
+            "get_code_metrics": GetCodeMetricsTool(code_meta),
+            "plantuml_export": PlantUMLExportTool(self.plantuml_processor, f'{self.options.output_dir}/c4_container_diagram.png', cache=self.diagram_cache, render_queue=self.render_queue)
         }
 
-        agents = AgentSystem("System Architecture", llms_data, agents_data, tasks_data, tools=tools)
-        result = agents.execute(inputs)
-        self.token_stats.update(result.get('usage_metrics'))
-        return result
+        return self._run_agents("System Architecture", tasks_data, inputs, tools=tools)
+
+    def _render_diagram(self, plantuml_text: str, output_file: str):
+        from plantuml_renderer import render_to_file
+
+        if self.profiler:
+            return
+        if self.render_queue:
+            self.render_queue.submit(plantuml_text, output_file)
+            return
+        try:
+            render_to_file(self.plantuml_processor, plantuml_text, output_file, self.diagram_cache)
+        except Exception as e:
+            error_message = e.message if hasattr(e, 'message') else str(e)
+            print(f"Diagram rendering failed for {output_file}: {error_message}")
 
     def _generate_system_components(self, inputs: Dict[str, Any]):
-        llms_data = read_yaml_file('conf/llms.yaml')
-        agents_data = read_yaml_file('conf/agents.yaml')
-        tasks_data = read_yaml_file('conf/task_system_components.yaml')
+        from c4_generator import C4DiagramGenerator
+
+        tasks_data = self.runtime.tasks_data('conf/task_system_components.yaml')
 
-        code_meta = CodeMeta(self.metadata)
+        code_meta = self.code_meta
         raw_output = ""
         components = code_meta.detect_modules()
         if self.verbose:
             write_file('debug-detect_modules.json', json.dumps(components, indent=2))
+        # Component diagrams are generated from the import graph; the agents only document them
+        diagrams = C4DiagramGenerator(self.metadata, components, self.options.root_namespace)
         for component_id, namespaces in components.items():
-
-            tools = {
-                "plantuml_export": PlantUMLExportTool(self.plantuml_processor, f'{self.options.output_dir}/c4_component_{component_id}.png')
-            }
-            
             logger.debug(f"Analyzing component: {component_id}, namespaces: {namespaces}")
-            
+
+            component_diagram = diagrams.component_diagram(component_id)
+            self._render_diagram(component_diagram, f'{self.options.output_dir}/c4_component_{component_id}.png')
+
             meta_data_json = json.dumps(code_meta.get_namespaces_meta(namespaces), indent=None)
             
             inputs['component_id'] = component_id
+            inputs['component_diagram'] = component_diagram
             inputs['meta_data_json'] = meta_data_json
                 
-            agents = AgentSystem("System Components", llms_data, agents_data, tasks_data, tools=tools)
             try:
-                result = agents.execute(inputs)
-                self.token_stats.update(result.get('usage_metrics'))
-            
+                result = self._run_agents(f"System Components: {component_id}", tasks_data, inputs)
                 raw_output += '\n\n' + result.get('raw_output', '')
             except Exception as e:
                 traceback.print_exc()
@@ -132,19 +198,26 @@ class DocumentationWorkflow:
         return { "raw_output": raw_output }
 
     def _identify_entry_points(self, inputs: Dict[str, Any]):
-        llms_data = read_yaml_file('conf/llms.yaml')
-        agents_data = read_yaml_file('conf/agents.yaml')
-        tasks_data = read_yaml_file('conf/task_entry_points.yaml')
+        from code_meta_tool import GetCodeMetricsTool
+        from entry_points import WEB_API_ENDPOINT, EntryPointDetector, format_entry_points
 
-        code_meta = CodeMeta(self.metadata)
+        entry_points = EntryPointDetector.from_yaml().detect(self.metadata, self.options.language)
+        if any(entry_point.type == WEB_API_ENDPOINT for entry_point in entry_points):
+            return {"raw_output": format_entry_points(entry_points)}
+        # No web endpoint matched: the framework may be unknown, or its routes may not be in the
+        # metadata (e.g. module-level Flask or FastAPI functions). The agents look for them, starting
+        # from the entry points the rules found.
+        logger.info(f"No web endpoints matched the rules in conf/entry_points.yaml ({len(entry_points)} other "
+                    f"entry points did), using the agents")
+
+        tasks_data = self.runtime.tasks_data('conf/task_entry_points.yaml')
+
+        code_meta = self.code_meta
         tools = {
-            "list_namespaces": ListNamespacesTool(code_meta)
+            "get_code_metrics": GetCodeMetricsTool(code_meta)
         }
 
-        agents = AgentSystem("Identify Entry Points", llms_data, agents_data, tasks_data, tools=tools)
-        result = agents.execute(inputs)
-        self.token_stats.update(result.get('usage_metrics'))
-        return result
+        return self._run_agents("Identify Entry Points", tasks_data, inputs, tools=tools)
 
 def parse_args():
     parser = argparse.ArgumentParser(
@@ -154,7 +227,7 @@ def parse_args():
         "--language",
         "-l",
         required=True,
-        help="Programming language (e.g., 'java', 'python').",
+        help="Programming language (e.g., 'java', 'python'), a comma separated list, or 'auto' for mixed-language code.",
     )
     parser.add_argument(
         "--folder-path",
@@ -180,11 +253,68 @@ def parse_args():
         required=False,
         help="PlantUML server URL for generating diagrams.",
     )
+    parser.add_argument(
+        "--plantuml-jar",
+        required=False,
+        help="Path to plantuml.jar to render diagrams locally (falls back to the PlantUML server).",
+    )
+    parser.add_argument(
+        "--diagram-cache",
+        required=False,
+        help="Directory of the rendered diagram cache; unchanged diagrams are not rendered again.",
+    )
+    parser.add_argument(
+        "--defer-rendering",
+        action="store_true",
+        required=False,
+        help="Render diagrams in the background while the agents keep working; failures are reported at the end.",
+    )
     parser.add_argument(
         "--max-rpm",
         "-m",
+        type=int,
+        required=False,
+        help="Maximum requests per minute for the LLM API, shared by all the agents (defaults is 30).",
+    )
+    parser.add_argument(
+        "--max-tpm",
+        type=int,
+        required=False,
+        help="Maximum tokens per minute for the LLM API, shared by all the agents (unlimited by default).",
+    )
+    parser.add_argument(
+        "--kotlin-parser",
+        required=False,
+        choices=list(KOTLIN_PARSERS),
+        default=DEFAULT_KOTLIN_PARSER,
+        help=f"Parser backend for Kotlin sources (defaults is {DEFAULT_KOTLIN_PARSER}).",
+    )
+    parser.add_argument(
+        "--snapshot",
+        required=False,
+        help="Metadata snapshot file: loaded instead of parsing the folder when it was written for the same folder and options, otherwise written after parsing. A .sqlite file is a SQLite store that several processes can share.",
+    )
+    parser.add_argument(
+        "--trace",
+        required=False,
+        help="Write a trace of the stages, tasks, LLM calls and tool calls to this JSON file.",
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=list(TRACE_FORMATS),
+        default="chrome",
+        help="Trace format: 'chrome' (chrome://tracing, Perfetto) or 'json' (defaults is chrome).",
+    )
+    parser.add_argument(
+        "--llms",
+        required=False,
+        help="YAML file of the LLM definitions (defaults is conf/llms.yaml); see conf/llms_fake.yaml for an offline stand-in.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
         required=False,
-        help="Maximum requests per minute for the LLM API (defaults is 30).",
+        help="Do not call the LLM: render the prompts and report their estimated tokens to prompt_profile.json in the output directory.",
     )
     parser.add_argument(
         "--verbose",
@@ -200,6 +330,7 @@ def main():
     
     max_rpm = args.max_rpm if args.max_rpm else MAX_RPM
     logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    tracer = configure_tracer(enabled=bool(args.trace))
     
     options = GenerationOptions(
         language=args.language.lower(),
@@ -207,7 +338,14 @@ def main():
         output_dir=args.output_dir,
         folder_path=args.folder_path,
         plantuml_server=args.plantuml_server,
+        plantuml_jar=args.plantuml_jar,
+        diagram_cache_dir=args.diagram_cache,
+        defer_rendering=args.defer_rendering,
         max_rpm=max_rpm,
+        max_tpm=args.max_tpm,
+        kotlin_parser=args.kotlin_parser,
+        llms_file=args.llms,
+        dry_run=args.dry_run,
         verbose=args.verbose
     )
 
@@ -220,18 +358,32 @@ def main():
         # create output directory if it doesn't exist
         os.makedirs(options.output_dir, exist_ok=True)
 
-        namespaces = generate_metadata(options.language, options.folder_path)
-        resolve_references(namespaces, options.root_namespace)
+        namespaces = load_metadata(options.language, options.folder_path, options.root_namespace,
+                                   options.kotlin_parser, args.snapshot)
         
         workflow = DocumentationWorkflow(namespaces, options)
         workflow.generate()
         
+        if workflow.profiler:
+            print(workflow.profiler.report())
+            print(f"Prompt profile written to {options.output_dir}/prompt_profile.json")
+            return
         print(workflow.token_stats)
+        print(workflow.rate_limiter)
+        print(workflow.runtime)
+        if workflow.diagram_cache:
+            print(workflow.diagram_cache)
+        for failure in workflow.render_failures:
+            print(f"Diagram rendering failed for {failure.output_file}: {failure.message}")
 
     except Exception as e:
         traceback.print_exc()
         logger.debug(f"An error occurred: {str(e)}")
         sys.exit(1)
+    finally:
+        if args.trace:
+            tracer.write(args.trace, args.trace_format)
+            print(f"Trace written to {args.trace}: {tracer}")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
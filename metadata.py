@@ -1,12 +1,42 @@
-from typing import List, Dict, Optional, Union
+import threading
+from abc import abstractmethod
+from collections import OrderedDict
+from collections.abc import Mapping
+from typing import List, Dict, Iterator, NamedTuple, Optional, Union
+
+# Namespaces kept in memory by default by the lazy stores
+NAMESPACE_CACHE_SIZE = 512
+
+class Span(NamedTuple):
+    """
+    Location of a declaration in its file: 1-based inclusive lines, and byte offsets in the
+    UTF-8 source as parsed (None when the parser does not provide them).
+    """
+    start_line: int
+    end_line: int
+    start_byte: Optional[int] = None
+    end_byte: Optional[int] = None
+
+def to_span(value) -> Optional[Span]:
+    """
+    Converts a span serialized as a list back to a Span.
+    """
+    return Span(*value) if value else None
+
+def _with_span(member: dict) -> dict:
+    member = dict(member)
+    if member.get("span"):
+        member["span"] = to_span(member["span"])
+    return member
 
 class ClassMetadata:
     """
     Represents metadata for a class, including its attributes and methods.
     """
-    def __init__(self, name: str, file_path: Optional[str]):
+    def __init__(self, name: str, file_path: Optional[str], span: Optional[Span] = None):
         self.name = name
         self.file_path = file_path
+        self.span = span
         self.stereotypes = []
         self.attributes = []
         self.methods = []
@@ -15,21 +45,59 @@ class ClassMetadata:
     def add_stereotype(self, stereotype: str):
         self.stereotypes.append(stereotype)
 
-    def add_attribute(self, name: str, type_: str):
-        self.attributes.append({
+    def add_attribute(self, name: str, type_: str, span: Optional[Span] = None):
+        attribute = {
             "name": name,
             "type": type_
-        })
+        }
+        if span:
+            attribute["span"] = span
+        self.attributes.append(attribute)
 
-    def add_method(self, name: str, parameters: List[Dict[str, Union[str, bool]]], invoked_methods: List[Dict[str, Union[str, bool]]]):
-        self.methods.append({
+    def add_method(self, name: str, parameters: List[Dict[str, Union[str, bool]]], invoked_methods: List[Dict[str, Union[str, bool]]],
+                   stereotypes: Optional[List[str]] = None, span: Optional[Span] = None):
+        method = {
             "name": name,
             "parameters": parameters,
             "invoked_methods": invoked_methods
-        })
+        }
+        # Annotations and decorators of the method, only recorded when present
+        if stereotypes:
+            method["stereotypes"] = stereotypes
+        if span:
+            method["span"] = span
+        self.methods.append(method)
         
-    def add_dependency(self, dependency: 'ClassMetadata'):
-        self.dependencies.append(dependency)
+    def add_dependency(self, dependency: str):
+        """
+        Records a class this class depends on, by its fully qualified name.
+        """
+        if dependency not in self.dependencies:
+            self.dependencies.append(dependency)
+
+    def to_dict(self):
+        class_dict = {
+            "file_path": self.file_path,
+            "stereotypes": self.stereotypes,
+            "attributes": self.attributes,
+            "methods": self.methods,
+            "dependencies": self.dependencies
+        }
+        if self.span:
+            class_dict["span"] = self.span
+        return class_dict
+
+    @classmethod
+    def from_dict(cls, name: str, class_dict: dict) -> 'ClassMetadata':
+        """
+        Rebuilds class metadata exported with to_dict, e.g. loaded back from JSON.
+        """
+        class_metadata = cls(name, class_dict.get("file_path"), to_span(class_dict.get("span")))
+        class_metadata.stereotypes = list(class_dict.get("stereotypes", []))
+        class_metadata.attributes = [_with_span(attribute) for attribute in class_dict.get("attributes", [])]
+        class_metadata.methods = [_with_span(method) for method in class_dict.get("methods", [])]
+        class_metadata.dependencies = list(class_dict.get("dependencies", []))
+        return class_metadata
 
 class Namespace:
     """
@@ -43,22 +111,31 @@ class Namespace:
     def add_imports(self, imports: List[str]):
         self.imports.update(imports)
 
-    def add_class(self, class_name: str, file_path: str = None):
+    def add_class(self, class_name: str, file_path: str = None, span: Optional[Span] = None):
         if class_name not in self.classes:
-            self.classes[class_name] = ClassMetadata(class_name, file_path)
+            self.classes[class_name] = ClassMetadata(class_name, file_path, span)
+
+    def get_class(self, class_name: str) -> Optional[dict]:
+        """
+        Returns the metadata of a class as a dictionary, or None.
+        """
+        class_metadata = self.classes.get(class_name)
+        return class_metadata.to_dict() if class_metadata else None
 
-    def add_class_attribute(self, class_name: str, name: str, type_: str):
+    def add_class_attribute(self, class_name: str, name: str, type_: str, span: Optional[Span] = None):
         if class_name in self.classes:
-            self.classes[class_name].add_attribute(name, type_)
+            self.classes[class_name].add_attribute(name, type_, span)
         else:
             raise ValueError(f"Class '{class_name}' does not exist.")
 
     def add_class_method(self, class_name: str, method_name: str, \
         parameters: List[Dict[str, Union[str, bool]]], \
-        invoked_methods: List[Dict[str, Union[str, bool]]]):
+        invoked_methods: List[Dict[str, Union[str, bool]]], \
+        stereotypes: Optional[List[str]] = None, \
+        span: Optional[Span] = None):
 
         if class_name in self.classes:
-            self.classes[class_name].add_method(method_name, parameters, invoked_methods)
+            self.classes[class_name].add_method(method_name, parameters, invoked_methods, stereotypes, span)
         else:
             raise ValueError(f"Class '{class_name}' does not exist.")
         
@@ -79,11 +156,31 @@ class Namespace:
 
         for class_name, class_metadata in other_namespace.classes.items():
             if class_name in self.classes:
+                if self.classes[class_name].span is None:
+                    self.classes[class_name].span = class_metadata.span
                 self.classes[class_name].attributes.extend(class_metadata.attributes)
                 self.classes[class_name].methods.extend(class_metadata.methods)
+                for dependency in class_metadata.dependencies:
+                    self.classes[class_name].add_dependency(dependency)
             else:
                 self.classes[class_name] = class_metadata
 
+    def summary(self) -> dict:
+        """
+        The imports and the member names of the classes, as listed by CodeMeta.list_namespaces.
+        """
+        classes = {}
+        for class_name, class_metadata in self.classes.items():
+            class_stats = {}
+            if class_metadata.attributes:
+                class_stats["attribute_names"] = ", ".join(attribute['name'] for attribute in class_metadata.attributes)
+            if class_metadata.methods:
+                class_stats["method_names"] = ", ".join(method['name'] for method in class_metadata.methods)
+            if class_metadata.stereotypes:
+                class_stats["stereotypes"] = ", ".join(class_metadata.stereotypes)
+            classes[class_name] = class_stats
+        return {"imports": sorted(self.imports), "classes": classes}
+
     def to_dict(self):
         """
         Converts the namespace to a dictionary format.
@@ -92,12 +189,61 @@ class Namespace:
             "name": self.name,
             "imports": list(self.imports),
             "classes": {
-                class_name: {
-                    "file_path": class_metadata.file_path,
-                    "stereotypes": class_metadata.stereotypes,
-                    "attributes": class_metadata.attributes,
-                    "methods": class_metadata.methods
-                }
+                class_name: class_metadata.to_dict()
                 for class_name, class_metadata in self.classes.items()
             }
-        }
\ No newline at end of file
+        }
+
+    @classmethod
+    def from_dict(cls, namespace_dict: dict) -> 'Namespace':
+        """
+        Rebuilds a namespace exported with to_dict.
+        """
+        namespace = cls(namespace_dict["name"], namespace_dict.get("imports", []))
+        for class_name, class_dict in namespace_dict.get("classes", {}).items():
+            namespace.classes[class_name] = ClassMetadata.from_dict(class_name, class_dict)
+        return namespace
+
+class LazyNamespaces(Mapping):
+    """
+    Read-only mapping of namespace names to Namespace objects loaded from a store on access.
+    The most recently used ones are kept, so that memory does not grow with the size of the
+    code base. Subclasses implement _load, __iter__ and __len__.
+    """
+    def __init__(self, cache_size: Optional[int] = NAMESPACE_CACHE_SIZE):
+        """
+        :param cache_size: Number of loaded namespaces to keep; None keeps them all.
+        """
+        self.cache_size = cache_size
+        self._namespaces: "OrderedDict[str, Namespace]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.decoded = 0
+
+    @abstractmethod
+    def _load(self, name: str) -> Namespace:
+        """
+        Reads a namespace from the store; raises KeyError when it is unknown.
+        """
+        pass
+
+    def __getitem__(self, name: str) -> Namespace:
+        with self._lock:
+            namespace = self._namespaces.get(name)
+            if namespace is not None:
+                self._namespaces.move_to_end(name)
+                return namespace
+        namespace = self._load(name)
+        with self._lock:
+            self.decoded += 1
+            self._namespaces[name] = namespace
+            if self.cache_size is not None and len(self._namespaces) > self.cache_size:
+                self._namespaces.popitem(last=False)
+        return namespace
+
+    @abstractmethod
+    def __iter__(self) -> Iterator[str]:
+        pass
+
+    @abstractmethod
+    def __len__(self) -> int:
+        pass
@@ -0,0 +1,334 @@
+import json
+import os
+import pathlib
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from dependency_graph import DependencyGraph
+from metadata import NAMESPACE_CACHE_SIZE, ClassMetadata, LazyNamespaces, Namespace, Span
+
+# Resolved metadata in a SQLite file: one row per namespace, import, class, attribute, dependency,
+# method, parameter and invocation, in their original order (rowid). Invocations and dependencies
+# keep the id of their target class when it is known, and imports the id of their namespace, so
+# that dependents and dependencies are indexed lookups.
+STORE_EXTENSION = ".sqlite"
+SCHEMA_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE info (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+CREATE TABLE namespaces (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE imports (
+    namespace_id INTEGER NOT NULL REFERENCES namespaces(id),
+    name TEXT NOT NULL,
+    target_namespace_id INTEGER REFERENCES namespaces(id)
+);
+CREATE TABLE classes (
+    id INTEGER PRIMARY KEY,
+    namespace_id INTEGER NOT NULL REFERENCES namespaces(id),
+    name TEXT NOT NULL,
+    qualified_name TEXT NOT NULL,
+    file_path TEXT,
+    start_line INTEGER, end_line INTEGER, start_byte INTEGER, end_byte INTEGER
+);
+CREATE TABLE class_stereotypes (class_id INTEGER NOT NULL REFERENCES classes(id), name TEXT NOT NULL);
+CREATE TABLE attributes (
+    class_id INTEGER NOT NULL REFERENCES classes(id),
+    name TEXT NOT NULL,
+    type TEXT,
+    start_line INTEGER, end_line INTEGER, start_byte INTEGER, end_byte INTEGER
+);
+CREATE TABLE class_dependencies (
+    class_id INTEGER NOT NULL REFERENCES classes(id),
+    target TEXT NOT NULL,
+    target_class_id INTEGER REFERENCES classes(id)
+);
+CREATE TABLE methods (
+    id INTEGER PRIMARY KEY,
+    class_id INTEGER NOT NULL REFERENCES classes(id),
+    name TEXT NOT NULL,
+    qualified_name TEXT NOT NULL,
+    start_line INTEGER, end_line INTEGER, start_byte INTEGER, end_byte INTEGER
+);
+CREATE TABLE method_stereotypes (method_id INTEGER NOT NULL REFERENCES methods(id), name TEXT NOT NULL);
+CREATE TABLE parameters (method_id INTEGER NOT NULL REFERENCES methods(id), name TEXT NOT NULL, type TEXT);
+CREATE TABLE invocations (
+    method_id INTEGER NOT NULL REFERENCES methods(id),
+    target TEXT NOT NULL,
+    target_class_id INTEGER REFERENCES classes(id)
+);
+"""
+
+# Created after the rows are inserted, which is faster than maintaining them
+INDEXES = """
+CREATE INDEX imports_namespace ON imports(namespace_id);
+CREATE INDEX classes_namespace ON classes(namespace_id);
+CREATE INDEX classes_qualified_name ON classes(qualified_name);
+CREATE INDEX classes_name ON classes(name);
+CREATE INDEX class_stereotypes_class ON class_stereotypes(class_id);
+CREATE INDEX class_stereotypes_name ON class_stereotypes(name);
+CREATE INDEX attributes_class ON attributes(class_id);
+CREATE INDEX class_dependencies_class ON class_dependencies(class_id);
+CREATE INDEX class_dependencies_target ON class_dependencies(target_class_id);
+CREATE INDEX methods_class ON methods(class_id);
+CREATE INDEX methods_qualified_name ON methods(qualified_name);
+CREATE INDEX methods_name ON methods(name);
+CREATE INDEX method_stereotypes_method ON method_stereotypes(method_id);
+CREATE INDEX parameters_method ON parameters(method_id);
+CREATE INDEX invocations_method ON invocations(method_id);
+CREATE INDEX invocations_target ON invocations(target, target_class_id);
+"""
+
+class MetadataStoreError(Exception):
+    """
+    The file is not a metadata store, or was written with another schema.
+    """
+
+def _span_columns(span) -> Tuple:
+    return tuple(span) if span else (None, None, None, None)
+
+def _span(columns) -> Optional[Span]:
+    return Span(*columns) if columns[0] is not None else None
+
+def write_store(file_path: str, namespaces: Dict[str, Namespace], info: Optional[Dict[str, Any]] = None):
+    """
+    Writes resolved metadata to a SQLite store; info values must be JSON serializable.
+    The file is replaced atomically.
+    """
+    # Imported here: code_analyzer loads stores
+    from code_analyzer import find_namespace
+
+    info = dict(info or {}, created=time.time())
+    temp_path = f"{file_path}.{os.getpid()}.tmp"
+    if os.path.exists(temp_path):
+        os.remove(temp_path)
+    namespace_ids = {name: i for i, name in enumerate(sorted(namespaces), start=1)}
+    # Classes are numbered in the order they are written; targets refer to the first one of a name
+    class_ids = {}
+    class_id = 0
+    for name in sorted(namespaces):
+        for class_name in namespaces[name].classes:
+            class_id += 1
+            class_ids.setdefault(f"{name}.{class_name}", class_id)
+
+    connection = sqlite3.connect(temp_path)
+    try:
+        connection.execute("PRAGMA journal_mode = OFF")
+        connection.execute("PRAGMA synchronous = OFF")
+        connection.executescript(SCHEMA)
+        connection.executemany("INSERT INTO info VALUES (?, ?)", [(key, json.dumps(value)) for key, value in info.items()])
+        connection.executemany("INSERT INTO namespaces VALUES (?, ?)", [(i, name) for name, i in namespace_ids.items()])
+        class_id = method_id = 0
+        # One batch of rows per namespace, so that the metadata is not copied as a whole
+        for name in sorted(namespaces):
+            namespace = namespaces[name]
+            namespace_id = namespace_ids[name]
+            connection.executemany("INSERT INTO imports VALUES (?, ?, ?)", [
+                (namespace_id, import_name, namespace_ids.get(find_namespace(import_name, namespace_ids)))
+                for import_name in sorted(namespace.imports)
+            ])
+            classes, stereotypes, attributes, dependencies = [], [], [], []
+            methods, method_stereotypes, parameters, invocations = [], [], [], []
+            for class_name, class_metadata in namespace.classes.items():
+                qualified_name = f"{name}.{class_name}"
+                class_id += 1
+                classes.append((class_id, namespace_id, class_name, qualified_name, class_metadata.file_path,
+                                *_span_columns(class_metadata.span)))
+                stereotypes.extend((class_id, stereotype) for stereotype in class_metadata.stereotypes)
+                attributes.extend((class_id, attribute["name"], attribute["type"], *_span_columns(attribute.get("span")))
+                                  for attribute in class_metadata.attributes)
+                dependencies.extend((class_id, dependency, class_ids.get(dependency))
+                                    for dependency in class_metadata.dependencies)
+                for method in class_metadata.methods:
+                    method_id += 1
+                    methods.append((method_id, class_id, method["name"], f"{qualified_name}.{method['name']}",
+                                    *_span_columns(method.get("span"))))
+                    method_stereotypes.extend((method_id, stereotype) for stereotype in method.get("stereotypes", []))
+                    parameters.extend((method_id, parameter["name"], parameter.get("type"))
+                                      for parameter in method["parameters"])
+                    invocations.extend((method_id, invocation, class_ids.get(invocation.rsplit(".", 1)[0]))
+                                       for invocation in method["invoked_methods"])
+            connection.executemany("INSERT INTO classes VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", classes)
+            connection.executemany("INSERT INTO class_stereotypes VALUES (?, ?)", stereotypes)
+            connection.executemany("INSERT INTO attributes VALUES (?, ?, ?, ?, ?, ?, ?)", attributes)
+            connection.executemany("INSERT INTO class_dependencies VALUES (?, ?, ?)", dependencies)
+            connection.executemany("INSERT INTO methods VALUES (?, ?, ?, ?, ?, ?, ?, ?)", methods)
+            connection.executemany("INSERT INTO method_stereotypes VALUES (?, ?)", method_stereotypes)
+            connection.executemany("INSERT INTO parameters VALUES (?, ?, ?)", parameters)
+            connection.executemany("INSERT INTO invocations VALUES (?, ?, ?)", invocations)
+        connection.executescript(INDEXES)
+        connection.execute("ANALYZE")
+        connection.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        connection.commit()
+    finally:
+        connection.close()
+    os.replace(temp_path, file_path)
+
+class MetadataStore(LazyNamespaces):
+    """
+    Read-only mapping of namespace names to Namespace objects over a SQLite store, which several
+    processes can open at once. Namespaces are read on access (see LazyNamespaces); the overview,
+    the direct dependencies of a class or method and the dependency graphs are answered by
+    indexed queries without reading namespaces.
+    """
+    def __init__(self, file_path: str, cache_size: Optional[int] = NAMESPACE_CACHE_SIZE):
+        """
+        :param cache_size: Number of loaded namespaces to keep; None keeps them all.
+        """
+        super().__init__(cache_size)
+        self.file_path = file_path
+        if not os.path.isfile(file_path):
+            raise MetadataStoreError(f"{file_path} does not exist")
+        self._connection = sqlite3.connect(f"{pathlib.Path(file_path).resolve().as_uri()}?mode=ro",
+                                           uri=True, check_same_thread=False)
+        self._connection_lock = threading.Lock()
+        try:
+            schema_version = self._connection.execute("PRAGMA user_version").fetchone()[0]
+            if schema_version != SCHEMA_VERSION:
+                raise MetadataStoreError(f"{file_path} has schema {schema_version}, expected {SCHEMA_VERSION}")
+            self.info = {key: json.loads(value) for key, value in self._connection.execute("SELECT key, value FROM info")}
+            self._ids: Dict[str, int] = dict(self._connection.execute("SELECT name, id FROM namespaces ORDER BY name"))
+        except sqlite3.DatabaseError as e:
+            self.close()
+            raise MetadataStoreError(f"{file_path} is not a metadata store: {e}")
+        except MetadataStoreError:
+            self.close()
+            raise
+        self._summaries: Optional[Dict[str, dict]] = None
+
+    def _query(self, sql: str, parameters: Tuple = ()) -> List[Tuple]:
+        with self._connection_lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    def _load(self, name: str) -> Namespace:
+        namespace_id = self._ids[name]
+        namespace = Namespace(name, [row[0] for row in self._query(
+            "SELECT name FROM imports WHERE namespace_id = ?", (namespace_id,))])
+        classes = {}
+        for class_id, class_name, file_path, *span in self._query(
+                "SELECT id, name, file_path, start_line, end_line, start_byte, end_byte "
+                "FROM classes WHERE namespace_id = ? ORDER BY id", (namespace_id,)):
+            classes[class_id] = namespace.classes[class_name] = ClassMetadata(class_name, file_path, _span(span))
+        for class_id, stereotype in self._query(
+                "SELECT s.class_id, s.name FROM class_stereotypes s JOIN classes c ON c.id = s.class_id "
+                "WHERE c.namespace_id = ? ORDER BY s.rowid", (namespace_id,)):
+            classes[class_id].stereotypes.append(stereotype)
+        for class_id, attribute_name, type_, *span in self._query(
+                "SELECT a.class_id, a.name, a.type, a.start_line, a.end_line, a.start_byte, a.end_byte "
+                "FROM attributes a JOIN classes c ON c.id = a.class_id WHERE c.namespace_id = ? ORDER BY a.rowid",
+                (namespace_id,)):
+            classes[class_id].add_attribute(attribute_name, type_, _span(span))
+        for class_id, dependency in self._query(
+                "SELECT d.class_id, d.target FROM class_dependencies d JOIN classes c ON c.id = d.class_id "
+                "WHERE c.namespace_id = ? ORDER BY d.rowid", (namespace_id,)):
+            classes[class_id].dependencies.append(dependency)
+
+        method_stereotypes, parameters, invocations = {}, {}, {}
+        for method_id, stereotype in self._query(
+                "SELECT s.method_id, s.name FROM method_stereotypes s JOIN methods m ON m.id = s.method_id "
+                "JOIN classes c ON c.id = m.class_id WHERE c.namespace_id = ? ORDER BY s.rowid", (namespace_id,)):
+            method_stereotypes.setdefault(method_id, []).append(stereotype)
+        for method_id, parameter_name, type_ in self._query(
+                "SELECT p.method_id, p.name, p.type FROM parameters p JOIN methods m ON m.id = p.method_id "
+                "JOIN classes c ON c.id = m.class_id WHERE c.namespace_id = ? ORDER BY p.rowid", (namespace_id,)):
+            parameters.setdefault(method_id, []).append({"name": parameter_name, "type": type_})
+        for method_id, target in self._query(
+                "SELECT i.method_id, i.target FROM invocations i JOIN methods m ON m.id = i.method_id "
+                "JOIN classes c ON c.id = m.class_id WHERE c.namespace_id = ? ORDER BY i.rowid", (namespace_id,)):
+            invocations.setdefault(method_id, []).append(target)
+        for method_id, class_id, method_name, *span in self._query(
+                "SELECT m.id, m.class_id, m.name, m.start_line, m.end_line, m.start_byte, m.end_byte "
+                "FROM methods m JOIN classes c ON c.id = m.class_id WHERE c.namespace_id = ? ORDER BY m.id",
+                (namespace_id,)):
+            classes[class_id].add_method(method_name, parameters.get(method_id, []), invocations.get(method_id, []),
+                                         method_stereotypes.get(method_id), _span(span))
+        return namespace
+
+    def __contains__(self, name) -> bool:
+        return name in self._ids
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._ids)
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def summaries(self) -> Dict[str, dict]:
+        """
+        Namespace.summary() of every namespace, without loading them; kept once read.
+        """
+        if self._summaries is not None:
+            return self._summaries
+        summaries = {name: {"imports": [], "classes": {}} for name in self._ids}
+        for namespace_name, import_name in self._query(
+                "SELECT n.name, i.name FROM imports i JOIN namespaces n ON n.id = i.namespace_id ORDER BY n.name, i.name"):
+            summaries[namespace_name]["imports"].append(import_name)
+        classes = {}
+        for class_id, namespace_name, class_name in self._query(
+                "SELECT c.id, n.name, c.name FROM classes c JOIN namespaces n ON n.id = c.namespace_id ORDER BY c.id"):
+            classes[class_id] = (summaries[namespace_name]["classes"].setdefault(class_name, {}), {})
+        for key, table in (("attribute_names", "attributes"), ("method_names", "methods"),
+                           ("stereotypes", "class_stereotypes")):
+            for class_id, name in self._query(f"SELECT class_id, name FROM {table} ORDER BY rowid"):
+                classes[class_id][1].setdefault(key, []).append(name)
+        for class_stats, names in classes.values():
+            class_stats.update((key, ", ".join(values)) for key, values in names.items())
+        self._summaries = summaries
+        return summaries
+
+    def direct_dependencies(self, name: str) -> Optional[Dict]:
+        """
+        The direct dependencies and dependents of a class or `namespace.Class.method`, with their
+        fan-out and fan-in as in the dependency graphs; None when the name is unknown.
+        """
+        if self._query("SELECT 1 FROM classes WHERE qualified_name = ? LIMIT 1", (name,)):
+            depends_on = [row[0] for row in self._query(
+                "SELECT DISTINCT t.qualified_name FROM class_dependencies d JOIN classes t ON t.id = d.target_class_id "
+                "WHERE d.class_id IN (SELECT id FROM classes WHERE qualified_name = ?) ORDER BY 1", (name,))]
+            used_by = [row[0] for row in self._query(
+                "SELECT DISTINCT c.qualified_name FROM class_dependencies d JOIN classes c ON c.id = d.class_id "
+                "WHERE d.target_class_id IN (SELECT id FROM classes WHERE qualified_name = ?) ORDER BY 1", (name,))]
+        else:
+            # Invoked methods are graph nodes when their class is known, even if they are not declared
+            depends_on = [row[0] for row in self._query(
+                "SELECT DISTINCT i.target FROM methods m JOIN invocations i ON i.method_id = m.id "
+                "WHERE m.qualified_name = ? AND i.target_class_id IS NOT NULL ORDER BY 1", (name,))]
+            used_by = [row[0] for row in self._query(
+                "SELECT DISTINCT m.qualified_name FROM invocations i JOIN methods m ON m.id = i.method_id "
+                "WHERE i.target = ? AND i.target_class_id IS NOT NULL ORDER BY 1", (name,))]
+            if not depends_on and not used_by and not self._query(
+                    "SELECT 1 FROM methods WHERE qualified_name = ? LIMIT 1", (name,)):
+                return None
+        return {"fan_out": len(depends_on), "fan_in": len(used_by), "depends_on": depends_on, "used_by": used_by}
+
+    def dependency_graphs(self) -> Tuple[DependencyGraph, DependencyGraph]:
+        """
+        The class and method dependency graphs, as built by build_dependency_graphs.
+        """
+        classes = [row[0] for row in self._query("SELECT qualified_name FROM classes")]
+        class_edges = self._query(
+            "SELECT c.qualified_name, t.qualified_name FROM class_dependencies d "
+            "JOIN classes c ON c.id = d.class_id JOIN classes t ON t.id = d.target_class_id")
+        methods = [row[0] for row in self._query("SELECT qualified_name FROM methods")]
+        method_edges = self._query(
+            "SELECT m.qualified_name, i.target FROM invocations i JOIN methods m ON m.id = i.method_id "
+            "WHERE i.target_class_id IS NOT NULL")
+        return DependencyGraph(classes, class_edges), DependencyGraph(methods, method_edges)
+
+    def namespace_dependencies(self) -> Dict[Tuple[str, str], int]:
+        """
+        The dependencies between namespaces, as returned by code_analyzer.namespace_dependencies.
+        """
+        return {(source, target): count for source, target, count in self._query(
+            "SELECT n.name, t.name, count(*) FROM imports i JOIN namespaces n ON n.id = i.namespace_id "
+            "JOIN namespaces t ON t.id = i.target_namespace_id WHERE i.target_namespace_id != i.namespace_id "
+            "GROUP BY n.name, t.name ORDER BY n.name, t.name")}
+
+    def close(self):
+        # Loaded namespaces stay usable
+        self._connection.close()
+
+    def __repr__(self):
+        return (f"MetadataStore({self.file_path}, namespaces={len(self)}, decoded={self.decoded}, "
+                f"cached={len(self._namespaces)})")
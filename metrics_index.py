@@ -0,0 +1,145 @@
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from typing import Dict, List, Optional
+
+from dependency_graph import DependencyGraph, build_dependency_graphs
+from entry_points import EntryPoint, EntryPointDetector
+from metadata import Namespace
+
+@dataclass
+class ClassMetrics:
+    name: str
+    namespace: str
+    attributes: int
+    methods: int
+    invocations: int
+    afferent: int   # Ca: classes depending on this class
+    efferent: int   # Ce: classes this class depends on
+
+    @property
+    def instability(self) -> float:
+        coupling = self.afferent + self.efferent
+        return round(self.efferent / coupling, 2) if coupling else 0.0
+
+@dataclass
+class NamespaceMetrics:
+    name: str
+    classes: int
+    methods: int
+    afferent: int   # Ca: classes outside the namespace depending on its classes
+    efferent: int   # Ce: classes outside the namespace its classes depend on
+
+    @property
+    def instability(self) -> float:
+        coupling = self.afferent + self.efferent
+        return round(self.efferent / coupling, 2) if coupling else 0.0
+
+class MetricsIndex:
+    """
+    Size, coupling and cycle metrics of the namespaces and classes, computed once from the
+    resolved metadata and queried by the agents instead of the raw metadata.
+    """
+    def __init__(self, metadata: Dict[str, Namespace], class_graph: Optional[DependencyGraph] = None,
+                 entry_points: Optional[List[EntryPoint]] = None, language: str = "auto"):
+        """
+        :param metadata: A dictionary mapping namespace names to Namespace objects, after resolve_references.
+        :param class_graph: The class dependency graph, built from the metadata when not given.
+        :param entry_points: The detected entry points, detected with the rules of the language when not given.
+        :param language: Language of the code, a comma separated list, or auto for the rules of every language.
+        """
+        if class_graph is None:
+            class_graph, _ = build_dependency_graphs(metadata)
+        if entry_points is None:
+            entry_points = EntryPointDetector.from_yaml().detect(metadata, language)
+        self.classes: Dict[str, ClassMetrics] = {}
+        self.namespaces: Dict[str, NamespaceMetrics] = {}
+        self.entry_points: List[EntryPoint] = entry_points
+
+        namespace_of = {}
+        for namespace_name in sorted(metadata):
+            for class_name, class_metadata in sorted(metadata[namespace_name].classes.items()):
+                qualified_name = f"{namespace_name}.{class_name}"
+                namespace_of[qualified_name] = namespace_name
+                self.classes[qualified_name] = ClassMetrics(
+                    name=qualified_name,
+                    namespace=namespace_name,
+                    attributes=len(class_metadata.attributes),
+                    methods=len(class_metadata.methods),
+                    invocations=sum(len(method["invoked_methods"]) for method in class_metadata.methods),
+                    afferent=class_graph.fan_in(qualified_name) if qualified_name in class_graph else 0,
+                    efferent=class_graph.fan_out(qualified_name) if qualified_name in class_graph else 0,
+                )
+
+        # Package coupling (Martin): distinct classes across the namespace boundary, in each direction
+        afferent, efferent = defaultdict(set), defaultdict(set)
+        namespace_edges = set()
+        for source in class_graph.nodes:
+            for target in class_graph.successors(source):
+                source_namespace, target_namespace = namespace_of.get(source), namespace_of.get(target)
+                if source_namespace and target_namespace and source_namespace != target_namespace:
+                    efferent[source_namespace].add(target)
+                    afferent[target_namespace].add(source)
+                    namespace_edges.add((source_namespace, target_namespace))
+        # Totals come from the class metrics: namespaces are read once, which matters for lazy stores
+        classes, methods = defaultdict(int), defaultdict(int)
+        for class_metrics in self.classes.values():
+            classes[class_metrics.namespace] += 1
+            methods[class_metrics.namespace] += class_metrics.methods
+        for namespace_name in sorted(metadata):
+            self.namespaces[namespace_name] = NamespaceMetrics(
+                name=namespace_name,
+                classes=classes[namespace_name],
+                methods=methods[namespace_name],
+                afferent=len(afferent[namespace_name]),
+                efferent=len(efferent[namespace_name]),
+            )
+
+        self.class_cycles: List[List[str]] = class_graph.cycles()
+        self.namespace_cycles: List[List[str]] = DependencyGraph(metadata, namespace_edges).cycles()
+
+    def summary(self, limit: int = 10) -> Dict:
+        """
+        Totals, the most coupled namespaces and classes, cycles and entry-point candidates.
+        """
+        return {
+            "total_namespaces": len(self.namespaces),
+            "total_classes": len(self.classes),
+            "most_used_namespaces": self.namespace_rows(limit, order_by="afferent"),
+            "most_dependent_namespaces": self.namespace_rows(limit, order_by="efferent"),
+            "most_used_classes": self.class_rows(limit, order_by="afferent"),
+            "namespace_cycles": self.namespace_cycles[:limit],
+            "total_class_cycles": len(self.class_cycles),
+            "entry_point_candidates": self.entry_point_rows(limit),
+        }
+
+    def namespace_rows(self, limit: Optional[int] = None, order_by: str = "name", names: Optional[List[str]] = None) -> Dict:
+        columns = ["name", "classes", "methods", "afferent", "efferent", "instability"]
+        return self._rows(self.namespaces, columns, limit, order_by, names)
+
+    def class_rows(self, limit: Optional[int] = None, order_by: str = "name", names: Optional[List[str]] = None) -> Dict:
+        columns = ["name", "attributes", "methods", "invocations", "afferent", "efferent", "instability"]
+        return self._rows(self.classes, columns, limit, order_by, names)
+
+    def entry_point_rows(self, limit: Optional[int] = None) -> Dict:
+        rows = [[entry_point.name, entry_point.type, ", ".join(entry_point.indicators)] for entry_point in self.entry_points]
+        return {"columns": ["name", "type", "indicators"], "rows": rows[:limit], "total": len(rows)}
+
+    @staticmethod
+    def _rows(metrics: Dict, columns: List[str], limit: Optional[int], order_by: str, names: Optional[List[str]]) -> Dict:
+        """
+        Returns metrics as a table (column names once, then one list per row), which is much shorter than JSON objects.
+        """
+        items = [metrics[name] for name in names if name in metrics] if names else list(metrics.values())
+        if order_by in columns and order_by != "name":
+            items.sort(key=lambda item: (-getattr(item, order_by), item.name))
+        rows = [[getattr(item, column) for column in columns] for item in items]
+        return {"columns": columns, "rows": rows[:limit], "total": len(rows)}
+
+    def to_dict(self) -> Dict:
+        return {
+            "namespaces": {name: {**asdict(metrics), "instability": metrics.instability} for name, metrics in self.namespaces.items()},
+            "classes": {name: {**asdict(metrics), "instability": metrics.instability} for name, metrics in self.classes.items()},
+            "namespace_cycles": self.namespace_cycles,
+            "class_cycles": self.class_cycles,
+            "entry_points": [asdict(entry_point) for entry_point in self.entry_points],
+        }
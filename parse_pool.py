@@ -0,0 +1,135 @@
+import multiprocessing
+import time
+import traceback
+from collections import deque
+from multiprocessing.connection import wait
+from typing import Iterable, Iterator, Optional, Tuple
+
+# Result tuples yielded by ParsePool.imap: (index, status, payload).
+# status is "ok" (payload is a Namespace), "error", "timeout" or "crash"
+# (payload is a (message, traceback) tuple).
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+STATUS_CRASH = "crash"
+
+def _worker_main(conn, language: str, folder_path: str, kotlin_parser: str):
+    """
+    Worker loop: receives (index, file_path) jobs and sends back parse results.
+    """
+    # Imported here so that the worker builds its own parser after the fork/spawn.
+    from code_analyzer import create_parser_set, parse_file
+
+    parsers = create_parser_set(language, kotlin_parser)
+    while True:
+        try:
+            job = conn.recv()
+        except (EOFError, OSError):
+            break
+        if job is None:
+            break
+        index, file_path = job
+        try:
+            namespace = parse_file(parsers, file_path, folder_path)
+            conn.send((index, STATUS_OK, namespace))
+        except Exception as e:
+            conn.send((index, STATUS_ERROR, (f"{type(e).__name__}: {e}", traceback.format_exc())))
+
+class _Worker:
+    """
+    A single parser process and the parent's end of its pipe.
+    """
+    def __init__(self, context, language: str, folder_path: str, kotlin_parser: str):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker_main,
+                                       args=(child_conn, language, folder_path, kotlin_parser),
+                                       daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.job: Optional[Tuple[int, str]] = None
+        self.deadline: Optional[float] = None
+
+    def submit(self, index: int, file_path: str, timeout: Optional[float]):
+        self.job = (index, file_path)
+        self.deadline = time.monotonic() + timeout if timeout else None
+        self.conn.send(self.job)
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (BrokenPipeError, OSError):
+            pass
+        self.process.join(timeout=1)
+        if self.process.is_alive():
+            self.kill()
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+class ParsePool:
+    """
+    Parses files in worker processes, isolating files that raise, hang or crash the worker.
+
+    A worker that exceeds the per-file timeout or dies is replaced and the file is reported
+    as failed; the remaining files keep being parsed.
+    """
+    def __init__(self, language: str, folder_path: str, workers: int, timeout: Optional[float],
+                 kotlin_parser: str):
+        self.language = language
+        self.kotlin_parser = kotlin_parser
+        self.folder_path = folder_path
+        self.workers = max(1, workers)
+        self.timeout = timeout
+        self._context = multiprocessing.get_context()
+
+    def _spawn(self) -> _Worker:
+        return _Worker(self._context, self.language, self.folder_path, self.kotlin_parser)
+
+    def imap(self, file_paths: Iterable[str]) -> Iterator[Tuple[int, str, object]]:
+        """
+        Yields (index, status, payload) for every file, in completion order.
+        """
+        pending = deque(enumerate(file_paths))
+        idle = [self._spawn() for _ in range(min(self.workers, len(pending)))]
+        busy = {}
+
+        try:
+            while pending or busy:
+                while pending and idle:
+                    worker = idle.pop()
+                    index, file_path = pending.popleft()
+                    worker.submit(index, file_path, self.timeout)
+                    busy[worker.conn] = worker
+
+                deadlines = [w.deadline for w in busy.values() if w.deadline is not None]
+                wait_for = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+
+                for conn in wait(list(busy), timeout=wait_for):
+                    worker = busy.pop(conn)
+                    try:
+                        yield conn.recv()
+                        idle.append(worker)
+                    except (EOFError, OSError):
+                        worker.kill()
+                        exit_code = worker.process.exitcode
+                        yield (worker.job[0], STATUS_CRASH,
+                               (f"Worker process exited with code {exit_code}", ""))
+                        if pending:
+                            idle.append(self._spawn())
+
+                now = time.monotonic()
+                for conn, worker in list(busy.items()):
+                    if worker.deadline is not None and worker.deadline <= now:
+                        del busy[conn]
+                        worker.kill()
+                        yield (worker.job[0], STATUS_TIMEOUT,
+                               (f"Parsing exceeded the {self.timeout}s timeout", ""))
+                        if pending:
+                            idle.append(self._spawn())
+        finally:
+            for worker in idle:
+                worker.stop()
+            for worker in busy.values():
+                worker.kill()
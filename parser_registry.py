@@ -0,0 +1,93 @@
+import importlib
+import os
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from code_parser import CodeParser
+
+@dataclass(frozen=True)
+class ParserSpec:
+    """
+    Describes a parser backend for a language. The parser module, and the grammar it loads,
+    is only imported when the parser is first created.
+    """
+    language: str
+    backend: str
+    extensions: Tuple[str, ...]
+    target: str  # "module:ClassName"
+
+    def create(self) -> CodeParser:
+        module_name, class_name = self.target.split(":")
+        return getattr(importlib.import_module(module_name), class_name)()
+
+# language -> backend -> spec
+PARSER_REGISTRY: Dict[str, Dict[str, ParserSpec]] = {}
+# language -> backend used when none is requested
+DEFAULT_BACKENDS: Dict[str, str] = {}
+
+def register_parser(language: str, backend: str, extensions: Tuple[str, ...], target: str,
+                    default: bool = False):
+    """
+    Registers a parser backend; the first backend registered for a language is its default.
+    """
+    PARSER_REGISTRY.setdefault(language, {})[backend] = ParserSpec(language, backend, extensions, target)
+    if default or language not in DEFAULT_BACKENDS:
+        DEFAULT_BACKENDS[language] = backend
+
+register_parser("java", "tree-sitter", (".java",), "parsers.java_parser:JavaCodeParser")
+register_parser("kotlin", "kopyt", (".kt",), "parsers.kotlin_parser:KotlinCodeParser")
+register_parser("kotlin", "tree-sitter", (".kt",), "parsers.kotlin_ts_parser:KotlinTreeSitterCodeParser")
+register_parser("php", "tree-sitter", (".php",), "parsers.php_parser:PhpCodeParser")
+register_parser("python", "tree-sitter", (".py",), "parsers.python_parser:PythonCodeParser")
+
+# Scans every registered language
+AUTO_LANGUAGE = "auto"
+KOTLIN_PARSERS = list(PARSER_REGISTRY["kotlin"])
+DEFAULT_KOTLIN_PARSER = DEFAULT_BACKENDS["kotlin"]
+
+def resolve_languages(language: str) -> List[str]:
+    """
+    Expands a language argument: a single language, a comma separated list, or "auto".
+    """
+    if language == AUTO_LANGUAGE:
+        return list(PARSER_REGISTRY)
+    languages = [name.strip().lower() for name in language.split(",") if name.strip()]
+    for name in languages:
+        if name not in PARSER_REGISTRY:
+            raise ValueError(f"Unsupported language: {name}")
+    return languages
+
+def get_parser_spec(language: str, backend: Optional[str] = None) -> ParserSpec:
+    if language not in PARSER_REGISTRY:
+        raise ValueError(f"Unsupported language: {language}")
+    backend = backend or DEFAULT_BACKENDS[language]
+    if backend not in PARSER_REGISTRY[language]:
+        raise ValueError(f"Unsupported {language} parser: {backend}")
+    return PARSER_REGISTRY[language][backend]
+
+class ParserSet:
+    """
+    Selects a parser by file extension for one or more languages, creating each parser
+    (and importing its grammar) only when a file of that language is met.
+    """
+    def __init__(self, language: str, backends: Optional[Dict[str, str]] = None):
+        backends = backends or {}
+        self.specs: Dict[str, ParserSpec] = {}
+        for name in resolve_languages(language):
+            spec = get_parser_spec(name, backends.get(name))
+            for extension in spec.extensions:
+                self.specs[extension] = spec
+        self._parsers: Dict[str, CodeParser] = {}
+
+    @property
+    def extensions(self) -> Tuple[str, ...]:
+        return tuple(self.specs)
+
+    def parser_for(self, file_path: str) -> CodeParser:
+        extension = os.path.splitext(file_path)[1]
+        spec = self.specs.get(extension)
+        if spec is None:
+            raise ValueError(f"No parser registered for '{extension}' files")
+        if spec.target not in self._parsers:
+            self._parsers[spec.target] = spec.create()
+        return self._parsers[spec.target]
@@ -1,6 +1,6 @@
 import re
 from typing import Optional
-from code_parser import CodeParser
+from code_parser import CodeParser, Source
 from metadata import ClassMetadata, Namespace
 from tree_sitter import Language, Parser
 import tree_sitter_java
@@ -26,8 +26,8 @@ class JavaCodeParser(CodeParser):
     def __init__(self):
         self.annotation_re = r"(?<=@)([A-Za-z]+)"
     
-    def parse_source(self, source_code: str, file_path: Optional[str]) -> Namespace:
-        tree = parser.parse(bytes(source_code, "utf8"))
+    def parse_source(self, source_code: Source, file_path: Optional[str]) -> Namespace:
+        tree = parser.parse(self._prepare_source(source_code))
         root_node = tree.root_node
         self.namespace = Namespace(name="", imports=set())
 
@@ -51,12 +51,12 @@ class JavaCodeParser(CodeParser):
     def _parse_package(self, node):
         name_node = node.named_child(0)
         if name_node:
-            self.namespace.name = name_node.text.decode("utf8")
+            self.namespace.name = self._text(name_node)
 
     def _parse_import(self, node):
         path_node = node.named_child(0)
         if path_node:
-            self.namespace.imports.add(path_node.text.decode("utf8"))
+            self.namespace.imports.add(self._text(path_node))
             
     def _parse_class_modifiers(self, node):
         modifiers = []
@@ -65,7 +65,7 @@ class JavaCodeParser(CodeParser):
             return modifiers
         for child in modifiers_node.children:
             if child.type == "annotation" or child.type == "marker_annotation":
-                name = re.search(self.annotation_re, child.text.decode("utf8")).group(1)
+                name = re.search(self.annotation_re, self._text(child)).group(1)
                 modifiers.append(name)
         return modifiers
 
@@ -73,8 +73,8 @@ class JavaCodeParser(CodeParser):
         name_node = node.child_by_field_name("name")
         if not name_node:
             return
-        class_name = name_node.text.decode("utf8")
-        _ = self.namespace.add_class(class_name, file_path)
+        class_name = self._text(name_node)
+        _ = self.namespace.add_class(class_name, file_path, self._span(node))
         
         for stereotype in self._parse_class_modifiers(node):
             self.namespace.add_class_stereotype(class_name, stereotype)
@@ -91,8 +91,9 @@ class JavaCodeParser(CodeParser):
                             if name_var:
                                 self.namespace.add_class_attribute(
                                     class_name=class_name,
-                                    name=name_var.text.decode("utf8"),
-                                    type_=type_node.text.decode("utf8") if type_node else ""
+                                    name=self._text(name_var),
+                                    type_=self._text(type_node) if type_node else "",
+                                    span=self._span(child)
                                 )
                 elif child.type in {"method_declaration", "constructor_declaration"}:
                     self._parse_method(child, class_name)
@@ -101,7 +102,7 @@ class JavaCodeParser(CodeParser):
         name_node = node.child_by_field_name("name")
         if not name_node:
             return
-        method_name = name_node.text.decode("utf8")
+        method_name = self._text(name_node)
         params = []
         invocations = []
 
@@ -113,8 +114,8 @@ class JavaCodeParser(CodeParser):
                     p_name = param.child_by_field_name("name")
                     if p_type and p_name:
                         params.append({
-                            "name": p_name.text.decode("utf8"),
-                            "type": p_type.text.decode("utf8")
+                            "name": self._text(p_name),
+                            "type": self._text(p_type)
                         })
 
         body_node = node.child_by_field_name("body")
@@ -124,12 +125,14 @@ class JavaCodeParser(CodeParser):
                 if n.type == "method_invocation":
                     name_child = n.child_by_field_name("name")
                     if name_child:
-                        calls.add(name_child.text.decode("utf8"))
+                        calls.add(self._text(name_child))
             invocations = list(calls)
 
         self.namespace.add_class_method(
             class_name=class_name,
             method_name=method_name,
             parameters=params,
-            invoked_methods=invocations
+            invoked_methods=invocations,
+            stereotypes=self._parse_class_modifiers(node),
+            span=self._span(node)
         )
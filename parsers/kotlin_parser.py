@@ -1,9 +1,9 @@
-from typing import Optional
+from typing import List, Optional
 from kopyt import Parser as KotlinParser
 from kopyt.node import ClassDeclaration, FunctionDeclaration, PostfixUnaryExpression, NavigationSuffix
 from kopyt.node import Statement, SimpleIdentifier, CallSuffix, SingleAnnotation
-from code_parser import CodeParser
-from metadata import Namespace
+from code_parser import CodeParser, Source, decode_source
+from metadata import Namespace, Span
 
 def extract_post_fix_expressions_old(block):
     if getattr(block, 'sequence', None) is None:
@@ -45,6 +45,25 @@ def extract_post_fix_expressions(block):
     
     return postfix_expressions
 
+def declaration_spans(starts: List[int], end: int, lines: List[str]) -> List[Span]:
+    """
+    kopyt only records where declarations start: each one is taken to end before the next
+    (or at `end`), without trailing blank lines, and to start at its leading annotations.
+    Lines are 1-based; byte offsets are not available.
+    """
+    starts = list(starts)
+    for i, start in enumerate(starts):
+        while start > 1 and lines[start - 2].lstrip().startswith("@"):
+            start -= 1
+        starts[i] = start
+    spans = []
+    for i, start in enumerate(starts):
+        last = starts[i + 1] - 1 if i + 1 < len(starts) else end
+        while last > start and not lines[last - 1].strip():
+            last -= 1
+        spans.append(Span(start, last))
+    return spans
+
 def get_modifier_name(modifier):
     if isinstance(modifier, SingleAnnotation):
         return modifier.name
@@ -54,22 +73,30 @@ def get_modifier_name(modifier):
         return None
 
 class KotlinCodeParser(CodeParser):
-    def parse_source(self, source_code: str, file_path: Optional[str]):
+    def parse_source(self, source_code: Source, file_path: Optional[str]):
         """Parses a Kotlin source file and returns metadata."""
 
-        parser = KotlinParser(source_code)
+        # kopyt works on text, so the whole file is decoded
+        text = decode_source(source_code)
+        parser = KotlinParser(text)
         ast = parser.parse()
+        lines = text.splitlines()
+        class_spans = declaration_spans([decl.position.line for decl in ast.declarations], len(lines), lines)
 
         # Create a Namespace instance
         namespace_name = ast.package.name if ast.package else None
         namespace = Namespace(name=namespace_name, imports=[imp.name for imp in ast.imports])
 
-        for decl in ast.declarations:
+        for decl, class_span in zip(ast.declarations, class_spans):
             if isinstance(decl, ClassDeclaration):
                 # Add class to the namespace
-                namespace.add_class(decl.name, file_path)
+                namespace.add_class(decl.name, file_path, class_span)
 
-                functions = [f for f in decl.body.members if isinstance(f, FunctionDeclaration)] if decl.body else []
+                members = decl.body.members if decl.body else []
+                # The last member ends before the closing brace of the class
+                body_end = class_span.end_line - 1 if lines[class_span.end_line - 1].strip() == "}" else class_span.end_line
+                member_spans = declaration_spans([member.position.line for member in members], body_end, lines)
+                functions = [(f, span) for f, span in zip(members, member_spans) if isinstance(f, FunctionDeclaration)]
                 
                 modifier_names = [get_modifier_name(modifier) for modifier in decl.modifiers]
                 
@@ -83,11 +110,12 @@ class KotlinCodeParser(CodeParser):
                         namespace.add_class_attribute(
                             class_name=decl.name,
                             name=attr.name,
-                            type_=str(attr.type) if attr.type else None
+                            type_=str(attr.type) if attr.type else None,
+                            span=Span(attr.position.line, attr.position.line)
                         )
 
                 # Add methods to the class
-                for method in functions:
+                for method, method_span in functions:
                     parameters = [
                         {
                             "name": param.name,
@@ -101,7 +129,9 @@ class KotlinCodeParser(CodeParser):
                         class_name=decl.name,
                         method_name=method.name,
                         parameters=parameters,
-                        invoked_methods=invoked_methods
+                        invoked_methods=invoked_methods,
+                        stereotypes=[m.name for m in method.modifiers if isinstance(m, SingleAnnotation)],
+                        span=method_span
                     )
 
         return namespace
@@ -0,0 +1,176 @@
+from typing import Optional
+from code_parser import CodeParser, Source
+from metadata import Namespace
+from tree_sitter import Language, Parser
+import tree_sitter_kotlin
+
+# Load the Kotlin language for Tree-sitter
+KOTLIN_LANGUAGE = Language(tree_sitter_kotlin.language())
+parser = Parser(KOTLIN_LANGUAGE)
+
+def walk(node):
+    yield node
+    for child in node.children:
+        yield from walk(child)
+
+def get_child_by_type(node, type):
+    for child in node.children:
+        if child.type == type:
+            return child
+    return None
+
+def get_type_child(node):
+    """
+    Returns the first child describing a type (user_type, nullable_type, function_type, ...).
+    """
+    for child in node.named_children:
+        if child.type.endswith("_type"):
+            return child
+    return None
+
+class KotlinTreeSitterCodeParser(CodeParser):
+    """
+    Tree-sitter implementation of CodeParser for Kotlin source files.
+
+    Produces the same Namespace layout as KotlinCodeParser (kopyt): top-level classes and
+    interfaces, constructor parameters as attributes, annotations and modifiers as stereotypes,
+    and invocations as `receiver.member` or `Callee.constructor`. Files the grammar cannot
+    parse cleanly are handed to KotlinCodeParser so that no declarations are lost.
+    """
+    def __init__(self, fallback: bool = True):
+        self.fallback = fallback
+        self._fallback_parser = None
+
+    def parse_source(self, source_code: Source, file_path: Optional[str]) -> Namespace:
+        tree = parser.parse(self._prepare_source(source_code))
+        root_node = tree.root_node
+
+        if root_node.has_error and self.fallback:
+            return self._parse_with_kopyt(source_code, file_path)
+
+        self.namespace = Namespace(name=None, imports=[])
+        for child in root_node.named_children:
+            if child.type == "package_header":
+                self._parse_package(child)
+            elif child.type == "import":
+                self._parse_import(child)
+            elif child.type == "class_declaration":
+                self._parse_class(child, file_path)
+
+        return self.namespace
+
+    def resolve_references(self, metadata, root_namespace):
+        """Stub for resolving Kotlin import and type references."""
+        raise NotImplementedError("KotlinTreeSitterCodeParser.resolve_references not implemented.")
+
+    def _parse_with_kopyt(self, source_code: Source, file_path: Optional[str]) -> Namespace:
+        if self._fallback_parser is None:
+            from parsers.kotlin_parser import KotlinCodeParser
+            self._fallback_parser = KotlinCodeParser()
+        return self._fallback_parser.parse_source(source_code, file_path)
+
+    def _parse_package(self, node):
+        name_node = get_child_by_type(node, "qualified_identifier")
+        if name_node:
+            self.namespace.name = self._text(name_node)
+
+    def _parse_import(self, node):
+        path_node = get_child_by_type(node, "qualified_identifier")
+        if path_node:
+            self.namespace.imports.add(self._text(path_node))
+
+    def _parse_modifiers(self, node, annotations_only: bool = False):
+        modifiers = []
+        modifiers_node = get_child_by_type(node, "modifiers")
+        if not modifiers_node:
+            return modifiers
+        for child in modifiers_node.named_children:
+            if child.type == "annotation":
+                invocation = get_child_by_type(child, "constructor_invocation")
+                type_node = get_child_by_type(invocation or child, "user_type")
+                if type_node:
+                    names = [self._text(n) for n in type_node.named_children if n.type == "identifier"]
+                    modifiers.append(".".join(names))
+            elif not annotations_only:
+                modifiers.append(self._text(child))
+        return modifiers
+
+    def _parse_class(self, node, file_path: Optional[str]):
+        name_node = node.child_by_field_name("name")
+        if not name_node:
+            return
+        class_name = self._text(name_node)
+        self.namespace.add_class(class_name, file_path, self._span(node))
+
+        for stereotype in self._parse_modifiers(node):
+            self.namespace.add_class_stereotype(class_name, stereotype)
+
+        # Add attributes from the constructor parameters
+        constructor = get_child_by_type(node, "primary_constructor")
+        parameters = get_child_by_type(constructor, "class_parameters") if constructor else None
+        if parameters:
+            for param in parameters.named_children:
+                if param.type != "class_parameter":
+                    continue
+                p_name = get_child_by_type(param, "identifier")
+                p_type = get_type_child(param)
+                if p_name:
+                    self.namespace.add_class_attribute(
+                        class_name=class_name,
+                        name=self._text(p_name),
+                        type_=self._text(p_type) if p_type else None,
+                        span=self._span(param)
+                    )
+
+        body_node = get_child_by_type(node, "class_body") or get_child_by_type(node, "enum_class_body")
+        if body_node:
+            for child in body_node.named_children:
+                if child.type == "function_declaration":
+                    self._parse_method(child, class_name)
+
+    def _parse_method(self, node, class_name):
+        name_node = node.child_by_field_name("name")
+        if not name_node:
+            return
+        method_name = self._text(name_node)
+        params = []
+
+        params_node = get_child_by_type(node, "function_value_parameters")
+        if params_node:
+            for param in params_node.named_children:
+                if param.type == "parameter":
+                    p_name = get_child_by_type(param, "identifier")
+                    p_type = get_type_child(param)
+                    if p_name:
+                        params.append({
+                            "name": self._text(p_name),
+                            "type": self._text(p_type) if p_type else None
+                        })
+
+        body_node = get_child_by_type(node, "function_body")
+        invocations = self._parse_invoked_methods(body_node) if body_node else []
+
+        self.namespace.add_class_method(
+            class_name=class_name,
+            method_name=method_name,
+            parameters=params,
+            invoked_methods=invocations,
+            stereotypes=self._parse_modifiers(node, annotations_only=True),
+            span=self._span(node)
+        )
+
+    def _parse_invoked_methods(self, body_node):
+        """
+        Collects `receiver.member` navigations and `Callee(...)` calls, in source order.
+        """
+        invoked_methods = []
+        for n in walk(body_node):
+            if n.type == "navigation_expression":
+                receiver, member = n.named_children[0], n.named_children[-1]
+                if receiver.type == "identifier" and member.type == "identifier" and receiver != member:
+                    invoked_methods.append(f"{self._text(receiver)}.{self._text(member)}")
+            elif n.type == "call_expression":
+                callee = n.named_children[0]
+                if callee.type == "identifier":
+                    invoked_methods.append(f"{self._text(callee)}.constructor")
+        return invoked_methods
@@ -1,7 +1,7 @@
 from typing import Optional
-from code_parser import CodeParser
+from code_parser import CodeParser, Source, decode_text
 
-from metadata import ClassMetadata, Namespace
+from metadata import Namespace
 from tree_sitter import Language, Parser
 import tree_sitter_php as tsphp
 
@@ -9,279 +9,239 @@ import tree_sitter_php as tsphp
 PHP_LANGUAGE = Language(tsphp.language_php())
 parser = Parser(PHP_LANGUAGE)
 
-def parse_php_source(code):
-    tree = parser.parse(bytes(code, "utf8"))
-    root_node = tree.root_node
+# Declarations registered as classes, with the stereotype added for each kind
+TYPE_DECLARATIONS = {
+    "class_declaration": None,
+    "interface_declaration": "interface",
+    "trait_declaration": "trait",
+    "enum_declaration": "enum",
+}
+CLASS_MODIFIERS = {"abstract_modifier", "final_modifier", "readonly_modifier"}
+PARAMETER_TYPES = {"simple_parameter", "variadic_parameter", "property_promotion_parameter"}
+MEMBER_CALL_TYPES = {"member_call_expression", "nullsafe_member_call_expression"}
 
-    metadata = {
-        "namespace": "",
-        "imports": [],
-        "classes": {}
-    }
+def to_dotted(name: bytes) -> str:
+    return decode_text(name.replace(b"\\", b".")).lstrip(".")
 
-    namespace = Namespace(
-        namespace
-    )
-
-    def parse_namespace(node):
-        namespace_node = node.child_by_field_name("name")
-        if namespace_node:
-            namespace_name = namespace_node.text.replace(b"\\", b".")
-            metadata["namespace"] = namespace_name.decode("utf8")
-
-    def parse_imports(node):
-        for child in node.children:
-            if child.type == "namespace_use_clause":
-                qualified_name = child.children[0].text
-                if qualified_name:
-                    qualified_name = qualified_name.replace(b"\\", b".")
-                    metadata["imports"].append(qualified_name.decode("utf8"))
-
-    def parse_class(node):
-        class_name_node = node.child_by_field_name("name")
-        if class_name_node:
-            class_name = class_name_node.text.decode("utf8")
-            class_metadata = {
-                "attributes": [],
-                "methods": []
-            }
-            metadata["classes"][class_name] = class_metadata
-            
-            declaration_list = tranverse_until_node_type(node, "declaration_list")
-
-            for child in declaration_list.children:
-                if child.type == "property_declaration":
-                    parse_attribute(child, class_metadata)
-                elif child.type == "method_declaration":
-                    parse_method(child, class_metadata)
-
-    def parse_attribute(node, class_metadata):
-        attribute_name = None
-        for child in node.children:
-            if child.type == "property_element":
-                attribute_name = child.child_by_field_name("name")
-        if attribute_name:
-            class_metadata["attributes"].append({
-                "name": attribute_name.text.decode("utf8"),
-                "type": None
-            })
-
-    def parse_method(node, class_metadata):
-        method_name_node = node.child_by_field_name("name")
-        if method_name_node:
-            method_name = method_name_node.text.decode("utf8")
-            method_metadata = {
-                "name": method_name,
-                "parameters": [],
-                "invoked_methods": []
-            }
-            class_metadata["methods"].append(method_metadata)
-            
-            formal_parameters = tranverse_until_node_type(node, "formal_parameters")
-            if formal_parameters:
-                for child in formal_parameters.children:
-                    parse_parameter(child, method_metadata)
-
-            for child in node.children:
-                if child.type == "compound_statement":
-                    parse_invoked_method(child, method_metadata)
-
-    def parse_parameter(node, method_metadata):
-        parameter_name_node = node.child_by_field_name("name")
-        parameter_type_node = node.child_by_field_name("type")
-        if parameter_name_node and parameter_type_node:
-            parameter_name = parameter_name_node.text.decode("utf8")
-            parameter_type = parameter_type_node.text.decode("utf8")
-            method_metadata["parameters"].append({
-                "name": parameter_name,
-                "type": parameter_type
-            })
-
-    def parse_invoked_method(node, method_metadata):
-        calls = set()
-        call_types = {"scoped_call_expression", "member_call_expression"} # , "call_expression"
-        for n in walk(node):
-            if n.type in call_types:
-                invoked = get_invoked_method_name(n)
-                calls.add(invoked)
-        for invoked in calls:
-            method_metadata["invoked_methods"].append(invoked)
-
-    def get_invoked_method_name(node):
-        member_name_node = node.child_by_field_name("name")
-        variable_name_node = tranverse_until_node_type(node, "name")
-        if member_name_node or variable_name_node:
-            variable_name = variable_name_node.text.decode("utf8")
-            member_name = member_name_node.text.decode("utf8")
-            return f"{variable_name}::{member_name}"
-        return None
-    
-    def walk(node):
-        yield node
-        for child in node.children:
-            yield from walk(child)
-
-    def traverse(node):
-        if node.type == "namespace_definition":
-            parse_namespace(node)
-        elif node.type == "namespace_use_declaration":
-            parse_imports(node)
-        elif node.type == "class_declaration":
-            parse_class(node)
-        for child in node.children:
-            traverse(child)
-
-    def tranverse_until_node_type(node, target_type):
-        """
-        Tranverse the tree until a node with the target type is found.
-        """
-        if node.type == target_type:
-            return node
-        for child in node.children:
-            result = tranverse_until_node_type(child, target_type)
-            if result:
-                return result
-        return None
-
-    traverse(root_node)
-    return metadata
-
-def tranverse_until_node_type(node, target_type):
-    """
-    Tranverse the tree until a node with the target type is found.
+class PhpCodeParser(CodeParser):
     """
-    if node.type == target_type:
-        return node
-    for child in node.children:
-        result = tranverse_until_node_type(child, target_type)
-        if result:
-            return result
-    return None
+    Concrete implementation of CodeParser for PHP source files.
 
-def walk(node):
-    yield node
-    for child in node.children:
-        yield from walk(child)
+    The syntax tree is visited once with a tree cursor; classes, interfaces, traits and enums
+    are registered as classes, and calls are attributed to the enclosing method, including the
+    calls made in its closures and in the methods of its anonymous classes.
+    """
+    def parse_source(self, source_code: Source, file_path: Optional[str]):
+        tree = parser.parse(self._prepare_source(source_code))
 
-class PhpCodeParser(CodeParser):
-    def parse_source(self, source_code, file_path: Optional[str]):
-        tree = parser.parse(bytes(source_code, "utf8"))
-        root_node = tree.root_node
-        
         self.namespace = Namespace(name="", imports=[])
-        
-        def traverse(node):
-            if node.type == "namespace_definition":
-                self._parse_namespace(node)
-            elif node.type == "namespace_use_declaration":
-                self._parse_imports(node)
-            elif node.type == "class_declaration":
-                self._parse_class(node, file_path)
-            for child in node.children:
-                traverse(child)
-            
-        traverse(root_node)
-        
-        return self.namespace
+        self._file_path = file_path
+        self._class_name = None
+        self._method = None
+        self._method_node_id = None
+
+        cursor = tree.walk()
+        while True:
+            if self._enter(cursor.node) and cursor.goto_first_child():
+                continue
+            while True:
+                self._exit(cursor.node)
+                if cursor.goto_next_sibling():
+                    break
+                if not cursor.goto_parent():
+                    return self.namespace
 
     def resolve_references(self, metadata, root_namespace):
         """Stub for resolving references in PHP files."""
-        raise NotImplementedError("PhpCodeParser is not yet implemented.")
+        raise NotImplementedError("PhpCodeParser.resolve_references not implemented.")
+
+    def _enter(self, node) -> bool:
+        """
+        Handles a node on the way down; returns whether its children should be visited.
+        """
+        node_type = node.type
+        if self._method is not None:
+            if node_type in MEMBER_CALL_TYPES or node_type == "scoped_call_expression":
+                self._add_call(node)
+            elif node_type == "object_creation_expression":
+                self._add_creation(node)
+            return True
+        if node_type == "namespace_definition":
+            self._parse_namespace(node)
+            return True
+        if node_type == "namespace_use_declaration":
+            self._parse_imports(node)
+            return False
+        if node_type in TYPE_DECLARATIONS:
+            return self._parse_class(node)
+        if self._class_name is None:
+            return True
+        if node_type == "property_declaration":
+            self._parse_attribute(node)
+            return False
+        if node_type == "enum_case":
+            self._parse_enum_case(node)
+            return False
+        if node_type == "method_declaration":
+            return self._parse_method(node)
+        return True
+
+    def _exit(self, node):
+        node_type = node.type
+        # Methods of anonymous classes end inside the enclosing method
+        if node_type == "method_declaration" and node.id == self._method_node_id:
+            self.namespace.add_class_method(
+                class_name = self._class_name,
+                method_name = self._method["name"],
+                parameters = self._method["parameters"],
+                invoked_methods = list(self._method["invoked_methods"]),
+                stereotypes = self._method["stereotypes"],
+                span = self._method["span"]
+            )
+            self._method = None
+            self._method_node_id = None
+        elif node_type in TYPE_DECLARATIONS:
+            self._class_name = None
 
     def _parse_namespace(self, node):
         namespace_node = node.child_by_field_name("name")
         if namespace_node:
-            self.namespace.name = namespace_node.text.replace(b"\\", b".").decode("utf8")
+            self.namespace.name = self._dotted(namespace_node)
 
     def _parse_imports(self, node):
-        for child in node.children:
-            if child.type == "namespace_use_clause":
-                qualified_name = child.children[0].text
-                if qualified_name:
-                    qualified_name = qualified_name.replace(b"\\", b".")
-                    self.namespace.imports.add(qualified_name.decode("utf8"))
-                    
-    def _parse_class(self, node, file_path: Optional[str]):
+        # Group use: `use Prefix\{A, B as C};`
+        prefix_node = next((c for c in node.named_children if c.type == "namespace_name"), None)
+        group_node = node.child_by_field_name("body")
+        prefix = self._dotted(prefix_node) + "." if prefix_node else ""
+        clauses = group_node.named_children if group_node else node.named_children
+        for clause in clauses:
+            if clause.type == "namespace_use_clause" and clause.named_children:
+                self.namespace.imports.add(prefix + self._dotted(clause.named_children[0]))
+
+    def _parse_class(self, node) -> bool:
         class_name_node = node.child_by_field_name("name")
-        if class_name_node:
-            class_name = class_name_node.text.decode("utf8")
-
-            class_metadata = self.namespace.add_class(class_name, file_path)
-            
-            declaration_list = tranverse_until_node_type(node, "declaration_list")
-
-            for child in declaration_list.children:
-                if child.type == "property_declaration":
-                    self._parse_attribute(child, class_name)
-                elif child.type == "method_declaration":
-                    self._parse_method(child, class_name)
-                
-            self.namespace.add_class(class_metadata)
-                    
-    def _parse_attribute(self, node, class_name):
-        attribute_name = None
-        for child in node.children:
+        if not class_name_node:
+            return False
+        class_name = self._text(class_name_node)
+        self.namespace.add_class(class_name, self._file_path, self._span(node))
+        self._class_name = class_name
+
+        kind = TYPE_DECLARATIONS[node.type]
+        if kind:
+            self.namespace.add_class_stereotype(class_name, kind)
+        for child in node.named_children:
+            if child.type in CLASS_MODIFIERS:
+                self.namespace.add_class_stereotype(class_name, self._text(child))
+        for attribute_name in self._attribute_names(node):
+            self.namespace.add_class_stereotype(class_name, attribute_name)
+        return True
+
+    def _attribute_names(self, node):
+        # `#[Route('/x'), Get]` -> Route, Get
+        for child in node.named_children:
+            if child.type == "attribute_list":
+                for group in child.named_children:
+                    for attribute in group.named_children:
+                        if attribute.type == "attribute" and attribute.named_children:
+                            yield self._dotted(attribute.named_children[0])
+
+    def _parse_attribute(self, node):
+        type_node = node.child_by_field_name("type")
+        type_ = self._text(type_node) if type_node else ""
+        for child in node.named_children:
             if child.type == "property_element":
-                attribute_name = child.child_by_field_name("name")
-        if attribute_name:
+                name_node = child.child_by_field_name("name")
+                if name_node:
+                    self.namespace.add_class_attribute(
+                        class_name = self._class_name,
+                        name = self._text(name_node),
+                        type_ = type_,
+                        span = self._span(node)
+                    )
+
+    def _parse_enum_case(self, node):
+        name_node = node.child_by_field_name("name")
+        if name_node:
             self.namespace.add_class_attribute(
-                class_name = class_name,
-                name = attribute_name.text.decode("utf8"),
-                type_ = ""
+                class_name = self._class_name,
+                name = self._text(name_node),
+                type_ = self._class_name,
+                span = self._span(node)
             )
-            
-    def _parse_method(self, node, class_name):
-        method_name_node = node.child_by_field_name("name")
-        if method_name_node:
-            method_name = method_name_node.text.decode("utf8")
-            method_metadata = {
-                "name": method_name,
-                "parameters": [],
-                "invoked_methods": []
-            }
-            
-            formal_parameters = tranverse_until_node_type(node, "formal_parameters")
-            if formal_parameters:
-                for child in formal_parameters.children:
-                    self._parse_parameter(child, method_metadata)
 
-            for child in node.children:
-                if child.type == "compound_statement":
-                    self._parse_invoked_method(child, method_metadata)
-                    
-            self.namespace.add_class_method(
-                class_name = class_name,
-                method_name = method_name,
-                parameters = method_metadata["parameters"],
-                invoked_methods = method_metadata["invoked_methods"]
-            )
-            
-    def _parse_parameter(self, node, method_metadata):
+    def _parse_method(self, node) -> bool:
+        method_name_node = node.child_by_field_name("name")
+        if not method_name_node:
+            return False
+        self._method = {
+            "name": self._text(method_name_node),
+            "parameters": [],
+            "invoked_methods": {},
+            "stereotypes": list(self._attribute_names(node)),
+            "span": self._span(node)
+        }
+        self._method_node_id = node.id
+
+        formal_parameters = node.child_by_field_name("parameters")
+        if formal_parameters:
+            for child in formal_parameters.named_children:
+                if child.type in PARAMETER_TYPES:
+                    self._parse_parameter(child)
+        return True
+
+    def _parse_parameter(self, node):
         parameter_name_node = node.child_by_field_name("name")
+        if not parameter_name_node:
+            return
         parameter_type_node = node.child_by_field_name("type")
-        if parameter_name_node and parameter_type_node:
-            parameter_name = parameter_name_node.text.decode("utf8")
-            parameter_type = parameter_type_node.text.decode("utf8")
-            method_metadata["parameters"].append({
-                "name": parameter_name,
-                "type": parameter_type
-            })
-            
-    def _parse_invoked_method(self, node, method_metadata):
-        calls = set()
-        call_types = {"scoped_call_expression", "member_call_expression"} # , "call_expression"
-        for n in walk(node):
-            if n.type in call_types:
-                invoked = self._get_invoked_method_name(n)
-                calls.add(invoked)
-        for invoked in calls:
-            method_metadata["invoked_methods"].append(invoked)
-            
-    def _get_invoked_method_name(self, node):
-        member_name_node = node.child_by_field_name("name")
-        variable_name_node = tranverse_until_node_type(node, "name")
-        if member_name_node or variable_name_node:
-            variable_name = variable_name_node.text.decode("utf8")
-            member_name = member_name_node.text.decode("utf8")
-            return f"{variable_name}::{member_name}"
-        return None
\ No newline at end of file
+        parameter_name = self._text(parameter_name_node)
+        parameter_type = self._text(parameter_type_node) if parameter_type_node else ""
+        self._method["parameters"].append({
+            "name": parameter_name,
+            "type": parameter_type
+        })
+        # Constructor property promotion also declares a class attribute
+        if node.type == "property_promotion_parameter":
+            self.namespace.add_class_attribute(
+                class_name = self._class_name,
+                name = parameter_name,
+                type_ = parameter_type,
+                span = self._span(node)
+            )
+
+    def _dotted(self, node) -> str:
+        return to_dotted(node.text)
+
+    def _receiver_name(self, node) -> Optional[str]:
+        """
+        Names the receiver of a call: `$var` -> var, `$this->prop` -> prop, `Cls::` -> Cls.
+        Chained calls and dynamic receivers are not resolved.
+        """
+        if node.type == "variable_name":
+            return self._text(node).lstrip("$")
+        if node.type in {"member_access_expression", "nullsafe_member_access_expression"}:
+            name_node = node.child_by_field_name("name")
+            if name_node and name_node.type == "name":
+                return self._text(name_node)
+            return None
+        if node.type in {"name", "qualified_name", "relative_scope"}:
+            return self._dotted(node)
+        return None
+
+    def _add_call(self, node):
+        name_node = node.child_by_field_name("name")
+        if node.type == "scoped_call_expression":
+            receiver_node = node.child_by_field_name("scope")
+        else:
+            receiver_node = node.child_by_field_name("object")
+        if not name_node or not receiver_node or name_node.type != "name":
+            return
+        receiver = self._receiver_name(receiver_node)
+        if receiver:
+            self._method["invoked_methods"][f"{receiver}::{self._text(name_node)}"] = None
+
+    def _add_creation(self, node):
+        for child in node.named_children:
+            if child.type in {"name", "qualified_name"}:
+                self._method["invoked_methods"][f"{self._dotted(child)}::__construct"] = None
+                return
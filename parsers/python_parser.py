@@ -1,7 +1,7 @@
 import re
 from typing import Optional
 from pathlib import Path
-from code_parser import CodeParser
+from code_parser import CodeParser, Source
 from metadata import ClassMetadata, Namespace
 from tree_sitter import Language, Parser
 import tree_sitter_python
@@ -26,10 +26,12 @@ class PythonCodeParser(CodeParser):
         super().__init__()
         # Regex to extract decorator name (without the '@')
         self.decorator_re = r"(?<=@)([A-Za-z_][A-Za-z0-9_]*)"
+        # Method decorators keep their dotted name, e.g. `router.get`
+        self.method_decorator_re = r"(?<=@)([A-Za-z_][A-Za-z0-9_.]*)"
 
-    def parse_source(self, source_code: str, file_path: Optional[str]) -> Namespace:
+    def parse_source(self, source_code: Source, file_path: Optional[str]) -> Namespace:
         # Parse the source code into a syntax tree
-        tree = parser.parse(bytes(source_code, "utf8"))
+        tree = parser.parse(self._prepare_source(source_code))
         root_node = tree.root_node
         # Initialize namespace metadata
         self.namespace = Namespace(name="", imports=set())
@@ -63,10 +65,10 @@ class PythonCodeParser(CodeParser):
         """
         module_node = node.child_by_field_name("module")
         if module_node:
-            self.namespace.imports.add(module_node.text.decode("utf8"))
+            self.namespace.imports.add(self._text(module_node))
 
     def _parse_from_import(self, node):
-        import_from_statement = node.text.decode("utf8")
+        import_from_statement = self._text(node)
         module_name = re.search(r'from\s+(\S+)\s+import', import_from_statement).group(1)
         imported_names = [f"{module_name}.{name.strip()}" for name in import_from_statement.split("import", 1)[1].split(",")]
         for name in imported_names:
@@ -82,7 +84,7 @@ class PythonCodeParser(CodeParser):
                 lhs = child.child_by_field_name("left")
                 if lhs and lhs.type == "attribute":
                     _, _, attribute_name = lhs.children
-                    attribute_names.append(attribute_name.text.decode("utf8"))
+                    attribute_names.append(self._text(attribute_name))
         return attribute_names
     
     def _get_last_of_type(self, nodes, type: str):
@@ -105,14 +107,17 @@ class PythonCodeParser(CodeParser):
         name_node = node.child_by_field_name("name")
         if not name_node:
             return
-        class_name = name_node.text.decode("utf8")
+        class_name = self._text(name_node)
+        # Decorators belong to the enclosing decorated_definition, which also starts the span
+        decorated = node.parent if node.parent and node.parent.type == "decorated_definition" else node
+
         # Register the class in the namespace
-        _ = self.namespace.add_class(class_name, file_path)
+        _ = self.namespace.add_class(class_name, file_path, self._span(decorated))
 
         # Extract decorator names
-        for child in node.children:
+        for child in decorated.children:
             if child.type == "decorator":
-                m = re.search(self.decorator_re, child.text.decode("utf8"))
+                m = re.search(self.decorator_re, self._text(child))
                 if m:
                     self.namespace.add_class_stereotype(class_name, m.group(1))
 
@@ -126,21 +131,32 @@ class PythonCodeParser(CodeParser):
                     if target and target.type == "identifier":
                         self.namespace.add_class_attribute(
                             class_name=class_name,
-                            name=target.text.decode("utf8"),
-                            type_=""
+                            name=self._text(target),
+                            type_="",
+                            span=self._span(stmt)
                         )
                 # Method definition inside a class
                 elif stmt.type == "function_definition":
                     self._parse_method(stmt, class_name)
-
-    def _parse_method(self, node, class_name):
+                elif stmt.type == "decorated_definition":
+                    definition = stmt.child_by_field_name("definition")
+                    if definition and definition.type == "function_definition":
+                        decorators = []
+                        for child in stmt.children:
+                            if child.type == "decorator":
+                                m = re.search(self.method_decorator_re, self._text(child))
+                                if m:
+                                    decorators.append(m.group(1))
+                        self._parse_method(definition, class_name, decorators, self._span(stmt))
+
+    def _parse_method(self, node, class_name, decorators=None, span=None):
         """
         Parses method definitions inside classes.
         """
         name_node = node.child_by_field_name("name")
         if not name_node:
             return
-        method_name = name_node.text.decode("utf8")
+        method_name = self._text(name_node)
         params = []
         invocations = []
 
@@ -152,7 +168,7 @@ class PythonCodeParser(CodeParser):
                     p_name = param.child_by_field_name("name")
                     if p_name:
                         params.append({
-                            "name": p_name.text.decode("utf8"),
+                            "name": self._text(p_name),
                             "type": ""
                         })
 
@@ -167,7 +183,8 @@ class PythonCodeParser(CodeParser):
                         self.namespace.add_class_attribute(
                             class_name=class_name,
                             name=attribute_name,
-                            type_="")
+                            type_="",
+                            span=self._span(stmt))
         
         # Extract method invocations
             calls = set()
@@ -175,7 +192,7 @@ class PythonCodeParser(CodeParser):
                 if n.type == "call":
                     method_call = self._get_method_call(n)
                     if method_call:
-                        calls.add(method_call.text.decode("utf8"))
+                        calls.add(self._text(method_call))
             invocations = list(calls)
 
         # Register the method in the class metadata
@@ -183,5 +200,7 @@ class PythonCodeParser(CodeParser):
             class_name=class_name,
             method_name=method_name,
             parameters=params,
-            invoked_methods=invocations
+            invoked_methods=invocations,
+            stereotypes=decorators,
+            span=span or self._span(node)
         )
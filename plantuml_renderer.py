@@ -0,0 +1,275 @@
+import logging
+import os
+import queue
+import select
+import subprocess
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from plantuml import PlantUMLError
+
+from tracing import traced
+
+logger = logging.getLogger(__name__)
+
+# Number of PlantUML JVMs kept warm by default
+RENDER_WORKERS = 2
+# Maximum time in seconds to render a single diagram
+RENDER_TIMEOUT = 60
+
+PNG_END = b"IEND\xaeB`\x82"
+
+class PlantUMLRenderError(PlantUMLError):
+    """
+    The diagram was rendered but PlantUML reported an error in its text.
+    """
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+class PlantUMLProcessError(PlantUMLError):
+    """
+    The PlantUML process failed, timed out or could not be started.
+    """
+    def __init__(self, message: str):
+        super().__init__(message)
+        self.message = message
+
+def ensure_diagram_markers(plantuml_text: str) -> str:
+    """
+    Wraps the text in @startuml/@enduml when missing; pipe mode waits for the end marker.
+    """
+    text = plantuml_text.strip()
+    if not text.startswith("@start"):
+        text = f"@startuml\n{text}\n@enduml"
+    return text + "\n"
+
+class PlantUMLProcess:
+    """
+    A long-lived PlantUML JVM in pipe mode, rendering one diagram at a time.
+    """
+    def __init__(self, jar_path: str, java: str = "java", timeout: float = RENDER_TIMEOUT):
+        self.jar_path = jar_path
+        self.java = java
+        self.timeout = timeout
+        self.delimiter = f"__PLANTUML_END_{uuid.uuid4().hex}__".encode("ascii")
+        self._buffer = b""
+        self.process = None
+        self.start()
+
+    def start(self):
+        command = [
+            self.java, "-Djava.awt.headless=true", "-jar", self.jar_path,
+            "-pipe", "-tpng", "-charset", "UTF-8", "-pipeNoStderr",
+            "-pipedelimitor", self.delimiter.decode("ascii"),
+        ]
+        try:
+            self.process = subprocess.Popen(command, stdin=subprocess.PIPE,
+                                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+        except OSError as e:
+            raise PlantUMLProcessError(f"Cannot start PlantUML ({self.java} -jar {self.jar_path}): {e}")
+        self._buffer = b""
+
+    def close(self):
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+            self.process.wait()
+
+    def render(self, plantuml_text: str) -> bytes:
+        if self.process.poll() is not None:
+            logger.info(f"Restarting PlantUML process (exit code {self.process.returncode})")
+            self.start()
+        try:
+            self.process.stdin.write(ensure_diagram_markers(plantuml_text).encode("utf8"))
+            self.process.stdin.flush()
+            output = self._read_until_delimiter()
+        except PlantUMLProcessError:
+            self.close()
+            raise
+        except OSError as e:
+            self.close()
+            raise PlantUMLProcessError(str(e))
+
+        # With -pipeNoStderr, errors are written after the (error) image, before the delimiter
+        end = output.rfind(PNG_END)
+        image, trailer = (output[:end + len(PNG_END)], output[end + len(PNG_END):]) if end >= 0 else (output, b"")
+        trailer = trailer.strip()
+        if trailer.startswith(b"ERROR"):
+            lines = trailer.decode("utf8", errors="replace").splitlines()
+            line = lines[1] if len(lines) > 1 else "?"
+            detail = " ".join(lines[2:]) or "syntax error"
+            raise PlantUMLRenderError(f"PlantUML error at line {line}: {detail}")
+        return image
+
+    def _read_until_delimiter(self) -> bytes:
+        deadline = time.monotonic() + self.timeout
+        stdout = self.process.stdout.fileno()
+        marker = self.delimiter + b"\n"
+        while marker not in self._buffer:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise PlantUMLProcessError(f"PlantUML did not answer within {self.timeout}s")
+            readable, _, _ = select.select([stdout], [], [], remaining)
+            if readable:
+                chunk = os.read(stdout, 1 << 16)
+                if not chunk:
+                    raise PlantUMLProcessError("PlantUML process exited")
+                self._buffer += chunk
+        output, _, self._buffer = self._buffer.partition(marker)
+        return output
+
+class LocalPlantUML:
+    """
+    Renders diagrams with a pool of warm PlantUML processes. Thread safe: concurrent calls
+    to `processes` render in parallel, up to the pool size.
+
+    Exposes the `processes(plantuml_text) -> bytes` and `url` interface of plantuml.PlantUML.
+    """
+    def __init__(self, jar_path: str, workers: int = RENDER_WORKERS, java: str = "java",
+                 timeout: float = RENDER_TIMEOUT):
+        self.url = f"local:{jar_path}"
+        self.workers = max(1, workers)
+        self._idle = queue.Queue()
+        self._lock = threading.Lock()
+        self._started = 0
+        self._factory = lambda: PlantUMLProcess(jar_path, java=java, timeout=timeout)
+
+    def _acquire(self) -> PlantUMLProcess:
+        # Processes are started on demand, so the JVMs only cost something when diagrams are drawn
+        with self._lock:
+            if self._idle.empty() and self._started < self.workers:
+                self._started += 1
+                try:
+                    return self._factory()
+                except PlantUMLError:
+                    self._started -= 1
+                    raise
+        return self._idle.get()
+
+    def processes(self, plantuml_text: str) -> bytes:
+        process = self._acquire()
+        try:
+            return process.render(plantuml_text)
+        finally:
+            self._idle.put(process)
+
+    def processes_many(self, plantuml_texts: List[str]) -> List[bytes]:
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(self.processes, plantuml_texts))
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get().close()
+
+class FallbackPlantUML:
+    """
+    Renders with a primary processor and retries with a fallback one (e.g. a PlantUML server)
+    when the primary cannot render at all. Errors in the diagram text are not retried.
+    """
+    def __init__(self, primary, fallback):
+        self.primary = primary
+        self.fallback = fallback
+        self.url = f"{primary.url} (fallback: {fallback.url})"
+        self.workers = getattr(primary, "workers", 1)
+        # The plantuml server client shares one httplib2 connection, which is not thread safe
+        self._fallback_lock = threading.Lock()
+
+    def processes(self, plantuml_text: str) -> bytes:
+        try:
+            return self.primary.processes(plantuml_text)
+        except PlantUMLProcessError as e:
+            logger.warning(f"Local PlantUML rendering failed ({e.message}), using {self.fallback.url}")
+            with self._fallback_lock:
+                return self.fallback.processes(plantuml_text)
+
+    def processes_many(self, plantuml_texts: List[str]) -> List[bytes]:
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            return list(executor.map(self.processes, plantuml_texts))
+
+@traced("render")
+def render_to_file(plant_uml, plantuml_text: str, output_file: str, cache=None):
+    """
+    Renders a diagram to output_file, through the diagram cache when one is given.
+    """
+    image_format = os.path.splitext(output_file)[1] or ".png"
+    cached_path = cache.get(plantuml_text, image_format) if cache else None
+    if cached_path:
+        cache.link(cached_path, output_file)
+        return
+
+    image = plant_uml.processes(plantuml_text)
+    if cache:
+        cache.link(cache.put(plantuml_text, image_format, image), output_file)
+    else:
+        # Replace rather than overwrite: the file may be a hard link into the diagram cache
+        if os.path.exists(output_file):
+            os.remove(output_file)
+        with open(output_file, "wb") as file:
+            file.write(image)
+
+@dataclass
+class RenderFailure:
+    output_file: str
+    message: str
+
+class RenderQueue:
+    """
+    Renders diagrams in background threads, so that the agents do not wait for the images.
+    When a diagram is submitted again for the same output file before it is drawn, only the
+    latest text is rendered.
+    """
+    def __init__(self, plant_uml, cache=None, workers: Optional[int] = None):
+        self.plant_uml = plant_uml
+        self.cache = cache
+        self.rendered = 0
+        self._executor = ThreadPoolExecutor(max_workers=workers or getattr(plant_uml, "workers", 1),
+                                            thread_name_prefix="plantuml-render")
+        self._lock = threading.Lock()
+        self._pending: Dict[str, str] = {}
+        self._file_locks: Dict[str, threading.Lock] = {}
+        self._failures: Dict[str, str] = {}
+        self._futures = []
+
+    def submit(self, plantuml_text: str, output_file: str):
+        with self._lock:
+            self._pending[output_file] = plantuml_text
+            self._file_locks.setdefault(output_file, threading.Lock())
+            self._futures.append(self._executor.submit(self._render_latest, output_file))
+
+    def _render_latest(self, output_file: str):
+        # One render at a time per file; a job finding nothing pending was superseded by an earlier one
+        with self._file_locks[output_file]:
+            with self._lock:
+                plantuml_text = self._pending.pop(output_file, None)
+            if plantuml_text is None:
+                return
+            try:
+                render_to_file(self.plant_uml, plantuml_text, output_file, self.cache)
+            except Exception as e:
+                message = e.message if hasattr(e, 'message') else str(e) or type(e).__name__
+                logger.error(f"Error rendering {output_file}: {message}")
+                with self._lock:
+                    self._failures[output_file] = message
+                return
+            with self._lock:
+                self.rendered += 1
+                self._failures.pop(output_file, None)
+
+    def wait(self) -> List[RenderFailure]:
+        """
+        Waits until every submitted diagram is rendered and returns the failed ones.
+        """
+        with self._lock:
+            futures, self._futures = self._futures, []
+        wait(futures)
+        with self._lock:
+            return [RenderFailure(output_file, message) for output_file, message in self._failures.items()]
+
+    def close(self) -> List[RenderFailure]:
+        failures = self.wait()
+        self._executor.shutdown()
+        return failures
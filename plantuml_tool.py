@@ -5,13 +5,25 @@ from pydantic import BaseModel, Field, PrivateAttr
 from crewai.tools import BaseTool
 
 from plantuml import PlantUML
+from diagram_cache import DiagramCache
+from plantuml_renderer import RENDER_WORKERS, FallbackPlantUML, LocalPlantUML, RenderQueue, render_to_file
+from plantuml_validator import validate_plantuml
+from tracing import traced_tool
 
 logger = logging.getLogger(__name__)
 
 _DEFAULT_PLANTUML_SERVER = "http://www.plantuml.com/plantuml/img/"
 
-def createPlantUMLProcessor(url: Optional[str]):
-    return PlantUML(url=url) if url else PlantUML(url=_DEFAULT_PLANTUML_SERVER)
+def createPlantUMLProcessor(url: Optional[str], jar_path: Optional[str] = None,
+                            workers: int = RENDER_WORKERS):
+    """
+    Returns a PlantUML server client, or a pool of local PlantUML processes when a jar is
+    given, falling back to the server when the local processes cannot render.
+    """
+    server = PlantUML(url=url) if url else PlantUML(url=_DEFAULT_PLANTUML_SERVER)
+    if not jar_path:
+        return server
+    return FallbackPlantUML(LocalPlantUML(jar_path, workers=workers), server)
 
 class PlantUMLExportTool(BaseTool):
     class ToolInputSchema(BaseModel):
@@ -24,17 +36,39 @@ class PlantUMLExportTool(BaseTool):
 
     _plant_uml: PlantUML = PrivateAttr()
     _output_file: str = PrivateAttr()
+    _cache: Optional[DiagramCache] = PrivateAttr()
+    _render_queue: Optional[RenderQueue] = PrivateAttr()
 
-    def __init__(self, plant_uml: PlantUML, output_file: str, **kwargs):
+    def __init__(self, plant_uml: PlantUML, output_file: str, cache: Optional[DiagramCache] = None,
+                 render_queue: Optional[RenderQueue] = None, **kwargs):
+        """
+        With a render queue, valid diagrams are queued and the tool returns without waiting for the image.
+        """
         super().__init__(**kwargs)
         self._plant_uml = plant_uml
         self._output_file = output_file
+        self._cache = cache
+        self._render_queue = render_queue
 
+    @traced_tool
     def _run(self, plantuml_text: str) -> str:
+        # Report syntax errors with their line numbers without a round trip to the renderer
+        errors = validate_plantuml(plantuml_text)
+        if errors:
+            error_message = "PlantUML syntax errors: " + "; ".join(str(error) for error in errors)
+            logging.error(f"Invalid PlantUML diagram: {error_message}")
+            return json.dumps({
+                "success": False,
+                "message": error_message,
+                "errors": [{"line": error.line, "message": error.message} for error in errors],
+            }, indent=None)
+
+        if self._render_queue:
+            self._render_queue.submit(plantuml_text, self._output_file)
+            return json.dumps({"success": True, "output_file": self._output_file}, indent=None)
+
         try:
-            image = self._plant_uml.processes(plantuml_text)
-            with open(self._output_file, "wb") as file:
-                file.write(image)
+            render_to_file(self._plant_uml, plantuml_text, self._output_file, self._cache)
             return json.dumps({"success": True, "output_file": self._output_file}, indent=None)
         except Exception as e:
             error_message = e.message if hasattr(e, 'message') else 'Unknown error (probably a syntax error in the PlantUML text)'
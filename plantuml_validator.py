@@ -0,0 +1,174 @@
+import re
+from dataclasses import dataclass
+from typing import List, Optional
+
+# C4 macros by family, with the minimum number of positional arguments
+C4_ELEMENTS = {
+    "context": ["Person", "Person_Ext", "System", "System_Ext", "SystemDb", "SystemDb_Ext",
+                "SystemQueue", "SystemQueue_Ext", "Enterprise_Boundary", "System_Boundary", "Boundary"],
+    "container": ["Container", "Container_Ext", "ContainerDb", "ContainerDb_Ext", "ContainerQueue",
+                  "ContainerQueue_Ext", "Container_Boundary"],
+    "component": ["Component", "Component_Ext", "ComponentDb", "ComponentDb_Ext", "ComponentQueue",
+                  "ComponentQueue_Ext"],
+}
+C4_RELATIONS = ["Rel", "BiRel", "Rel_Back", "Rel_Neighbor", "Rel_Back_Neighbor",
+                "Rel_U", "Rel_Up", "Rel_D", "Rel_Down", "Rel_L", "Rel_Left", "Rel_R", "Rel_Right",
+                "BiRel_U", "BiRel_Up", "BiRel_D", "BiRel_Down", "BiRel_L", "BiRel_Left",
+                "BiRel_R", "BiRel_Right"]
+C4_LAYOUT = ["Lay_U", "Lay_Up", "Lay_D", "Lay_Down", "Lay_L", "Lay_Left", "Lay_R", "Lay_Right",
+             "Lay_Distance"]
+# Includes that define each family (C4_Component includes C4_Container, which includes C4_Context)
+C4_INCLUDES = {
+    "context": ("C4_Context", "C4_Container", "C4_Component", "C4_Dynamic", "C4_Deployment", "C4_Sequence"),
+    "container": ("C4_Container", "C4_Component", "C4_Dynamic", "C4_Deployment", "C4_Sequence"),
+    "component": ("C4_Component", "C4_Dynamic", "C4_Sequence"),
+}
+
+MACRO_FAMILY = {name: family for family, names in C4_ELEMENTS.items() for name in names}
+MIN_ARGUMENTS = {**{name: 2 for name in MACRO_FAMILY}, **{name: 3 for name in C4_RELATIONS},
+                 **{name: 2 for name in C4_LAYOUT}}
+MACRO_CALL_RE = re.compile(r"^\s*([A-Za-z_][A-Za-z0-9_]*)\s*\(")
+# Blocks of free text, with the line that ends them: multi-line notes (a note with a `:` or a quoted
+# text fits on its line), legends, headers, footers and titles
+NOTE_START_RE = re.compile(r"^[rh]?note\b[^:\"]*$")
+NOTE_END_RE = re.compile(r"^end\s*[rh]?note\b")
+POSITION = r"(?:left|right|center|top|bottom)"
+TEXT_BLOCK_START_RE = re.compile(rf"^(?:{POSITION}\s+)*(legend|header|footer|title)(?:\s+{POSITION})*$")
+# Diagrams whose braces are data, not structure
+DATA_DIAGRAMS = ("@startjson", "@startyaml")
+
+@dataclass
+class PlantUMLSyntaxError:
+    line: int
+    message: str
+
+    def __str__(self):
+        return f"line {self.line}: {self.message}"
+
+def split_arguments(text: str) -> Optional[List[str]]:
+    """
+    Splits the arguments of a macro call, given the text after the opening parenthesis.
+    Returns None when the string or the parentheses are not closed on the line.
+    """
+    arguments, current, depth, quoted = [], [], 0, False
+    for char in text:
+        if char == '"':
+            quoted = not quoted
+        elif not quoted:
+            if char == "(":
+                depth += 1
+            elif char == ")":
+                if depth == 0:
+                    arguments.append("".join(current).strip())
+                    return [argument for argument in arguments if argument]
+                depth -= 1
+            elif char == "," and depth == 0:
+                arguments.append("".join(current).strip())
+                current = []
+                continue
+        current.append(char)
+    return None
+
+def strip_strings(line: str) -> str:
+    return re.sub(r'"[^"]*"', '""', line)
+
+def text_block_end(line: str) -> Optional[re.Pattern]:
+    """
+    Returns the pattern of the line that ends the free-text block this line starts, or None.
+    """
+    if NOTE_START_RE.match(line):
+        return NOTE_END_RE
+    match = TEXT_BLOCK_START_RE.match(line)
+    if match:
+        return re.compile(rf"^end\s*{match.group(1)}\b")
+    return None
+
+def validate_plantuml(plantuml_text: str) -> List[PlantUMLSyntaxError]:
+    """
+    Checks PlantUML text for errors that would make rendering fail: unpaired @startuml/@enduml,
+    unbalanced braces, unterminated C4 macro calls, missing macro arguments and C4 macros
+    used without the include that defines them. Line numbers are 1-based.
+
+    Braces are only balanced on structural lines: free text (notes, legends, titles, and the
+    labels after a `:` such as message texts) may contain any of them.
+    """
+    errors = []
+    includes = []
+    used_families = {}
+    open_braces = []
+    start_line = None
+    in_block_comment = False
+    text_block = None
+    data_diagram = False
+
+    for number, raw_line in enumerate(plantuml_text.splitlines(), start=1):
+        line = raw_line.strip()
+        if in_block_comment:
+            if "'/" in line:
+                in_block_comment = False
+            continue
+        if line.startswith("/'"):
+            in_block_comment = "'/" not in line[2:]
+            continue
+        if not line or line.startswith("'"):
+            continue
+        if text_block:
+            if text_block.match(line):
+                text_block = None
+            continue
+
+        if line.startswith("@start"):
+            if start_line is not None:
+                errors.append(PlantUMLSyntaxError(number, f"{line.split()[0]} before the @end of the diagram started at line {start_line}"))
+            start_line = number
+            data_diagram = line.startswith(DATA_DIAGRAMS)
+            continue
+        if line.startswith("@end"):
+            if start_line is None:
+                errors.append(PlantUMLSyntaxError(number, f"{line.split()[0]} without a matching @start"))
+            start_line = None
+            data_diagram = False
+            continue
+        if line.startswith("!include"):
+            includes.append(line)
+            continue
+
+        match = MACRO_CALL_RE.match(line)
+        if match and match.group(1) in MIN_ARGUMENTS:
+            macro = match.group(1)
+            arguments = split_arguments(line[match.end():])
+            if arguments is None:
+                errors.append(PlantUMLSyntaxError(number, f"Unterminated {macro}(...): missing closing parenthesis or quote"))
+            else:
+                positional = [argument for argument in arguments if not argument.startswith("$")]
+                if len(positional) < MIN_ARGUMENTS[macro]:
+                    errors.append(PlantUMLSyntaxError(
+                        number, f"{macro} expects at least {MIN_ARGUMENTS[macro]} arguments, got {len(positional)}"))
+            if macro in MACRO_FAMILY:
+                used_families.setdefault(MACRO_FAMILY[macro], (number, macro))
+            else:
+                used_families.setdefault("context", (number, macro))
+
+        text_block = text_block_end(line)
+        if text_block or data_diagram:
+            continue
+        for char in strip_strings(line).split(":", 1)[0]:
+            if char == "{":
+                open_braces.append(number)
+            elif char == "}":
+                if open_braces:
+                    open_braces.pop()
+                else:
+                    errors.append(PlantUMLSyntaxError(number, "Closing brace without a matching opening brace"))
+
+    for number in open_braces:
+        errors.append(PlantUMLSyntaxError(number, "Opening brace is never closed"))
+    if start_line is not None:
+        errors.append(PlantUMLSyntaxError(start_line, "Diagram is not closed with @enduml"))
+
+    for family, (number, macro) in used_families.items():
+        if not any(name in include for include in includes for name in C4_INCLUDES[family]):
+            expected = f"!include <C4/{C4_INCLUDES[family][0]}>"
+            errors.append(PlantUMLSyntaxError(number, f"{macro} is used but not defined; add {expected}"))
+
+    return sorted(errors, key=lambda error: error.line)
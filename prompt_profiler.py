@@ -0,0 +1,204 @@
+import json
+import logging
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+
+from utils import estimate_tokens, write_file
+
+logger = logging.getLogger(__name__)
+
+# Output of a task that does not answer with a tool output; there is no LLM in a dry run
+ESTIMATED_OUTPUT_TOKENS = 800
+# Output of tools that are not run in a dry run because of their side effects
+SIMULATED_TOOL_OUTPUT = '{"success": true, "message": "Diagram exported successfully."}'
+# Number of classes or namespaces passed to tools taking names in a dry run
+SAMPLE_SIZE = 5
+
+VARIABLE_RE = re.compile(r"\{(\w+)\}")
+
+def render_template(template: str, inputs: Dict[str, Any]) -> str:
+    """
+    Replaces {name} placeholders with the inputs, as crewai does; unknown placeholders are kept.
+    """
+    return VARIABLE_RE.sub(lambda match: str(inputs[match.group(1)]) if match.group(1) in inputs else match.group(0), template)
+
+def sample_tool_arguments(code_meta) -> Dict[str, Dict[str, Any]]:
+    """
+    Plausible arguments for the tools that take names: the most used classes and namespaces,
+    which agents are most likely to ask about.
+    """
+    classes = [row[0] for row in code_meta.get_code_metrics("classes", order_by="afferent", limit=SAMPLE_SIZE)["rows"]]
+    namespaces = [row[0] for row in code_meta.get_code_metrics("namespaces", order_by="afferent", limit=SAMPLE_SIZE)["rows"]]
+    arguments = {
+        "list_namespaces": {},
+        "detect_modules": {},
+        "find_dependency_cycles": {},
+        "get_code_metrics": {},
+        "get_namespaces": {"namespace_list": namespaces},
+        "get_classes": {"fully_qualified_names": classes},
+        "get_dependencies": {"names": classes},
+        "get_file_sources": {"symbols": classes[:1]},
+    }
+    if classes:
+        arguments["get_transitive_dependencies"] = {"name": classes[0]}
+        arguments["search_symbols"] = {"query": classes[0].rsplit(".", 1)[-1]}
+    if len(classes) > 1:
+        arguments["find_dependency_path"] = {"source": classes[1], "target": classes[0]}
+    return arguments
+
+@dataclass
+class TaskProfile:
+    task: str
+    agent: str
+    agent_tokens: int               # Role, goal and backstory
+    template_tokens: int            # Description and expected output without the inputs
+    variables: Dict[str, int]       # Input variable -> tokens it adds
+    context: Dict[str, int]         # Context task -> tokens of its output
+    tools: Dict[str, int]           # Tool -> tokens of one simulated call
+    output_tokens: int
+
+    @property
+    def input_tokens(self) -> int:
+        return (self.agent_tokens + self.template_tokens + sum(self.variables.values())
+                + sum(self.context.values()) + sum(self.tools.values()))
+
+@dataclass
+class StageProfile:
+    name: str
+    tasks: List[TaskProfile] = field(default_factory=list)
+
+    @property
+    def input_tokens(self) -> int:
+        return sum(task.input_tokens for task in self.tasks)
+
+class PromptProfiler:
+    """
+    Renders the prompts of crews with their real inputs and simulated tool outputs, without
+    calling an LLM, and estimates their tokens by task, input variable, context dependency and tool.
+    """
+    def __init__(self, agents_data: Dict[str, Any], tool_arguments: Optional[Dict[str, Dict[str, Any]]] = None):
+        """
+        :param agents_data: The agent definitions (conf/agents.yaml).
+        :param tool_arguments: Tool name -> arguments to run it with; other tools get SIMULATED_TOOL_OUTPUT.
+        """
+        self.agents = {agent_info.get('role'): agent_info for agent_info in agents_data.values()}
+        self.tool_arguments = tool_arguments or {}
+        self.stages: List[StageProfile] = []
+        self._tool_tokens: Dict[int, int] = {}
+
+    def _run_tool(self, tool_name: str, tool) -> int:
+        # A tool with the same arguments gives the same output: run each tool object once
+        if id(tool) not in self._tool_tokens:
+            arguments = self.tool_arguments.get(tool_name)
+            output = SIMULATED_TOOL_OUTPUT
+            if arguments is not None:
+                try:
+                    output = tool._run(**arguments)
+                except Exception as e:
+                    logger.warning(f"Dry run of tool {tool_name} failed: {e}")
+            self._tool_tokens[id(tool)] = estimate_tokens(output)
+        return self._tool_tokens[id(tool)]
+
+    def profile(self, name: str, tasks_data: Dict[str, Any], inputs: Dict[str, Any],
+                tools: Dict[str, Any] = {}, write_prompts: bool = False) -> StageProfile:
+        """
+        Profiles one crew run, as AgentSystem would build it from tasks_data.
+        With write_prompts, the rendered prompts are written to debug-prompt-<task>.md.
+        """
+        stage = StageProfile(name)
+        outputs: Dict[str, int] = {}
+        previous = None
+        for task_name, task_info in tasks_data.items():
+            agent_role = task_info.get('agent_role')
+            agent_info = self.agents.get(agent_role, {})
+            templates = [task_info.get('description', ''), task_info.get('expected_output', '')]
+
+            variables: Dict[str, int] = {}
+            for template in templates:
+                for variable in VARIABLE_RE.findall(template):
+                    if variable in inputs:
+                        variables[variable] = variables.get(variable, 0) + estimate_tokens(str(inputs[variable]))
+                    else:
+                        logger.warning(f"Task {task_name} uses {{{variable}}}, which is not an input")
+            prompt = "\n\n".join(render_template(template, inputs) for template in templates)
+            template_tokens = max(0, estimate_tokens(prompt) - sum(variables.values()))
+            if write_prompts:
+                write_file(f"debug-prompt-{task_name}.md", prompt)
+
+            # Without an explicit context, crewai passes the output of the previous task
+            context_names = task_info.get('context') or ([previous] if previous else [])
+            if isinstance(context_names, str):
+                context_names = [context_names]
+            context = {context_name: outputs.get(context_name, 0) for context_name in context_names}
+
+            task_tools = {tool_name: tools[tool_name] for tool_name in task_info.get('tools', []) if tool_name in tools}
+            tool_tokens = {tool_name: self._run_tool(tool_name, tool) for tool_name, tool in task_tools.items()}
+
+            # Tools with result_as_answer end the task with their output
+            answers = [tool_tokens[tool_name] for tool_name, tool in task_tools.items() if getattr(tool, "result_as_answer", False)]
+            output_tokens = answers[0] if answers else ESTIMATED_OUTPUT_TOKENS
+
+            stage.tasks.append(TaskProfile(
+                task=task_name,
+                agent=agent_role,
+                agent_tokens=estimate_tokens(" ".join(str(agent_info.get(key, '')) for key in ('role', 'goal', 'backstory'))),
+                template_tokens=template_tokens,
+                variables=variables,
+                context=context,
+                tools=tool_tokens,
+                output_tokens=output_tokens,
+            ))
+            outputs[task_name] = output_tokens
+            previous = task_name
+        self.stages.append(stage)
+        return stage
+
+    def totals(self) -> Dict[str, Dict[str, int]]:
+        """
+        Tokens over all stages by input variable, context dependency (`from -> to`) and tool.
+        """
+        totals = {"variables": {}, "context": {}, "tools": {}}
+        for stage in self.stages:
+            for task in stage.tasks:
+                for variable, tokens in task.variables.items():
+                    totals["variables"][variable] = totals["variables"].get(variable, 0) + tokens
+                for context_name, tokens in task.context.items():
+                    key = f"{context_name} -> {task.task}"
+                    totals["context"][key] = totals["context"].get(key, 0) + tokens
+                for tool_name, tokens in task.tools.items():
+                    totals["tools"][tool_name] = totals["tools"].get(tool_name, 0) + tokens
+        return {group: dict(sorted(values.items(), key=lambda item: -item[1])) for group, values in totals.items()}
+
+    def to_dict(self) -> Dict:
+        return {
+            "estimated_input_tokens": sum(stage.input_tokens for stage in self.stages),
+            "stages": [
+                {
+                    "name": stage.name,
+                    "estimated_input_tokens": stage.input_tokens,
+                    "tasks": [{**asdict(task), "input_tokens": task.input_tokens} for task in stage.tasks],
+                }
+                for stage in self.stages
+            ],
+            "totals": self.totals(),
+        }
+
+    def write(self, file_path: str):
+        with open(file_path, 'w') as file:
+            json.dump(self.to_dict(), file, indent=2)
+
+    def report(self, limit: int = 10) -> str:
+        """
+        A text summary: tokens by stage and task, then the largest contributors.
+        """
+        lines = [f"Estimated input tokens (dry run): {sum(stage.input_tokens for stage in self.stages)}"]
+        for stage in self.stages:
+            lines.append(f"  {stage.name}: {stage.input_tokens}")
+            for task in stage.tasks:
+                lines.append(f"    {task.task}: {task.input_tokens}")
+        for group, values in self.totals().items():
+            if values:
+                lines.append(f"Largest {group}:")
+                lines.extend(f"  {name}: {tokens}" for name, tokens in list(values.items())[:limit])
+        return "\n".join(lines)
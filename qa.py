@@ -7,12 +7,13 @@ import logging
 from typing import Dict, Optional
 from dataclasses import dataclass
 
-from code_analyzer import generate_metadata, resolve_references
+from code_analyzer import load_metadata
 from metadata import Namespace
-from code_meta_tool import CodeMeta, DetectModulesTool, GetClassesMetaTool, GetNamespacesMetaTool, GetFileSourcesTool
-from agents import AgentSystem
-from plantuml_tool import PlantUMLExportTool, createPlantUMLProcessor
-from utils import TokenStats, read_yaml_file, write_file
+from parser_registry import DEFAULT_KOTLIN_PARSER, KOTLIN_PARSERS
+from diagram_cache import DiagramCache
+from rate_limiter import configure_rate_limiter
+from tracing import TRACE_FORMATS, configure_tracer
+from utils import TokenStats, write_file
 
 MAX_RPM = 20
 
@@ -24,27 +25,49 @@ class GenerationOptions:
     root_namespace: str
     output_file: str
     folder_path: str
-    plantuml_server: Optional[str] = None,
-    question: Optional[str] = None,
-    max_rpm: Optional[int] = None,
+    plantuml_server: Optional[str] = None
+    plantuml_jar: Optional[str] = None
+    diagram_cache_dir: Optional[str] = None
+    defer_rendering: bool = False
+    question: Optional[str] = None
+    max_rpm: Optional[int] = None
+    max_tpm: Optional[int] = None
+    kotlin_parser: str = DEFAULT_KOTLIN_PARSER
+    llms_file: Optional[str] = None
+    dry_run: bool = False
     verbose: Optional[bool] = False
 
 def question_answering(metadata: Dict[str, Namespace], options: GenerationOptions):
-    llms_data = read_yaml_file('conf/llms.yaml')
-    agents_data = read_yaml_file('conf/agents.yaml')
-    tasks_data = read_yaml_file('conf/task_question_answering.yaml')
+    # Imported here so that argument parsing and source scanning do not pay for crewai and PlantUML
+    from agents import LLMS_FILE, AgentRuntime, AgentSystem
+    from code_meta_tool import (CodeMeta, DetectModulesTool, FindDependencyCyclesTool, FindDependencyPathTool,
+                                GetClassesMetaTool, GetCodeMetricsTool, GetDependenciesTool, GetFileSourcesTool,
+                                GetNamespacesMetaTool, GetTransitiveDependenciesTool, SearchSymbolsTool)
+    from plantuml_renderer import RenderQueue
+    from plantuml_tool import PlantUMLExportTool, createPlantUMLProcessor
 
-    code_meta = CodeMeta(metadata)
+    code_meta = CodeMeta(metadata, options.language)
+    rate_limiter = configure_rate_limiter(options.max_rpm, options.max_tpm)
+    runtime = AgentRuntime(options.llms_file or LLMS_FILE, rate_limiter=rate_limiter)
+    tasks_data = runtime.tasks_data('conf/task_question_answering.yaml')
     
-    plantuml_processor = createPlantUMLProcessor(options.plantuml_server)
+    plantuml_processor = createPlantUMLProcessor(options.plantuml_server, options.plantuml_jar)
     logger.info(f"PlantUML server: {plantuml_processor.url}")
+    diagram_cache = DiagramCache(options.diagram_cache_dir) if options.diagram_cache_dir else None
+    render_queue = RenderQueue(plantuml_processor, diagram_cache) if options.defer_rendering else None
 
     tools = {
         "get_namespaces": GetNamespacesMetaTool(code_meta),
         "get_classes": GetClassesMetaTool(code_meta),
         "get_file_sources": GetFileSourcesTool(code_meta, options.folder_path),
         "detect_modules": DetectModulesTool(code_meta),
-        "plantuml_export": PlantUMLExportTool(plantuml_processor, f'{options.output_file}.png')
+        "get_dependencies": GetDependenciesTool(code_meta),
+        "find_dependency_path": FindDependencyPathTool(code_meta),
+        "get_transitive_dependencies": GetTransitiveDependenciesTool(code_meta),
+        "find_dependency_cycles": FindDependencyCyclesTool(code_meta),
+        "get_code_metrics": GetCodeMetricsTool(code_meta),
+        "search_symbols": SearchSymbolsTool(code_meta),
+        "plantuml_export": PlantUMLExportTool(plantuml_processor, f'{options.output_file}.png', cache=diagram_cache, render_queue=render_queue)
     }
 
     namespaces_metadata_json = json.dumps(code_meta.list_namespaces(), indent=None)
@@ -57,11 +80,28 @@ def question_answering(metadata: Dict[str, Namespace], options: GenerationOption
         "output_file": options.output_file,
     }    
     
+    if options.dry_run:
+        from prompt_profiler import PromptProfiler, sample_tool_arguments
+        profiler = PromptProfiler(runtime.agents_data, sample_tool_arguments(code_meta))
+        # Diagrams are not exported in a dry run: the plantuml_export tool is simulated
+        profiler.profile("Question Answering", tasks_data, inputs, tools, write_prompts=options.verbose)
+        profiler.write(f'{options.output_file}.prompt_profile.json')
+        print(profiler.report())
+        print(f"Prompt profile written to {options.output_file}.prompt_profile.json")
+        return None
+
     agents = AgentSystem("Question Answering",
-                         llms_data, agents_data, tasks_data, tools=tools,
+                         runtime, tasks_data, tools=tools,
                          verbose=options.verbose)
     result = agents.execute(inputs)
+    if render_queue:
+        for failure in render_queue.close():
+            print(f"Diagram rendering failed for {failure.output_file}: {failure.message}")
     print(TokenStats(data=result.get('usage_metrics')))
+    print(rate_limiter)
+    print(runtime)
+    if diagram_cache:
+        print(diagram_cache)
     return result
 
 def parse_args():
@@ -72,7 +112,7 @@ def parse_args():
         "--language",
         "-l",
         required=True,
-        help="Programming language (e.g., 'java', 'python').",
+        help="Programming language (e.g., 'java', 'python'), a comma separated list, or 'auto' for mixed-language code.",
     )
     parser.add_argument(
         "--folder-path",
@@ -104,11 +144,67 @@ def parse_args():
         required=True,
         help="Question to ask the system.",
     )
+    parser.add_argument(
+        "--plantuml-jar",
+        required=False,
+        help="Path to plantuml.jar to render diagrams locally (falls back to the PlantUML server).",
+    )
+    parser.add_argument(
+        "--diagram-cache",
+        required=False,
+        help="Directory of the rendered diagram cache; unchanged diagrams are not rendered again.",
+    )
+    parser.add_argument(
+        "--defer-rendering",
+        action="store_true",
+        required=False,
+        help="Render diagrams in the background while the agents keep working; failures are reported at the end.",
+    )
     parser.add_argument(
         "--max-rpm",
         "-m",
+        type=int,
+        required=False,
+        help="Maximum requests per minute for the LLM API, shared by all the agents (defaults is 20).",
+    )
+    parser.add_argument(
+        "--max-tpm",
+        type=int,
         required=False,
-        help="Maximum requests per minute for the LLM API (defaults is 20).",
+        help="Maximum tokens per minute for the LLM API, shared by all the agents (unlimited by default).",
+    )
+    parser.add_argument(
+        "--kotlin-parser",
+        required=False,
+        choices=list(KOTLIN_PARSERS),
+        default=DEFAULT_KOTLIN_PARSER,
+        help=f"Parser backend for Kotlin sources (defaults is {DEFAULT_KOTLIN_PARSER}).",
+    )
+    parser.add_argument(
+        "--snapshot",
+        required=False,
+        help="Metadata snapshot file: loaded instead of parsing the folder when it was written for the same folder and options, otherwise written after parsing. A .sqlite file is a SQLite store that several processes can share.",
+    )
+    parser.add_argument(
+        "--trace",
+        required=False,
+        help="Write a trace of the stages, tasks, LLM calls and tool calls to this JSON file.",
+    )
+    parser.add_argument(
+        "--trace-format",
+        choices=list(TRACE_FORMATS),
+        default="chrome",
+        help="Trace format: 'chrome' (chrome://tracing, Perfetto) or 'json' (defaults is chrome).",
+    )
+    parser.add_argument(
+        "--llms",
+        required=False,
+        help="YAML file of the LLM definitions (defaults is conf/llms.yaml); see conf/llms_fake.yaml for an offline stand-in.",
+    )
+    parser.add_argument(
+        "--dry-run",
+        action="store_true",
+        help="Do not call the LLM: render the prompts and report their estimated tokens to <output file>.prompt_profile.json.",
     )
     parser.add_argument(
         "--verbose",
@@ -123,6 +219,7 @@ def main():
     
     max_rpm = args.max_rpm if args.max_rpm else MAX_RPM
     logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    tracer = configure_tracer(enabled=bool(args.trace))
     
     file_path, file_ext = os.path.splitext(args.output_file)
     
@@ -132,8 +229,15 @@ def main():
         output_file=file_path,
         folder_path=args.folder_path,
         plantuml_server=args.plantuml_server,
+        plantuml_jar=args.plantuml_jar,
+        diagram_cache_dir=args.diagram_cache,
+        defer_rendering=args.defer_rendering,
         question=args.question,
         max_rpm=max_rpm,
+        max_tpm=args.max_tpm,
+        kotlin_parser=args.kotlin_parser,
+        llms_file=args.llms,
+        dry_run=args.dry_run,
         verbose=args.verbose if args.verbose else False
     )
 
@@ -143,10 +247,14 @@ def main():
         if not os.path.isdir(options.folder_path):
             raise NotADirectoryError(f"The path {options.folder_path} is not a directory.")
 
-        namespaces = generate_metadata(args.language, args.folder_path)
-        resolve_references(namespaces, args.root_namespace)
+        namespaces = load_metadata(args.language, args.folder_path, args.root_namespace,
+                                   options.kotlin_parser, args.snapshot)
         
+        if options.dry_run:
+            os.makedirs(os.path.dirname(file_path) or '.', exist_ok=True)
         results = question_answering(namespaces, options)
+        if results is None:
+            return
         
         raw_output = f"**Question:** {args.question}\n\n"
         raw_output += results.get('raw_output', '')
@@ -161,6 +269,10 @@ def main():
         traceback.print_exc()
         logger.error(f"An error occurred: {str(e)}")
         sys.exit(1)
+    finally:
+        if args.trace:
+            tracer.write(args.trace, args.trace_format)
+            print(f"Trace written to {args.trace}: {tracer}")
         
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import threading
+import time
+from typing import Optional
+
+# Bursts allowed by the buckets, as seconds of the sustained rate
+BURST_SECONDS = 10
+# Adaptive backoff on rate-limit errors: the rate is halved on each error and recovers
+# additively with successful requests, never going below MIN_RATE_FACTOR of the configured rate
+BACKOFF_FACTOR = 0.5
+RECOVERY_STEP = 0.05
+MIN_RATE_FACTOR = 0.1
+INITIAL_PAUSE = 2.0
+MAX_PAUSE = 60.0
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at a per-minute rate. Acquiring more than is
+    available puts the bucket in debt, which later callers wait out in order.
+    Not thread-safe on its own: RateLimiter serializes access.
+    """
+    def __init__(self, per_minute: float):
+        self.per_minute = float(per_minute)
+        self.capacity = max(1.0, self.per_minute * BURST_SECONDS / 60)
+        self.tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self, now: float, factor: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self._updated) * self.per_minute * factor / 60)
+        self._updated = now
+
+    def take(self, amount: float, now: float, factor: float = 1.0) -> float:
+        """
+        Takes amount tokens and returns how long to wait before using them.
+        """
+        self._refill(now, factor)
+        self.tokens -= amount
+        return max(0.0, -self.tokens * 60 / (self.per_minute * factor))
+
+    def give_back(self, amount: float):
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+class RateLimiter:
+    """
+    Process-wide limit of LLM requests per minute and tokens per minute, shared by all
+    crews and threads, with adaptive backoff when the provider answers with rate-limit errors.
+    """
+    def __init__(self, max_rpm: Optional[int] = None, max_tpm: Optional[int] = None):
+        self.max_rpm = max_rpm
+        self.max_tpm = max_tpm
+        self._requests = TokenBucket(max_rpm) if max_rpm else None
+        self._tokens = TokenBucket(max_tpm) if max_tpm else None
+        self._lock = threading.Lock()
+        self._factor = 1.0
+        self._paused_until = 0.0
+        self._pause = INITIAL_PAUSE
+
+        self.requests = 0
+        self.tokens = 0
+        self.rate_limit_errors = 0
+        self.throttled_seconds = 0.0
+        self.working_seconds = 0.0
+
+    def acquire(self, estimated_tokens: int = 0) -> float:
+        """
+        Blocks until a request of about estimated_tokens may be sent; returns the time waited.
+        """
+        with self._lock:
+            now = time.monotonic()
+            wait = max(0.0, self._paused_until - now)
+            if self._requests:
+                wait = max(wait, self._requests.take(1, now, self._factor))
+            if self._tokens and estimated_tokens:
+                wait = max(wait, self._tokens.take(estimated_tokens, now, self._factor))
+            self.requests += 1
+            self.throttled_seconds += wait
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+    def record(self, estimated_tokens: int, used_tokens: int, seconds: float):
+        """
+        Records a completed request: corrects the token bucket by the actual usage and
+        lets the rate recover after a backoff.
+        """
+        with self._lock:
+            self.tokens += used_tokens
+            self.working_seconds += seconds
+            if self._tokens and used_tokens != estimated_tokens:
+                self._tokens.give_back(estimated_tokens - used_tokens)
+            self._factor = min(1.0, self._factor + RECOVERY_STEP)
+            self._pause = INITIAL_PAUSE
+
+    def rate_limited(self, retry_after: Optional[float] = None) -> float:
+        """
+        Records a rate-limit error: pauses all requests (for retry_after seconds when the provider
+        tells, otherwise with exponential backoff) and lowers the rate. Returns the pause.
+        """
+        with self._lock:
+            self.rate_limit_errors += 1
+            pause = retry_after if retry_after else self._pause
+            self._pause = min(MAX_PAUSE, self._pause * 2)
+            self._factor = max(MIN_RATE_FACTOR, self._factor * BACKOFF_FACTOR)
+            self._paused_until = max(self._paused_until, time.monotonic() + pause)
+            return pause
+
+    def __repr__(self):
+        return (f"RateLimiter(max_rpm={self.max_rpm}, max_tpm={self.max_tpm}, "
+                f"requests={self.requests}, tokens={self.tokens}, "
+                f"rate_limit_errors={self.rate_limit_errors}, "
+                f"throttled_seconds={self.throttled_seconds:.1f}, working_seconds={self.working_seconds:.1f})")
+
+_rate_limiter = RateLimiter()
+_rate_limiter_lock = threading.Lock()
+
+def configure_rate_limiter(max_rpm: Optional[int] = None, max_tpm: Optional[int] = None) -> RateLimiter:
+    """
+    Replaces the process-wide rate limiter; call once at startup, before the crews are created.
+    """
+    global _rate_limiter
+    with _rate_limiter_lock:
+        _rate_limiter = RateLimiter(max_rpm, max_tpm)
+        return _rate_limiter
+
+def get_rate_limiter() -> RateLimiter:
+    return _rate_limiter
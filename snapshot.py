@@ -0,0 +1,134 @@
+import marshal
+import mmap
+import os
+import struct
+import time
+from typing import Any, Dict, Iterator, Optional
+
+from metadata import NAMESPACE_CACHE_SIZE, LazyNamespaces, Namespace, Span
+
+# Layout: header, namespace records, summaries, index.
+#   header:    magic, format version, marshal version, namespace count, index offset, index length
+#   record:    the marshalled to_dict() of a namespace, spans as tuples and imports sorted
+#   summaries: the marshalled {namespace name: Namespace.summary()}
+#   index:     the marshalled (info, [(namespace name, offset, length), ...], summaries offset, summaries length)
+# Records are decoded when their namespace is accessed, summaries when they are first listed.
+SNAPSHOT_EXTENSION = ".snap"
+MAGIC = b"CATLSNAP"
+FORMAT_VERSION = 2
+HEADER = struct.Struct("<8sHHIQQ")
+
+class SnapshotError(Exception):
+    """
+    The file is not a snapshot, or was written by another format or Python version.
+    """
+
+def _plain(value):
+    # marshal only writes built-in types: Span (a NamedTuple) becomes a tuple
+    if isinstance(value, Span):
+        return tuple(value)
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+def encode_namespace(namespace: Namespace) -> bytes:
+    namespace_dict = namespace.to_dict()
+    namespace_dict["imports"] = sorted(namespace.imports)
+    return marshal.dumps(_plain(namespace_dict))
+
+def write_snapshot(file_path: str, namespaces: Dict[str, Namespace], info: Optional[Dict[str, Any]] = None):
+    """
+    Writes resolved metadata to a snapshot file; info is stored as is (built-in types only).
+    The file is replaced atomically.
+    """
+    info = dict(info or {}, created=time.time())
+    temp_path = f"{file_path}.tmp"
+    entries = []
+    summaries = {}
+    with open(temp_path, 'wb') as file:
+        file.write(b"\0" * HEADER.size)
+        for name in sorted(namespaces):
+            namespace = namespaces[name]
+            record = encode_namespace(namespace)
+            entries.append((name, file.tell(), len(record)))
+            file.write(record)
+            summaries[name] = namespace.summary()
+        summaries_record = marshal.dumps(summaries)
+        summaries_offset = file.tell()
+        file.write(summaries_record)
+        index = marshal.dumps((info, entries, summaries_offset, len(summaries_record)))
+        index_offset = file.tell()
+        file.write(index)
+        file.seek(0)
+        file.write(HEADER.pack(MAGIC, FORMAT_VERSION, marshal.version, len(entries), index_offset, len(index)))
+    os.replace(temp_path, file_path)
+
+class Snapshot(LazyNamespaces):
+    """
+    Read-only mapping of namespace names to Namespace objects over a memory-mapped snapshot.
+    Opening it only reads the index; namespaces are decoded on access (see LazyNamespaces).
+    """
+    def __init__(self, file_path: str, cache_size: Optional[int] = NAMESPACE_CACHE_SIZE):
+        """
+        :param cache_size: Number of decoded namespaces to keep; None keeps them all.
+        """
+        super().__init__(cache_size)
+        self.file_path = file_path
+        self._file = open(file_path, 'rb')
+        try:
+            self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._file.close()
+            raise SnapshotError(f"{file_path} is empty")
+        try:
+            magic, format_version, marshal_version, count, index_offset, index_length = HEADER.unpack_from(self._mapped)
+            if magic != MAGIC:
+                raise SnapshotError(f"{file_path} is not a snapshot")
+            if format_version != FORMAT_VERSION or marshal_version != marshal.version:
+                raise SnapshotError(f"{file_path} has format {format_version}/{marshal_version}, "
+                                    f"expected {FORMAT_VERSION}/{marshal.version}")
+            self.info, entries, self._summaries_offset, self._summaries_length = marshal.loads(
+                self._mapped[index_offset:index_offset + index_length])
+            if len(entries) != count:
+                raise SnapshotError(f"{file_path} is corrupt: {len(entries)} namespaces indexed, {count} expected")
+        except (struct.error, EOFError, ValueError, TypeError) as e:
+            self.close()
+            raise SnapshotError(f"{file_path} is corrupt: {e}")
+        except SnapshotError:
+            self.close()
+            raise
+        self._entries = {name: (offset, length) for name, offset, length in entries}
+        self._summaries: Optional[Dict[str, dict]] = None
+
+    def _load(self, name: str) -> Namespace:
+        offset, length = self._entries[name]
+        return Namespace.from_dict(marshal.loads(self._mapped[offset:offset + length]))
+
+    def summaries(self) -> Dict[str, dict]:
+        """
+        Namespace.summary() of every namespace, without decoding them; kept once read.
+        """
+        if self._summaries is None:
+            self._summaries = marshal.loads(
+                self._mapped[self._summaries_offset:self._summaries_offset + self._summaries_length])
+        return self._summaries
+
+    def __contains__(self, name) -> bool:
+        return name in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def close(self):
+        # Decoded namespaces stay usable: they do not reference the mapping
+        self._mapped.close()
+        self._file.close()
+
+    def __repr__(self):
+        return (f"Snapshot({self.file_path}, namespaces={len(self)}, decoded={self.decoded}, "
+                f"cached={len(self._namespaces)})")
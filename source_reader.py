@@ -0,0 +1,154 @@
+import mmap
+import os
+import re
+from array import array
+from collections import OrderedDict
+from typing import List, Optional, Tuple
+
+from code_parser import decode_text, prepare_source
+from metadata import Span
+from utils import CHARS_PER_TOKEN
+
+DEFAULT_MAX_TOKENS = 8000
+FILE_CACHE_SIZE = 32
+# How far back to look for the start of the line of a span
+LINE_LOOKBACK = 4096
+
+class _SourceFile:
+    """
+    A memory-mapped source file, as the UTF-8 buffer the parsers saw, so that spans can be
+    sliced without reading the whole file.
+    """
+    def __init__(self, path: str):
+        self._file = open(path, 'rb')
+        stat = os.fstat(self._file.fileno())
+        self.stamp = (stat.st_mtime_ns, stat.st_size)
+        # Empty files cannot be mapped
+        self._mapped = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if stat.st_size else None
+        self.buffer = prepare_source(self._mapped if self._mapped is not None else b"")
+        self._line_starts: Optional[array] = None
+
+    @property
+    def line_starts(self) -> array:
+        # Built on first use: spans with byte offsets do not need it
+        if self._line_starts is None:
+            self._line_starts = array("q", [0])
+            self._line_starts.extend(match.end() for match in re.finditer(rb"\n", self.buffer))
+        return self._line_starts
+
+    def line_count(self) -> int:
+        return len(self.line_starts) - (1 if self.line_starts[-1] == len(self.buffer) else 0)
+
+    def lines(self, start_line: int, end_line: int) -> Tuple[int, int]:
+        """
+        Returns the byte range of 1-based inclusive lines.
+        """
+        line_starts = self.line_starts
+        start_line = max(1, min(start_line, len(line_starts)))
+        end_line = max(start_line, min(end_line, len(line_starts)))
+        end = line_starts[end_line] if end_line < len(line_starts) else len(self.buffer)
+        return line_starts[start_line - 1], end
+
+    def line_start(self, offset: int) -> int:
+        # Widens a span to the start of its first line, to keep the indentation
+        begin = max(0, offset - LINE_LOOKBACK)
+        newline = bytes(self.buffer[begin:offset]).rfind(b"\n")
+        if newline >= 0:
+            return begin + newline + 1
+        return 0 if begin == 0 else offset
+
+    def text(self, start: int, end: int) -> str:
+        return decode_text(bytes(self.buffer[start:end]))
+
+    def close(self):
+        # Views of the mapping (a BOM-less memoryview) must be released before it is closed
+        if isinstance(self.buffer, memoryview):
+            self.buffer.release()
+        if self._mapped is not None:
+            self._mapped.close()
+        self._file.close()
+
+class SourceReader:
+    """
+    Reads whole files or spans of files under a root folder, keeping the most recently read
+    files mapped, and truncates the output to a token budget.
+    """
+    def __init__(self, root_path: str, cache_size: int = FILE_CACHE_SIZE):
+        self.root_path = root_path
+        self.cache_size = cache_size
+        self._files: "OrderedDict[str, _SourceFile]" = OrderedDict()
+
+    def _open(self, path: str) -> _SourceFile:
+        full_path = os.path.join(self.root_path, path.lstrip("/"))
+        source = self._files.get(full_path)
+        if source is not None:
+            stat = os.stat(full_path)
+            if source.stamp == (stat.st_mtime_ns, stat.st_size):
+                self._files.move_to_end(full_path)
+                return source
+            del self._files[full_path]
+            source.close()
+        source = _SourceFile(full_path)
+        self._files[full_path] = source
+        if len(self._files) > self.cache_size:
+            _, evicted = self._files.popitem(last=False)
+            evicted.close()
+        return source
+
+    def read(self, path: str, span: Optional[Span] = None) -> Tuple[str, int, int]:
+        """
+        Returns the text of a file, or of a span of it widened to whole lines, with its first
+        and last line numbers.
+        """
+        source = self._open(path)
+        if span is None:
+            start, end = 0, len(source.buffer)
+            return source.text(start, end), 1, source.line_count()
+        if span.start_byte is not None and span.end_byte is not None:
+            start, end = source.line_start(span.start_byte), span.end_byte
+        else:
+            start, end = source.lines(span.start_line, span.end_line)
+        return source.text(start, end), span.start_line, span.end_line
+
+    def close(self):
+        while self._files:
+            _, source = self._files.popitem()
+            source.close()
+
+def truncate_lines(text: str, max_chars: int) -> Tuple[str, int]:
+    """
+    Cuts text at the last line break within max_chars; returns the text and the number of lines cut.
+    """
+    if len(text) <= max_chars:
+        return text, 0
+    cut = text.rfind("\n", 0, max_chars)
+    kept = text[:cut + 1] if cut >= 0 else ""
+    return kept, text.count("\n", len(kept)) + (0 if text.endswith("\n") else 1)
+
+def format_sources(reader: SourceReader, requests: List[Tuple[str, Optional[Span], str]],
+                   max_tokens: int = DEFAULT_MAX_TOKENS) -> str:
+    """
+    Formats sources for an agent: one section per (file path, span or None, label) request,
+    until the token budget is spent.
+    """
+    budget = max_tokens * CHARS_PER_TOKEN
+    sections = []
+    omitted = []
+    for path, span, label in requests:
+        if budget <= 0:
+            omitted.append(label)
+            continue
+        try:
+            text, start_line, end_line = reader.read(path, span)
+        except (OSError, ValueError) as e:
+            sections.append(f"// {label}: cannot read {path}: {e}\n")
+            continue
+        header = f"// File: {path}" if span is None else f"// {label} ({path}, lines {start_line}-{end_line})"
+        text, cut_lines = truncate_lines(text, budget - len(header))
+        if cut_lines:
+            text += f"// ... {cut_lines} more lines not shown (token budget); request single classes or methods instead\n"
+        sections.append(f"{header}\n{text}\n")
+        budget -= len(header) + len(text)
+    if omitted:
+        sections.append(f"// Not shown (token budget): {', '.join(omitted)}\n")
+    return "\n".join(sections)
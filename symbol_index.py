@@ -0,0 +1,176 @@
+import bisect
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from metadata import Namespace
+
+SYMBOL_KINDS = ("class", "method", "attribute", "file")
+# Ties are broken by kind: classes first
+KIND_ORDER = {kind: i for i, kind in enumerate(SYMBOL_KINDS)}
+
+# Scores of the match types, best first
+SCORE_EXACT = 1.0
+SCORE_PREFIX = 0.9
+SCORE_CAMEL_CASE = 0.85
+SCORE_SUBSTRING = 0.7
+SCORE_FUZZY = 0.6  # Scaled by the trigram similarity
+MIN_SIMILARITY = 0.3
+
+HUMP_RE = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+
+def split_humps(name: str) -> List[str]:
+    """
+    Splits an identifier into its words: `HTTPOrderService_v2` -> HTTP, Order, Service, v, 2.
+    """
+    return HUMP_RE.findall(name)
+
+def trigrams(text: str) -> set:
+    text = f"  {text.lower()} "
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+def camel_case_match(query: str, humps: List[str]) -> bool:
+    """
+    Returns True when the query is a sequence of prefixes of consecutive words of the name,
+    e.g. `OS`, `OrdServ` or `ordserv` for OrderService.
+    """
+    query = query.lower()
+    humps = [hump.lower() for hump in humps]
+
+    def match(q: int, h: int) -> bool:
+        if q == len(query):
+            return True
+        if h == len(humps):
+            return False
+        hump = humps[h]
+        length = 0
+        while length < len(hump) and q + length < len(query) and query[q + length] == hump[length]:
+            length += 1
+        # Try the longest prefix of this word first, then shorter ones
+        return any(match(q + n, h + 1) for n in range(length, 0, -1))
+
+    return match(0, 0)
+
+@dataclass
+class Symbol:
+    name: str       # Short name, as searched
+    fqn: str        # Fully qualified name
+    kind: str
+    file_path: Optional[str]
+
+class SymbolIndex:
+    """
+    In-memory index of classes, methods, attributes and files for prefix, camelCase and
+    fuzzy (trigram) search on their short names, and substring search on their qualified names.
+    """
+    def __init__(self, metadata: Dict[str, Namespace]):
+        self.symbols: List[Symbol] = []
+        files = set()
+        for namespace_name in sorted(metadata):
+            for class_name, class_metadata in sorted(metadata[namespace_name].classes.items()):
+                class_fqn = f"{namespace_name}.{class_name}"
+                file_path = class_metadata.file_path
+                self.symbols.append(Symbol(class_name, class_fqn, "class", file_path))
+                for method_name in dict.fromkeys(method["name"] for method in class_metadata.methods):
+                    self.symbols.append(Symbol(method_name, f"{class_fqn}.{method_name}", "method", file_path))
+                for attribute_name in dict.fromkeys(attribute["name"] for attribute in class_metadata.attributes):
+                    self.symbols.append(Symbol(attribute_name, f"{class_fqn}.{attribute_name}", "attribute", file_path))
+                if file_path:
+                    files.add(file_path)
+        for file_path in sorted(files):
+            self.symbols.append(Symbol(os.path.basename(file_path), file_path, "file", file_path))
+
+        # Sorted lowercase names for prefix search, and inverted indexes
+        self._names = sorted((symbol.name.lower(), i) for i, symbol in enumerate(self.symbols))
+        self._trigrams: Dict[str, List[int]] = defaultdict(list)
+        self._trigram_counts: List[int] = []
+        self._by_initial: Dict[str, List[int]] = defaultdict(list)
+        self._humps: List[List[str]] = []
+        for i, symbol in enumerate(self.symbols):
+            name_trigrams = trigrams(symbol.name)
+            self._trigram_counts.append(len(name_trigrams))
+            for trigram in name_trigrams:
+                self._trigrams[trigram].append(i)
+            humps = split_humps(symbol.name)
+            self._humps.append(humps)
+            if humps:
+                self._by_initial[humps[0][0].lower()].append(i)
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+    def search(self, query: str, limit: int = 10, kinds: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Returns the best matches as dictionaries with rank, fqn, kind, file_path and score.
+        A dotted query (e.g. `billing.Invoice`) is also matched against qualified names.
+        """
+        query = query.strip()
+        if not query:
+            return []
+        lower = query.lower()
+        scores: Dict[int, float] = {}
+
+        def add(i: int, score: float):
+            if kinds and self.symbols[i].kind not in kinds:
+                return
+            if score > scores.get(i, 0.0):
+                scores[i] = score
+
+        def found(better_than: float) -> bool:
+            # The remaining passes cannot outrank `limit` matches scoring more than they can give
+            return sum(1 for score in scores.values() if score > better_than) >= limit
+
+        # Exact and prefix matches on the short name
+        position = bisect.bisect_left(self._names, (lower, -1))
+        while position < len(self._names) and self._names[position][0].startswith(lower):
+            name, i = self._names[position]
+            add(i, SCORE_EXACT if name == lower else SCORE_PREFIX)
+            position += 1
+
+        # camelCase abbreviations, e.g. OrdServ
+        if not found(SCORE_CAMEL_CASE):
+            for i in self._by_initial.get(lower[0], []):
+                if i not in scores and camel_case_match(query, self._humps[i]):
+                    add(i, SCORE_CAMEL_CASE)
+
+        # Qualified names and paths
+        if ("." in query or "/" in query) and not found(SCORE_SUBSTRING):
+            for i, symbol in enumerate(self.symbols):
+                fqn = symbol.fqn.lower()
+                if fqn == lower or fqn.endswith("." + lower):
+                    add(i, SCORE_EXACT)
+                elif lower in fqn:
+                    add(i, SCORE_SUBSTRING)
+
+        # Typos and partial words, by trigram similarity
+        if found(SCORE_SUBSTRING):
+            return self._ranked(scores, limit)
+        query_trigrams = trigrams(query.rsplit(".", 1)[-1])
+        shared = Counter()
+        for trigram in query_trigrams:
+            shared.update(self._trigrams.get(trigram, ()))
+        for i, count in shared.items():
+            # Names containing the query share its trigrams, however long they are
+            if lower in self.symbols[i].name.lower():
+                add(i, SCORE_SUBSTRING)
+                continue
+            similarity = count / (len(query_trigrams) + self._trigram_counts[i] - count)
+            if similarity >= MIN_SIMILARITY:
+                add(i, SCORE_FUZZY * similarity)
+
+        return self._ranked(scores, limit)
+
+    def _ranked(self, scores: Dict[int, float], limit: int) -> List[Dict]:
+        ranked = sorted(scores, key=lambda i: (-scores[i], KIND_ORDER[self.symbols[i].kind], len(self.symbols[i].fqn), self.symbols[i].fqn))
+        return [
+            {
+                "rank": rank,
+                "fqn": self.symbols[i].fqn,
+                "kind": self.symbols[i].kind,
+                "file_path": self.symbols[i].file_path,
+                "score": round(scores[i], 2),
+            }
+            for rank, i in enumerate(ranked[:limit], start=1)
+        ]
@@ -0,0 +1,25 @@
+<?php
+namespace App\Http;
+
+use App\Models\User;
+use App\Support\{Bar, Baz as Qux};
+
+class HomeController extends Controller
+{
+    private ?User $user;
+
+    public function __construct(private Logger $logger) {}
+
+    public function index(Request $request): array
+    {
+        $this->before();
+        $handler = new class($request) {
+            public function inner() { Foo::helper(); }
+        };
+        $this::after();
+        $users = User::all();
+        $fn = function ($x) use ($request) { return $request->input($x); };
+        $short = fn($y) => $this->logger?->info($y);
+        return [new Bar()];
+    }
+}
@@ -0,0 +1,50 @@
+<?php
+namespace App\Domain;
+
+use App\Contracts\Repository;
+use Illuminate\Support\Facades\Log;
+
+#[Entity, Table('orders')]
+final class Order
+{
+    public const LIMIT = 10;
+    protected string $status;
+    private array $items = [], $notes = [];
+
+    public function __construct(public readonly int $id, protected ?Repository $repository = null) {}
+
+    #[Route('/orders'), Get]
+    public function find(int $id, string ...$fields): ?self
+    {
+        Log::info('find');
+        $order = $this->repository?->find($id);
+        return static::hydrate(parent::load($order));
+    }
+
+    public static function hydrate($row) { return new static(); }
+}
+
+interface Payable
+{
+    public function pay(float $amount): bool;
+}
+
+trait Auditable
+{
+    public function audit(): void { $this->log->write(self::class); }
+}
+
+enum Status: string
+{
+    case Open = 'open';
+    case Closed = 'closed';
+
+    public function label(): string { return ucfirst($this->value); }
+}
+
+abstract class Job implements Payable
+{
+    use Auditable;
+
+    abstract public function handle(): void;
+}
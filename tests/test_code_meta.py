@@ -0,0 +1,37 @@
+from code_meta import CodeMeta
+from metadata import Namespace, Span
+
+def make_code_meta() -> CodeMeta:
+    namespace = Namespace("a", [])
+    namespace.add_class("Foo", "a/Foo.java", Span(1, 20))
+    namespace.add_class_method("Foo", "bar", [], [], span=Span(3, 5))
+    namespace.add_class_method("Foo", "bar", [{"name": "x", "type": "int"}], [], span=Span(7, 9))
+    namespace.add_class_method("Foo", "baz", [], [], span=Span(11, 12))
+    return CodeMeta({"a": namespace})
+
+def test_find_source_spans_class():
+    found, unknown = make_code_meta().find_source_spans(["a.Foo"])
+    assert found == [("a/Foo.java", Span(1, 20), "a.Foo")]
+    assert unknown == []
+
+def test_find_source_spans_method_overloads():
+    found, unknown = make_code_meta().find_source_spans(["a.Foo.bar"])
+    assert found == [("a/Foo.java", Span(3, 5), "a.Foo.bar"), ("a/Foo.java", Span(7, 9), "a.Foo.bar")]
+    assert unknown == []
+
+def test_find_source_spans_unknown():
+    found, unknown = make_code_meta().find_source_spans(["a.Foo.missing", "a.Bar", "b.Foo.bar"])
+    assert found == []
+    assert unknown == ["a.Foo.missing", "a.Bar", "b.Foo.bar"]
+
+def test_code_metrics_entry_points_use_the_language_rules():
+    namespace = Namespace("a", [])
+    namespace.add_class("ReportJob", "a/ReportJob.java")
+    namespace.add_class("Cli", "a/Cli.java")
+    namespace.add_class_method("Cli", "main", [{"name": "args", "type": "String[]"}], [])
+    metadata = {"a": namespace}
+    # `.*Job` is a PHP rule: it does not apply to Java code
+    java_rows = CodeMeta(metadata, "java").get_code_metrics("entry_points")
+    assert [row[0] for row in java_rows["rows"]] == ["a.Cli"]
+    php_rows = CodeMeta(metadata, "php").get_code_metrics("entry_points")
+    assert [row[0] for row in php_rows["rows"]] == ["a.ReportJob"]
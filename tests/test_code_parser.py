@@ -0,0 +1,74 @@
+import codecs
+
+import pytest
+
+from code_parser import FALLBACK_ENCODING, decode_source, detect_encoding, prepare_source
+from parsers.java_parser import JavaCodeParser
+from parsers.python_parser import PythonCodeParser
+
+JAVA_SOURCE = "package shop;\n\npublic class Café {\n    void payer() {}\n}\n"
+PYTHON_SOURCE = "# -*- coding: latin-1 -*-\nclass Façade:\n    def créer(self):\n        pass\n"
+CP1252_SOURCE = "package shop;\n// Prix: 5 €\npublic class Prix {\n    void calculé() {}\n}\n"
+
+@pytest.mark.parametrize("data, expected", [
+    (codecs.BOM_UTF16_LE + "class A {}".encode("utf-16-le"), ("utf-16-le", 2)),
+    (codecs.BOM_UTF16_BE + "class A {}".encode("utf-16-be"), ("utf-16-be", 2)),
+    (codecs.BOM_UTF32_LE + "class A {}".encode("utf-32-le"), ("utf-32-le", 4)),
+    (codecs.BOM_UTF8 + "class Café {}".encode("utf-8"), ("utf-8", 3)),
+    (PYTHON_SOURCE.encode("latin-1"), ("iso8859-1", 0)),
+    ("// -*- coding: unknown-codec -*-\nclass Café {}".encode("utf-8"), ("utf-8", 0)),
+    ("class Café {}".encode("utf-8"), ("utf-8", 0)),
+    (CP1252_SOURCE.encode("cp1252"), (FALLBACK_ENCODING, 0)),
+])
+def test_detect_encoding(data, expected):
+    assert detect_encoding(data) == expected
+
+def test_prepare_source_strips_the_utf8_bom_without_copying():
+    data = codecs.BOM_UTF8 + JAVA_SOURCE.encode("utf-8")
+    prepared = prepare_source(data)
+    assert isinstance(prepared, memoryview)
+    assert bytes(prepared) == JAVA_SOURCE.encode("utf-8")
+
+def test_prepare_source_hands_utf8_over_as_is():
+    data = JAVA_SOURCE.encode("utf-8")
+    assert prepare_source(data) is data
+
+@pytest.mark.parametrize("data, text", [
+    (codecs.BOM_UTF16_LE + JAVA_SOURCE.encode("utf-16-le"), JAVA_SOURCE),
+    (PYTHON_SOURCE.encode("latin-1"), PYTHON_SOURCE),
+    (CP1252_SOURCE.encode("cp1252"), CP1252_SOURCE),
+])
+def test_sources_are_transcoded_to_utf8(data, text):
+    assert bytes(prepare_source(data)) == text.encode("utf-8")
+    assert decode_source(data) == text
+
+def assert_span_starts_with(span, text, prefix):
+    utf8 = text.encode("utf-8")
+    assert span.start_byte == utf8.index(prefix.encode("utf-8"))
+    assert utf8[span.start_byte:span.end_byte].decode("utf-8").startswith(prefix)
+
+def test_utf16_source_with_bom():
+    namespace = JavaCodeParser().parse_source(codecs.BOM_UTF16_LE + JAVA_SOURCE.encode("utf-16-le"),
+                                              "shop/Café.java")
+    assert list(namespace.classes) == ["Café"]
+    cafe = namespace.classes["Café"]
+    assert (cafe.span.start_line, cafe.span.end_line) == (3, 5)
+    assert_span_starts_with(cafe.span, JAVA_SOURCE, "public class Café")
+    assert [method["name"] for method in cafe.methods] == ["payer"]
+    assert_span_starts_with(cafe.methods[0]["span"], JAVA_SOURCE, "void payer()")
+
+def test_latin1_source_with_coding_declaration():
+    namespace = PythonCodeParser().parse_source(PYTHON_SOURCE.encode("latin-1"), "shop/facade.py")
+    assert list(namespace.classes) == ["Façade"]
+    facade = namespace.classes["Façade"]
+    assert_span_starts_with(facade.span, PYTHON_SOURCE, "class Façade")
+    assert [method["name"] for method in facade.methods] == ["créer"]
+    assert_span_starts_with(facade.methods[0]["span"], PYTHON_SOURCE, "def créer")
+
+def test_invalid_utf8_source_falls_back_to_cp1252():
+    namespace = JavaCodeParser().parse_source(CP1252_SOURCE.encode("cp1252"), "shop/Prix.java")
+    assert list(namespace.classes) == ["Prix"]
+    prix = namespace.classes["Prix"]
+    assert_span_starts_with(prix.span, CP1252_SOURCE, "public class Prix")
+    assert [method["name"] for method in prix.methods] == ["calculé"]
+    assert_span_starts_with(prix.methods[0]["span"], CP1252_SOURCE, "void calculé()")
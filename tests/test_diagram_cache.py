@@ -0,0 +1,9 @@
+from diagram_cache import normalize_plantuml
+
+def test_line_endings_and_trailing_whitespace_are_normalized():
+    assert normalize_plantuml("@startuml\r\nA -> B  \r\n@enduml\r\n") == normalize_plantuml("@startuml\nA -> B\n@enduml")
+
+def test_blank_lines_in_notes_are_kept():
+    with_blank_line = "@startuml\nnote left\nfirst\n\nsecond\nend note\n@enduml\n"
+    without_blank_line = "@startuml\nnote left\nfirst\nsecond\nend note\n@enduml\n"
+    assert normalize_plantuml(with_blank_line) != normalize_plantuml(without_blank_line)
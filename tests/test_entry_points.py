@@ -0,0 +1,167 @@
+import os
+
+import pytest
+
+from entry_points import ENTRY_POINT_RULES_FILE, WEB_API_ENDPOINT, EntryPointDetector, EntryPointRule
+from metadata import ClassMetadata, Namespace
+from parsers.java_parser import JavaCodeParser
+from parsers.kotlin_parser import KotlinCodeParser
+from parsers.php_parser import PhpCodeParser
+from parsers.python_parser import PythonCodeParser
+
+RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), ENTRY_POINT_RULES_FILE)
+
+JAVA_SOURCE = b"""package shop.web;
+
+@RestController
+public class OrderController {
+    @GetMapping("/orders")
+    public List<Order> list() { return null; }
+}
+
+public class Reports {
+    @Scheduled(cron = "0 0 * * *")
+    public void nightly() {}
+}
+
+public class Cli {
+    public static void main(String[] args) {}
+}
+
+public class OrderMapper {
+    public Order map(OrderDto dto) { return null; }
+}
+"""
+
+KOTLIN_SOURCE = b"""package shop.events
+
+class OrderEvents {
+    @KafkaListener(topics = ["orders"])
+    fun onOrder(message: String) {}
+}
+
+@SpringBootApplication
+class ShopApplication
+
+class ShopController {
+    fun list() {}
+}
+"""
+
+PYTHON_SOURCE = b"""class OrderApi:
+    @app.get("/orders")
+    def list(self):
+        pass
+
+class OrderView:
+    def get(self, request):
+        pass
+
+class ImportCommand:
+    def handle(self):
+        pass
+
+class PaymentListener:
+    def on_payment(self, event):
+        pass
+
+class Money:
+    def add(self, other):
+        pass
+"""
+
+PHP_SOURCE = b"""<?php
+
+namespace Shop\\Controller;
+
+class Orders
+{
+    #[Route('/orders')]
+    public function list() {}
+}
+
+#[AsMessageHandler]
+class OrderHandler
+{
+    public function __invoke($message) {}
+}
+
+class ReportJob
+{
+    public function handle() {}
+}
+
+class OrderRepository
+{
+    public function find($id) {}
+}
+"""
+
+@pytest.fixture(scope="module")
+def detector():
+    return EntryPointDetector.from_yaml(RULES_FILE)
+
+def detect(detector, code_parser, source, file_path, language):
+    namespace = code_parser.parse_source(source, file_path)
+    return [(entry_point.class_name, entry_point.type, entry_point.indicators)
+            for entry_point in detector.detect({namespace.name: namespace}, language)]
+
+def test_java_rules(detector):
+    assert detect(detector, JavaCodeParser(), JAVA_SOURCE, "shop/web/OrderController.java", "java") == [
+        ("Cli", "CLI/Standalone App", ["main() method"]),
+        ("OrderController", WEB_API_ENDPOINT, ["@RestController", "@GetMapping on list()"]),
+        ("Reports", "Scheduled Job", ["@Scheduled on nightly()"]),
+    ]
+
+def test_kotlin_uses_the_jvm_rules(detector):
+    # Class names are not a JVM rule: ShopController has no annotations
+    assert detect(detector, KotlinCodeParser(), KOTLIN_SOURCE, "shop/events/OrderEvents.kt", "kotlin") == [
+        ("OrderEvents", "Message/Data Stream Consumer", ["@KafkaListener on onOrder()"]),
+        ("ShopApplication", "CLI/Standalone App", ["@SpringBootApplication"]),
+    ]
+
+def test_python_rules(detector):
+    assert detect(detector, PythonCodeParser(), PYTHON_SOURCE, "shop/api.py", "python") == [
+        ("ImportCommand", "CLI/Standalone App", ["class name"]),
+        ("OrderApi", WEB_API_ENDPOINT, ["@app.get on list()"]),
+        ("OrderView", WEB_API_ENDPOINT, ["class name"]),
+        ("PaymentListener", "Message/Data Stream Consumer", ["class name"]),
+    ]
+
+def test_php_rules(detector):
+    assert detect(detector, PhpCodeParser(), PHP_SOURCE, "src/Controller/Orders.php", "php") == [
+        ("OrderHandler", "Message/Data Stream Consumer", ["@AsMessageHandler"]),
+        ("Orders", WEB_API_ENDPOINT, ["@Route on list()"]),
+        ("ReportJob", "Message/Data Stream Consumer", ["class name"]),
+    ]
+
+def test_rules_of_other_languages_do_not_apply(detector):
+    # `.*Job` and `.*Controller` are PHP class name rules
+    namespace = Namespace("shop", [])
+    namespace.add_class("ReportJob", "shop/ReportJob.java")
+    namespace.add_class("OrderController", "shop/OrderController.java")
+    assert detector.detect({"shop": namespace}, "java") == []
+    assert [entry_point.class_name for entry_point in detector.detect({"shop": namespace}, "java,php")] == [
+        "OrderController", "ReportJob"]
+
+def test_auto_reports_each_type_once(detector):
+    # java and kotlin share the same rules
+    namespace = Namespace("shop", [])
+    namespace.add_class("Cli", "shop/Cli.kt")
+    namespace.add_class_method("Cli", "main", [], [])
+    entry_points = detector.detect({"shop": namespace}, "auto")
+    assert [(entry_point.type, entry_point.indicators) for entry_point in entry_points] == [
+        ("CLI/Standalone App", ["main() method"])]
+
+@pytest.mark.parametrize("stereotype, matches", [
+    ("GetMapping", True),
+    ("org.springframework.web.bind.annotation.GetMapping", True),
+    ("GetMappings", False),
+    ("MyGetMapping", False),
+])
+def test_patterns_match_whole_names(stereotype, matches):
+    rule = EntryPointRule(WEB_API_ENDPOINT, method_stereotypes=["GetMapping"])
+    class_metadata = ClassMetadata("OrderController", "OrderController.java")
+    class_metadata.methods.append({"name": "list", "parameters": [], "invoked_methods": [],
+                                   "stereotypes": [stereotype]})
+    assert rule.match("OrderController", class_metadata) == ([f"@{stereotype} on list()"] if matches else [])
@@ -0,0 +1,108 @@
+import pytest
+
+from parsers.kotlin_parser import KotlinCodeParser
+from parsers.kotlin_ts_parser import KotlinTreeSitterCodeParser, parser
+
+ORDERS_SOURCE = b"""package com.example.orders
+
+import com.example.billing.Invoice
+import com.example.billing.InvoiceService
+
+@Service
+class OrderService(private val repository: OrderRepository, val invoices: InvoiceService) {
+    fun place(order: Order): Invoice {
+        repository.save(order)
+        val invoice = Invoice(order.id)
+        return invoices.issue(invoice)
+    }
+
+    @Transactional
+    fun cancel(id: Long, reason: String) {
+        val order = repository.find(id)
+        repository.delete(order)
+    }
+}
+
+interface OrderRepository {
+    fun save(order: Order)
+    fun find(id: Long): Order
+    fun delete(order: Order)
+}
+
+data class Order(val id: Long, val total: Double)
+"""
+
+# The tree-sitter grammar rejects a named companion object declared on one line
+REGISTRY_SOURCE = b"""package com.example.orders
+
+class Registry {
+    companion object Factory { fun create() = Registry() }
+
+    fun register(name: String) {
+        names.add(name)
+    }
+}
+"""
+
+def without_invocations_and_bytes(namespace):
+    """
+    Namespace as a dict, without the invocations and the span byte offsets kopyt does not provide.
+    """
+    def strip(member):
+        member = {key: value for key, value in member.items() if key != "invoked_methods"}
+        if member.get("span"):
+            member["span"] = member["span"][:2]
+        return member
+
+    namespace_dict = namespace.to_dict()
+    for class_dict in namespace_dict["classes"].values():
+        class_dict["span"] = class_dict["span"][:2]
+        class_dict["attributes"] = [strip(attribute) for attribute in class_dict["attributes"]]
+        class_dict["methods"] = [strip(method) for method in class_dict["methods"]]
+    return namespace_dict
+
+def invocations(namespace):
+    return {(class_name, method["name"]): method["invoked_methods"]
+            for class_name, class_metadata in namespace.classes.items()
+            for method in class_metadata.methods}
+
+@pytest.fixture
+def parsed_orders():
+    file_path = "com/example/orders/Orders.kt"
+    return (KotlinCodeParser().parse_source(ORDERS_SOURCE, file_path),
+            KotlinTreeSitterCodeParser(fallback=False).parse_source(ORDERS_SOURCE, file_path))
+
+def test_backends_agree_on_classes_and_methods(parsed_orders):
+    kopyt, tree_sitter = parsed_orders
+    assert not parser.parse(ORDERS_SOURCE).root_node.has_error
+    assert list(tree_sitter.classes) == ["OrderService", "OrderRepository", "Order"]
+    assert without_invocations_and_bytes(tree_sitter) == without_invocations_and_bytes(kopyt)
+
+def test_tree_sitter_invocations_are_a_superset(parsed_orders):
+    kopyt, tree_sitter = parsed_orders
+    kopyt_invocations, tree_sitter_invocations = invocations(kopyt), invocations(tree_sitter)
+    assert kopyt_invocations.keys() == tree_sitter_invocations.keys()
+    for method, invoked in kopyt_invocations.items():
+        assert set(invoked) <= set(tree_sitter_invocations[method]), method
+    # Property reads are reported as navigations too
+    assert tree_sitter_invocations[("OrderService", "place")] == [
+        "repository.save", "Invoice.constructor", "order.id", "invoices.issue"]
+
+def test_tree_sitter_spans_have_byte_offsets(parsed_orders):
+    _, tree_sitter = parsed_orders
+    span = tree_sitter.classes["Order"].span
+    assert ORDERS_SOURCE[span.start_byte:span.end_byte] == b"data class Order(val id: Long, val total: Double)"
+
+def test_files_with_syntax_errors_fall_back_to_kopyt():
+    assert parser.parse(REGISTRY_SOURCE).root_node.has_error
+    file_path = "com/example/orders/Registry.kt"
+    kopyt = KotlinCodeParser().parse_source(REGISTRY_SOURCE, file_path)
+
+    namespace = KotlinTreeSitterCodeParser().parse_source(REGISTRY_SOURCE, file_path)
+
+    assert namespace.to_dict() == kopyt.to_dict()
+    assert [method["name"] for method in namespace.classes["Registry"].methods] == ["register"]
+    # kopyt provides no byte offsets: the file was not parsed from the erroneous tree
+    assert namespace.classes["Registry"].span.start_byte is None
+    without_fallback = KotlinTreeSitterCodeParser(fallback=False).parse_source(REGISTRY_SOURCE, file_path)
+    assert without_fallback.classes["Registry"].span.start_byte is not None
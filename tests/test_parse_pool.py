@@ -0,0 +1,78 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+from code_analyzer import parse_folder
+from parser_registry import PARSER_REGISTRY, ParserSpec
+from parsers.kotlin_parser import KotlinCodeParser
+
+# The workers build their parsers after the fork, which is what makes the test backend visible to them
+pytestmark = pytest.mark.skipif(multiprocessing.get_start_method() != "fork",
+                                reason="the test parser is only registered in the parent process")
+
+class MisbehavingParser(KotlinCodeParser):
+    """
+    Kotlin parser that hangs, raises or kills its process depending on the file name.
+    """
+    def parse_source(self, source_code, relative_file_path):
+        name = os.path.basename(relative_file_path)
+        if name == "Hang.kt":
+            time.sleep(60)
+        elif name == "Raise.kt":
+            raise ValueError("cannot parse this file")
+        elif name == "Crash.kt":
+            os._exit(3)
+        return super().parse_source(source_code, relative_file_path)
+
+@pytest.fixture
+def misbehaving_parser(monkeypatch):
+    spec = ParserSpec("kotlin", "misbehaving", (".kt",), f"{__name__}:MisbehavingParser")
+    monkeypatch.setitem(PARSER_REGISTRY["kotlin"], "misbehaving", spec)
+    return "misbehaving"
+
+def write_sources(folder, names):
+    for name in names:
+        class_name = name[:-len(".kt")]
+        (folder / name).write_text(f"package app\n\nclass {class_name} {{\n    fun run(): Int = 1\n}}\n")
+
+def test_failing_files_are_reported_and_the_others_parsed(tmp_path, misbehaving_parser):
+    write_sources(tmp_path, ["Good.kt", "Hang.kt", "Raise.kt", "Other.kt"])
+
+    started = time.monotonic()
+    namespaces, report = parse_folder("kotlin", str(tmp_path), workers=2, timeout=2,
+                                      kotlin_parser=misbehaving_parser)
+
+    assert time.monotonic() - started < 30
+    assert report.total_files == 4
+    assert report.parsed_files == 2
+    errors = {os.path.basename(error.file_path): error for error in report.errors}
+    assert sorted(errors) == ["Hang.kt", "Raise.kt"]
+    assert errors["Hang.kt"].reason == "timeout"
+    assert "2s timeout" in errors["Hang.kt"].message
+    assert errors["Raise.kt"].reason == "error"
+    assert errors["Raise.kt"].message == "ValueError: cannot parse this file"
+    assert "ValueError" in errors["Raise.kt"].traceback
+    assert [error.file_path for error in report.errors] == sorted(error.file_path for error in report.errors)
+    assert sorted(namespaces["app"].classes) == ["Good", "Other"]
+
+def test_a_crashing_worker_is_replaced(tmp_path, misbehaving_parser):
+    write_sources(tmp_path, ["Crash.kt"] + [f"Good{i}.kt" for i in range(4)])
+
+    namespaces, report = parse_folder("kotlin", str(tmp_path), workers=1, timeout=10,
+                                      kotlin_parser=misbehaving_parser)
+
+    assert report.parsed_files == 4
+    assert [(os.path.basename(error.file_path), error.reason) for error in report.errors] == [("Crash.kt", "crash")]
+    assert "exited with code 3" in report.errors[0].message
+    assert len(namespaces["app"].classes) == 4
+
+def test_errors_are_reported_when_parsing_in_process(tmp_path, misbehaving_parser):
+    write_sources(tmp_path, ["Good.kt", "Raise.kt"])
+
+    namespaces, report = parse_folder("kotlin", str(tmp_path), workers=0, kotlin_parser=misbehaving_parser)
+
+    assert report.parsed_files == 1
+    assert [(os.path.basename(error.file_path), error.reason) for error in report.errors] == [("Raise.kt", "error")]
+    assert list(namespaces["app"].classes) == ["Good"]
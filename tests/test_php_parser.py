@@ -0,0 +1,33 @@
+"""
+Golden-output tests of the PHP parser: each tests/golden/php/<name>.php is parsed and compared
+with <name>.json. Run with UPDATE_GOLDEN=1 to rewrite the expected files after a reviewed change.
+"""
+import glob
+import json
+import os
+
+import pytest
+
+from parsers.php_parser import PhpCodeParser
+
+GOLDEN_DIR = os.path.join(os.path.dirname(__file__), "golden", "php")
+SOURCES = sorted(glob.glob(os.path.join(GOLDEN_DIR, "*.php")))
+
+def parse(source_path: str) -> dict:
+    with open(source_path, 'r', encoding='utf8') as file:
+        namespace = PhpCodeParser().parse_source(file.read(), os.path.basename(source_path))
+    namespace_dict = namespace.to_dict()
+    namespace_dict["imports"] = sorted(namespace_dict["imports"])
+    # Spans become lists, as in the saved metadata
+    return json.loads(json.dumps(namespace_dict))
+
+@pytest.mark.parametrize("source_path", SOURCES, ids=os.path.basename)
+def test_php_golden_output(source_path):
+    expected_path = source_path[:-len(".php")] + ".json"
+    actual = parse(source_path)
+    if os.environ.get("UPDATE_GOLDEN"):
+        with open(expected_path, 'w', encoding='utf8') as file:
+            json.dump(actual, file, indent=2)
+            file.write("\n")
+    with open(expected_path, 'r', encoding='utf8') as file:
+        assert actual == json.load(file)
@@ -0,0 +1,34 @@
+import pytest
+
+from plantuml_validator import validate_plantuml
+
+C4_HEADER = "@startuml\n!include <C4/C4_Container>\n"
+
+VALID_DIAGRAMS = {
+    "message label": "@startuml\nA -> B : returns {id}\nB --> A : }\n@enduml\n",
+    "single-line note": "@startuml\nnote right of A : {json}\n@enduml\n",
+    "multi-line note": "@startuml\nclass A {\n}\nnote left of A\n  payload: { \"id\": 1\nend note\n@enduml\n",
+    "rnote": "@startuml\nA -> B\nrnote over B\n  }\nendrnote\n@enduml\n",
+    "legend": "@startuml\nlegend right\n  {a} and } alone\nendlegend\n@enduml\n",
+    "multi-line title": "@startuml\ntitle\n  Orders {v2\nend title\nA -> B\n@enduml\n",
+    "activity label": "@startuml\nstart\n:parse {body;\nstop\n@enduml\n",
+    "json": "@startjson\n{\n  \"a\": {\"b\": 1}\n}\n@endjson\n",
+    "c4 boundary": C4_HEADER + "System_Boundary(s, \"Shop {eu}\") {\n  Container(api, \"API\", \"Java\")\n}\n@enduml\n",
+}
+
+INVALID_DIAGRAMS = {
+    "unclosed package": ("@startuml\npackage p {\nclass A\n@enduml\n", 2),
+    "extra brace": ("@startuml\nclass A {\n}\n}\n@enduml\n", 4),
+    "unclosed boundary": (C4_HEADER + "System_Boundary(s, \"Shop\") {\nnote left of s : {x}\n@enduml\n", 3),
+}
+
+@pytest.mark.parametrize("name", VALID_DIAGRAMS)
+def test_valid_diagrams_are_accepted(name):
+    assert validate_plantuml(VALID_DIAGRAMS[name]) == []
+
+@pytest.mark.parametrize("name", INVALID_DIAGRAMS)
+def test_unbalanced_braces_are_reported(name):
+    diagram, line = INVALID_DIAGRAMS[name]
+    errors = validate_plantuml(diagram)
+    assert [error.line for error in errors] == [line]
+    assert "brace" in errors[0].message
@@ -0,0 +1,115 @@
+import pytest
+
+import rate_limiter
+from rate_limiter import INITIAL_PAUSE, MAX_PAUSE, MIN_RATE_FACTOR, RateLimiter, TokenBucket
+
+class FakeClock:
+    """
+    Stands in for the time module: sleeping advances the clock instead of waiting.
+    """
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake_clock = FakeClock()
+    monkeypatch.setattr(rate_limiter, "time", fake_clock)
+    return fake_clock
+
+def test_bucket_starts_full_and_refills_at_its_rate(clock):
+    # 10 seconds of burst at 60 per minute
+    bucket = TokenBucket(60)
+    assert bucket.capacity == 10
+    assert bucket.take(10, clock.now) == 0
+    assert bucket.take(1, clock.now) == pytest.approx(1.0)
+    assert bucket.take(1, clock.now + 0.5) == pytest.approx(1.5)
+    # Two tokens of debt are repaid after 2s, then the bucket fills up to its capacity
+    assert bucket.take(0, clock.now + 2.5) == 0
+    bucket.take(0, clock.now + 1000)
+    assert bucket.tokens == 10
+
+def test_bucket_refills_slower_with_a_lower_factor(clock):
+    bucket = TokenBucket(60)
+    bucket.take(10, clock.now)
+    assert bucket.take(1, clock.now, factor=0.5) == pytest.approx(2.0)
+    assert bucket.take(0, clock.now + 1, factor=0.5) == pytest.approx(1.0)
+
+def test_bucket_give_back_is_capped(clock):
+    bucket = TokenBucket(60)
+    bucket.take(4, clock.now)
+    bucket.give_back(100)
+    assert bucket.tokens == bucket.capacity
+
+def test_no_limits_never_wait(clock):
+    limiter = RateLimiter()
+    for _ in range(1000):
+        assert limiter.acquire(100_000) == 0
+    assert clock.sleeps == []
+    assert limiter.requests == 1000
+
+def test_requests_per_minute(clock):
+    limiter = RateLimiter(max_rpm=60)
+    waits = [limiter.acquire() for _ in range(13)]
+    # A burst of 10, then one request per second
+    assert waits[:10] == [0] * 10
+    assert waits[10:] == [pytest.approx(1.0)] * 3
+    assert clock.now == pytest.approx(1003.0)
+    assert limiter.throttled_seconds == pytest.approx(3.0)
+
+def test_tokens_per_minute_block_large_requests(clock):
+    # 100 tokens per second, bursts of 1000
+    limiter = RateLimiter(max_tpm=6000)
+    assert limiter.acquire(800) == 0
+    assert limiter.acquire(800) == pytest.approx(6.0)
+    assert clock.sleeps == [pytest.approx(6.0)]
+    # Requests without an estimate are not limited by tokens
+    assert limiter.acquire(0) == 0
+
+def test_both_limits_wait_for_the_slowest(clock):
+    limiter = RateLimiter(max_rpm=600, max_tpm=6000)
+    limiter.acquire(1000)
+    assert limiter.acquire(300) == pytest.approx(3.0)
+
+def test_actual_usage_corrects_the_token_bucket(clock):
+    limiter = RateLimiter(max_tpm=6000)
+    limiter.acquire(1000)
+    # The request used 500 tokens less than estimated
+    limiter.record(1000, 500, 2.0)
+    assert limiter.acquire(500) == 0
+    assert limiter.tokens == 500
+    assert limiter.working_seconds == 2.0
+    # And one that used more puts the bucket in debt
+    limiter.record(500, 1500, 1.0)
+    assert limiter.acquire(100) == pytest.approx(11.0)
+
+def test_rate_limit_errors_pause_and_slow_down(clock):
+    limiter = RateLimiter(max_rpm=60)
+    for _ in range(10):
+        limiter.acquire()
+
+    assert limiter.rate_limited() == INITIAL_PAUSE
+    # Every request waits for the pause, then at half the rate
+    assert limiter.acquire() == pytest.approx(INITIAL_PAUSE)
+    assert limiter.acquire() == pytest.approx(2.0)
+    assert limiter.rate_limited(retry_after=30) == 30
+    assert limiter.acquire() == pytest.approx(30)
+    assert limiter.rate_limit_errors == 2
+
+def test_backoff_doubles_up_to_a_maximum_and_recovers(clock):
+    limiter = RateLimiter(max_rpm=60)
+    pauses = [limiter.rate_limited() for _ in range(8)]
+    assert pauses == [2.0, 4.0, 8.0, 16.0, 32.0, MAX_PAUSE, MAX_PAUSE, MAX_PAUSE]
+    assert limiter._factor == MIN_RATE_FACTOR
+    limiter.record(0, 0, 1.0)
+    assert limiter.rate_limited() == INITIAL_PAUSE
+    for _ in range(100):
+        limiter.record(0, 0, 1.0)
+    assert limiter._factor == 1.0
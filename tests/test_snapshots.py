@@ -0,0 +1,121 @@
+import sqlite3
+
+import pytest
+
+from benchmarks.synthetic_repo import ROOT_NAMESPACES, RepoShape, write_repo
+from code_analyzer import load_metadata, parse_folder, resolve_references
+from code_meta import CodeMeta
+from metadata_store import MetadataStore, MetadataStoreError, write_store
+from snapshot import Snapshot, SnapshotError, write_snapshot
+
+LANGUAGE = "java"
+SHAPE = RepoShape(classes=60, classes_per_package=6, packages_per_module=3, methods_per_class=3)
+STORES = {"snapshot": (write_snapshot, Snapshot, "metadata.snap"),
+          "store": (write_store, MetadataStore, "metadata.sqlite")}
+
+def as_dict(namespace):
+    # Imports are a set: to_dict() lists them in hash order
+    namespace_dict = namespace.to_dict()
+    namespace_dict["imports"] = sorted(namespace_dict["imports"])
+    return namespace_dict
+
+@pytest.fixture(scope="module")
+def parsed(tmp_path_factory):
+    folder = tmp_path_factory.mktemp("repo")
+    write_repo(str(folder), LANGUAGE, SHAPE)
+    namespaces, report = parse_folder(LANGUAGE, str(folder), workers=0)
+    assert not report.errors
+    resolve_references(namespaces, ROOT_NAMESPACES[LANGUAGE])
+    return folder, namespaces
+
+@pytest.fixture(scope="module", params=list(STORES))
+def stored(request, parsed, tmp_path_factory):
+    _, namespaces = parsed
+    write, open_store, file_name = STORES[request.param]
+    file_path = str(tmp_path_factory.mktemp(request.param) / file_name)
+    write(file_path, namespaces, {"language": LANGUAGE})
+    store = open_store(file_path, cache_size=8)
+    yield store
+    store.close()
+
+def test_namespaces_round_trip(parsed, stored):
+    _, namespaces = parsed
+    assert stored.info["language"] == LANGUAGE
+    assert sorted(stored) == sorted(namespaces)
+    assert len(stored) == len(namespaces)
+    for name, namespace in namespaces.items():
+        assert as_dict(stored[name]) == as_dict(namespace)
+    assert "missing.namespace" not in stored
+    with pytest.raises(KeyError):
+        stored["missing.namespace"]
+    # Only the most recently used namespaces are kept
+    assert len(stored._namespaces) == 8
+
+def test_list_namespaces_matches(parsed, stored):
+    _, namespaces = parsed
+    assert CodeMeta(stored, LANGUAGE).list_namespaces() == CodeMeta(namespaces, LANGUAGE).list_namespaces()
+
+def test_dependency_graphs_match(parsed, stored):
+    _, namespaces = parsed
+    in_memory, from_store = CodeMeta(namespaces, LANGUAGE), CodeMeta(stored, LANGUAGE)
+    for graph, stored_graph in zip(in_memory.dependency_graphs, from_store.dependency_graphs):
+        assert len(graph) > 0 and graph.edge_count > 0
+        assert (len(stored_graph), stored_graph.edge_count) == (len(graph), graph.edge_count)
+    assert from_store.detect_modules() == in_memory.detect_modules()
+
+def test_get_dependencies_match(parsed, stored):
+    _, namespaces = parsed
+    in_memory = CodeMeta(namespaces, LANGUAGE)
+    class_graph, method_graph = in_memory.dependency_graphs
+    names = ([name for name in class_graph.nodes if class_graph.fan_in(name)][:10]
+             + [name for name in method_graph.nodes if method_graph.fan_out(name)][:10]
+             + ["com.synthetic.Unknown", "com.synthetic.Unknown.method"])
+    assert len(names) == 22
+
+    # Answered by the store's queries, before any graph is built
+    assert CodeMeta(stored, LANGUAGE).get_dependencies(names) == in_memory.get_dependencies(names)
+
+def test_snapshot_errors(tmp_path, parsed):
+    _, namespaces = parsed
+    empty = tmp_path / "empty.snap"
+    empty.write_bytes(b"")
+    text = tmp_path / "text.snap"
+    text.write_text("{\"not\": \"a snapshot\"}" * 10)
+    store = tmp_path / "metadata.sqlite"
+    write_store(str(store), namespaces)
+    truncated = tmp_path / "truncated.snap"
+    write_snapshot(str(truncated), namespaces)
+    truncated.write_bytes(truncated.read_bytes()[:-20])
+
+    for file_path, message in [(empty, "is empty"), (text, "is not a snapshot"), (store, "is not a snapshot"),
+                               (truncated, "is corrupt")]:
+        with pytest.raises(SnapshotError, match=message):
+            Snapshot(str(file_path))
+
+def test_metadata_store_errors(tmp_path, parsed):
+    _, namespaces = parsed
+    snapshot = tmp_path / "metadata.snap"
+    write_snapshot(str(snapshot), namespaces)
+    other_schema = tmp_path / "other.sqlite"
+    with sqlite3.connect(other_schema) as connection:
+        connection.execute("PRAGMA user_version = 99")
+
+    for file_path, message in [(tmp_path / "missing.sqlite", "does not exist"),
+                               (snapshot, "is not a metadata store"),
+                               (other_schema, "has schema 99")]:
+        with pytest.raises(MetadataStoreError, match=message):
+            MetadataStore(str(file_path))
+
+@pytest.mark.parametrize("file_name", ["metadata.snap", "metadata.sqlite"])
+def test_load_metadata_parses_again_when_the_file_is_corrupt(tmp_path, parsed, file_name):
+    folder, namespaces = parsed
+    file_path = tmp_path / file_name
+    file_path.write_bytes(b"corrupt" * 100)
+
+    metadata = load_metadata(LANGUAGE, str(folder), ROOT_NAMESPACES[LANGUAGE], snapshot_path=str(file_path))
+
+    assert sorted(metadata) == sorted(namespaces)
+    reloaded = load_metadata(LANGUAGE, str(folder), ROOT_NAMESPACES[LANGUAGE], snapshot_path=str(file_path))
+    assert isinstance(reloaded, Snapshot if file_name.endswith(".snap") else MetadataStore)
+    assert sorted(reloaded) == sorted(namespaces)
+    reloaded.close()
@@ -0,0 +1,110 @@
+import pytest
+
+from metadata import Namespace
+from symbol_index import (SCORE_CAMEL_CASE, SCORE_EXACT, SCORE_PREFIX, SCORE_SUBSTRING, SymbolIndex, camel_case_match,
+                          split_humps)
+
+@pytest.fixture(scope="module")
+def index():
+    orders = Namespace("shop.orders", [])
+    orders.add_class("OrderService", "shop/orders/OrderService.java")
+    orders.add_class_attribute("OrderService", "orderRepository", "OrderRepository")
+    orders.add_class_method("OrderService", "placeOrder", [], [])
+    orders.add_class_method("OrderService", "cancelOrder", [], [])
+    orders.add_class("OrderRepository", "shop/orders/OrderRepository.java")
+    orders.add_class_method("OrderRepository", "findOrder", [], [])
+    billing = Namespace("shop.billing", [])
+    billing.add_class("Invoice", "shop/billing/Invoice.java")
+    billing.add_class_method("Invoice", "total", [], [])
+    billing.add_class("InvoiceService", "shop/billing/InvoiceService.java")
+    billing.add_class_method("InvoiceService", "issueInvoice", [], [])
+    return SymbolIndex({"shop.orders": orders, "shop.billing": billing})
+
+def fqns(results):
+    return [result["fqn"] for result in results]
+
+def test_split_humps():
+    assert split_humps("HTTPOrderService_v2") == ["HTTP", "Order", "Service", "v", "2"]
+    assert split_humps("place_order") == ["place", "order"]
+
+@pytest.mark.parametrize("query, matches", [
+    ("OS", True),
+    ("OrdServ", True),
+    ("ordserv", True),
+    ("OrderS", True),
+    ("Service", False),
+    ("SO", False),
+    ("OrdX", False),
+])
+def test_camel_case_match(query, matches):
+    assert camel_case_match(query, ["Order", "Service"]) == matches
+
+def test_index_contents(index):
+    # 4 classes, 5 methods, 1 attribute, 4 files
+    assert len(index) == 14
+
+def test_exact_match_comes_first(index):
+    results = index.search("Invoice")
+    assert results[0] == {"rank": 1, "fqn": "shop.billing.Invoice", "kind": "class",
+                          "file_path": "shop/billing/Invoice.java", "score": SCORE_EXACT}
+    assert results[1]["fqn"] == "shop.billing.InvoiceService"
+    assert results[1]["score"] == SCORE_PREFIX
+
+def test_search_is_case_insensitive(index):
+    assert fqns(index.search("orderservice"))[0] == "shop.orders.OrderService"
+
+@pytest.mark.parametrize("query, expected", [
+    ("OrdServ", "shop.orders.OrderService"),
+    ("OrRe", "shop.orders.OrderRepository"),
+    ("InSe", "shop.billing.InvoiceService"),
+    ("plOr", "shop.orders.OrderService.placeOrder"),
+])
+def test_camel_case_queries(index, query, expected):
+    results = index.search(query)
+    assert results[0]["fqn"] == expected
+    assert results[0]["score"] == SCORE_CAMEL_CASE
+
+def test_prefixes_outrank_camel_case(index):
+    results = index.search("IS")
+    assert results[0]["fqn"] == "shop.billing.InvoiceService.issueInvoice"
+    assert results[0]["score"] == SCORE_PREFIX
+    assert results[1]["fqn"] == "shop.billing.InvoiceService"
+    assert results[1]["score"] == SCORE_CAMEL_CASE
+
+@pytest.mark.parametrize("query", ["Repo", "Repository", "ository"])
+def test_words_inside_names(index, query):
+    results = index.search(query)
+    assert fqns(results) == ["shop.orders.OrderRepository", "shop.orders.OrderService.orderRepository",
+                             "shop/orders/OrderRepository.java"]
+    assert {result["score"] for result in results} == {SCORE_SUBSTRING}
+
+@pytest.mark.parametrize("query, expected", [
+    ("OrderSevrice", "shop.orders.OrderService"),
+    ("Invocie", "shop.billing.Invoice"),
+    ("cancelOrdr", "shop.orders.OrderService.cancelOrder"),
+])
+def test_misspelled_queries(index, query, expected):
+    results = index.search(query)
+    assert results[0]["fqn"] == expected
+    assert 0 < results[0]["score"] < SCORE_CAMEL_CASE
+
+def test_qualified_queries(index):
+    results = index.search("billing.Invoice")
+    assert results[0]["fqn"] == "shop.billing.Invoice"
+    assert results[0]["score"] == SCORE_EXACT
+    assert "shop.billing.InvoiceService" in fqns(results)
+    assert fqns(index.search("shop/orders/OrderService.java", kinds=["file"])) == ["shop/orders/OrderService.java"]
+
+def test_kinds_filter(index):
+    methods = index.search("Order", kinds=["method"])
+    assert set(fqns(methods)) == {"shop.orders.OrderService.placeOrder", "shop.orders.OrderService.cancelOrder",
+                                  "shop.orders.OrderRepository.findOrder"}
+    assert fqns(index.search("orderRepository", kinds=["attribute"])) == ["shop.orders.OrderService.orderRepository"]
+    assert {result["kind"] for result in index.search("Order", kinds=["class", "file"])} == {"class", "file"}
+
+def test_limit_and_ranks(index):
+    results = index.search("Order", limit=3)
+    assert [result["rank"] for result in results] == [1, 2, 3]
+    assert fqns(results) == fqns(index.search("Order", limit=10))[:3]
+    assert index.search("   ") == []
+    assert index.search("zzzz") == []
@@ -0,0 +1,206 @@
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+TRACE_FORMATS = ("chrome", "json")
+
+class Span:
+    """
+    A timed operation: a crew, task, LLM call, tool call or computation. Attributes such
+    as token counts and payload sizes are added to args while it runs.
+    """
+    __slots__ = ("id", "parent_id", "name", "category", "thread_id", "start", "duration", "args", "_tracer")
+
+    def __init__(self, tracer: Optional['Tracer'], span_id: int, parent_id: Optional[int], name: str,
+                 category: str, args: Dict[str, Any]):
+        self._tracer = tracer
+        self.id = span_id
+        self.parent_id = parent_id
+        self.name = name
+        self.category = category
+        self.thread_id = threading.get_ident()
+        self.start = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.args = args
+
+    def end(self, **args):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self.start
+        self.args.update(args)
+        if self._tracer:
+            self._tracer._finish(self)
+
+class Tracer:
+    """
+    Collects spans from all threads. Disabled tracers hand out spans that are not recorded.
+    """
+    def __init__(self, enabled: bool = False):
+        self.enabled = enabled
+        self.spans: List[Span] = []
+        self.origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self) -> List[Span]:
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def start_span(self, name: str, category: str, **args) -> Span:
+        """
+        Starts a span, nested in the innermost open span of the thread; end it with Span.end().
+        """
+        if not self.enabled:
+            return Span(None, 0, None, name, category, args)
+        stack = self._stack()
+        span = Span(self, next(self._ids), stack[-1].id if stack else None, name, category, args)
+        stack.append(span)
+        return span
+
+    def _finish(self, span: Span):
+        stack = self._stack()
+        if span in stack:
+            stack.remove(span)
+        with self._lock:
+            self.spans.append(span)
+
+    @contextmanager
+    def span(self, name: str, category: str, **args):
+        span = self.start_span(name, category, **args)
+        try:
+            yield span
+        except BaseException as e:
+            span.args["error"] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span.end()
+
+    def to_json(self) -> Dict:
+        """
+        Spans with their parent ids, start times and durations in seconds.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        return {
+            "spans": [
+                {
+                    "id": span.id,
+                    "parent_id": span.parent_id,
+                    "name": span.name,
+                    "category": span.category,
+                    "thread_id": span.thread_id,
+                    "start": round(span.start - self.origin, 6),
+                    "duration": round(span.duration, 6),
+                    "args": span.args,
+                }
+                for span in spans
+            ]
+        }
+
+    def to_chrome(self) -> Dict:
+        """
+        Spans as complete events of the Chrome trace format (chrome://tracing, Perfetto).
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda span: span.start)
+        return {
+            "traceEvents": [
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": round((span.start - self.origin) * 1e6, 1),
+                    "dur": round(span.duration * 1e6, 1),
+                    "pid": os.getpid(),
+                    "tid": span.thread_id,
+                    "args": span.args,
+                }
+                for span in spans
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write(self, file_path: str, trace_format: str = "chrome"):
+        trace = self.to_chrome() if trace_format == "chrome" else self.to_json()
+        with open(file_path, 'w') as file:
+            json.dump(trace, file, default=str)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Count and total duration of the spans by category.
+        """
+        totals = defaultdict(lambda: {"count": 0, "seconds": 0.0})
+        with self._lock:
+            for span in self.spans:
+                totals[span.category]["count"] += 1
+                totals[span.category]["seconds"] += span.duration
+        return {category: {"count": total["count"], "seconds": round(total["seconds"], 3)}
+                for category, total in sorted(totals.items())}
+
+    def __repr__(self):
+        return f"Tracer(spans={len(self.spans)}, {self.summary()})"
+
+_tracer = Tracer()
+
+def configure_tracer(enabled: bool) -> Tracer:
+    """
+    Replaces the process-wide tracer; call once at startup.
+    """
+    global _tracer
+    _tracer = Tracer(enabled)
+    return _tracer
+
+def get_tracer() -> Tracer:
+    return _tracer
+
+def payload_size(value: Any) -> int:
+    """
+    Size in characters of a tool input or output.
+    """
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value)
+    return len(json.dumps(value, default=str))
+
+def traced(category: str, name: Optional[str] = None):
+    """
+    Decorator recording a span for each call of a function.
+    """
+    def decorator(function):
+        span_name = name or function.__qualname__
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            tracer = get_tracer()
+            if not tracer.enabled:
+                return function(*args, **kwargs)
+            with tracer.span(span_name, category):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def traced_tool(run):
+    """
+    Decorator for the _run method of agent tools: records a span with the tool name and
+    the sizes of its input and output.
+    """
+    @functools.wraps(run)
+    def wrapper(self, *args, **kwargs):
+        tracer = get_tracer()
+        if not tracer.enabled:
+            return run(self, *args, **kwargs)
+        with tracer.span(self.name, "tool", input_chars=payload_size([args, kwargs])) as span:
+            result = run(self, *args, **kwargs)
+            span.args["output_chars"] = payload_size(result)
+            return result
+    return wrapper
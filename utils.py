@@ -1,6 +1,14 @@
 import json
+import mmap
+import os
+from contextlib import contextmanager
 import yaml
 
+# Source files larger than this are memory-mapped instead of read into memory
+MMAP_THRESHOLD = 1024 * 1024
+# Rough size of a token, to estimate token counts without a tokenizer
+CHARS_PER_TOKEN = 4
+
 def write_file(file_path, content):
     with open(file_path, 'w') as file:
         file.write(content)
@@ -9,6 +17,34 @@ def read_file(file_path):
     with open(file_path, 'r') as file:
         return file.read()
     
+@contextmanager
+def open_source(file_path, mmap_threshold=MMAP_THRESHOLD):
+    """
+    Yields the raw bytes of a source file, memory-mapped when it is larger than mmap_threshold.
+    The mapping is only valid inside the context.
+    """
+    with open(file_path, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        if size <= mmap_threshold:
+            yield file.read()
+            return
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+def estimate_tokens(messages) -> int:
+    """
+    Rough token count of a prompt (a string or chat messages) or a response.
+    """
+    if messages is None:
+        return 0
+    if isinstance(messages, str):
+        return len(messages) // CHARS_PER_TOKEN
+    if isinstance(messages, list):
+        return sum(estimate_tokens(message) for message in messages)
+    if isinstance(messages, dict):
+        return estimate_tokens(messages.get("content"))
+    return len(str(messages)) // CHARS_PER_TOKEN
+
 def read_json_file(json_file):
     with open(json_file, 'r') as file:
         print(file)